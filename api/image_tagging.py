@@ -1,15 +1,30 @@
-from tensorflow.keras.models import load_model
-from PIL import Image
 import numpy as np
+from app.model_registry import registry
+from preprocessing.color import dominant_color_names
+from preprocessing.image_utils import load_image, to_batch
+from .recommendation import COLOR_MAP
 
-IMG_MODEL_PATH = '../models/clothing_classifier.h5'
-model = load_model(IMG_MODEL_PATH)
-category_labels = ["Top", "Bottom", "Dress", "Jacket", ...] # Your real categories
-
-def predict_img_tags(file):
-    img = Image.open(file).resize((224,224)).convert('RGB')
-    x = np.array(img) / 255.0
-    preds = model.predict(x.reshape(1,224,224,3))[0]
-    category = category_labels[np.argmax(preds)]
-    # Placeholder: You’ll expand for style, color, etc.
-    return {"category": category, "color": "Blue", "style": "Casual"}
+
+def predict_tags(images, model=None):
+    """
+    Category, style and color for a list of decoded uint8 images, in one pass:
+    one decode per image, one forward pass for the batch (category and style
+    heads share the backbone) and a vectorized color k-means on the same pixels.
+    `model` defaults to the registry's 'tagging' model, loaded on first use.
+    """
+    if model is None:
+        model = registry.get('tagging')
+    outputs = model.predict(to_batch(images))
+    if not isinstance(outputs, dict):
+        raise ValueError("The tagging model must be the multi-head tagger "
+                         "(training/image_tagging_train.py --multi-head)")
+    colors = dominant_color_names(np.stack(images), COLOR_MAP)
+    labels = model.class_names
+    categories = labels['category'][outputs['category'].argmax(axis=1)]
+    styles = labels['style'][outputs['style'].argmax(axis=1)]
+    return [{"category": str(category), "color": color.title(), "style": str(style)}
+            for category, color, style in zip(categories, colors, styles)]
+
+
+def predict_img_tags(file, model=None):
+    return predict_tags([load_image(file)], model)[0]
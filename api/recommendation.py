@@ -1,4 +1,5 @@
 import random
+import numpy as np
 
 # --- Feature Engineering & Color Theory ---
 
@@ -36,7 +37,7 @@ def recommend_outfit(wardrobe, style, height, weight, body_color):
     bottoms = [item for item in wardrobe if item.get('category') == 'Bottoms']
     
     if not tops or not bottoms:
-        # If wardrobe is incomplete, you can use the VIRTUAL_CATALOG logic from previous steps.
+        # If wardrobe is incomplete, you can use the catalog lookup in app/catalog.py.
         # For now, we'll focus on users who have at least one top and bottom.
         return []
 
@@ -83,3 +84,31 @@ def recommend_outfit(wardrobe, style, height, weight, body_color):
     # Fallback if no outfit scores positively (highly unlikely)
     return [random.choice(tops)['_id'], random.choice(bottoms)['_id']]
 
+def recommend_outfit_indexed(index, style, height=None, weight=None, body_color=None):
+    """
+    Same scoring as recommend_outfit, but over a WardrobeIndex: items are
+    already partitioned by category and color harmony comes from the
+    index's precomputed matrix, so all pairs are scored in one shot.
+    """
+    tops, _ = index.select('Tops')
+    bottoms, _ = index.select('Bottoms')
+    if not tops or not bottoms:
+        return []
+
+    harmony = index.harmony[np.ix_(index.color_ids(tops), index.color_ids(bottoms))]
+    item_style_preference = STYLE_MAP.get(style.lower(), 0)
+    top_styles = np.array([STYLE_MAP.get(top.get('style', 'casual').lower(), 0) for top in tops])
+    bottom_styles = np.array([STYLE_MAP.get(bottom.get('style', 'casual').lower(), 0) for bottom in bottoms])
+
+    # Same order of operations as the pairwise loop above
+    scores = harmony - np.abs(top_styles[:, None] - bottom_styles[None, :]) * 2
+    scores = scores + np.where(top_styles == item_style_preference, 5, 0)[:, None]
+    scores = scores + np.where(bottom_styles == item_style_preference, 5, 0)[None, :]
+
+    flat = int(np.argmax(scores))
+    if scores.flat[flat] > -1:
+        t, b = np.unravel_index(flat, scores.shape)
+        return [tops[t]['_id'], bottoms[b]['_id']]
+
+    # Fallback if no outfit scores positively (highly unlikely)
+    return [random.choice(tops)['_id'], random.choice(bottoms)['_id']]
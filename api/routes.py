@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from .image_tagging import predict_img_tags
-from .recommendation import recommend_outfit
+from .recommendation import recommend_outfit, recommend_outfit_indexed
+from app.model_registry import registry
+from app.wardrobe_index import wardrobe_store
 
 api_blueprint = Blueprint('api', __name__)
 
@@ -8,13 +10,24 @@ api_blueprint = Blueprint('api', __name__)
 def predict():
     if 'file' not in request.files:
         return jsonify({'error': 'Missing file'}), 400
+    # Resolved per request, so importing the blueprint never loads TensorFlow
+    model = registry.get_optional('tagging')
+    if model is None:
+        return jsonify({'error': 'Tagging model is not available'}), 503
     file = request.files['file']
-    prediction = predict_img_tags(file)
+    prediction = predict_img_tags(file, model)
     return jsonify(prediction)
 
 @api_blueprint.route('/generate-outfit', methods=['POST'])
 def generate():
     data = request.get_json()
+    if data.get('wardrobe_id'):
+        index = wardrobe_store.get(data['wardrobe_id'])
+        if index is None:
+            return jsonify({'error': 'Unknown wardrobe_id'}), 404
+        outfit = recommend_outfit_indexed(index, data.get('style') or 'casual',
+                                          data.get('height'), data.get('weight'), data.get('body_color'))
+        return jsonify({'selected_outfit_ids': outfit})
     wardrobe = data.get('wardrobe', [])
     style = data.get('style')
     weather = data.get('weather')
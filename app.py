@@ -1,14 +1,15 @@
 from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
 from preprocessing.image_utils import prepare_image
+from app.cache import prediction_cache, content_key
+from app.model_registry import registry
 import numpy as np
 
 app = Flask(__name__)
 
-# Load the trained model and class names on startup
-model = load_model('models/category_model.h5')
-with open('models/class_names.txt', 'r') as f:
-    class_names = [line.strip() for line in f.readlines()]
+# Load the trained model on startup; INFERENCE_BACKEND picks Keras or TFLite.
+# Labels come from the registry too, so this app and main.py fill the shared
+# prediction cache from the same category_classes.npy.
+model = registry.get('category')
 
 @app.route('/predict-category', methods=['POST'])
 def predict_category():
@@ -20,6 +21,11 @@ def predict_category():
     try:
         # Read image bytes and preprocess
         img_bytes = file.read()
+        key = content_key(img_bytes)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return jsonify({'category': cached})
+
         preprocessed_image = prepare_image(img_bytes)
 
         # Make a prediction
@@ -27,7 +33,8 @@ def predict_category():
 
         # Decode the prediction
         predicted_class_index = np.argmax(prediction, axis=1)[0]
-        predicted_category = class_names[predicted_class_index]
+        predicted_category = model.class_names[predicted_class_index]
+        prediction_cache.put(key, predicted_category)
 
         return jsonify({'category': predicted_category})
 
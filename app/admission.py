@@ -0,0 +1,206 @@
+"""
+Admission control, deadlines and a bounded CPU pool for the heavy endpoints.
+
+Each CPU-bound endpoint has an EndpointLimiter: at most `max_concurrent`
+requests run its handler, at most `max_queue` more wait for a slot, and
+anything beyond that is rejected straight away with Overloaded (503 with
+Retry-After). While admitted, a request carries a deadline: the client's
+X-Request-Deadline-Ms header (milliseconds from now) or the endpoint's
+default. Waiting for a slot, queued CPU work and queued forward passes all
+give up with DeadlineExceeded (504) once it passes, so expired work never
+starts.
+
+Synchronous CPU-heavy code (outfit scoring, advisor matching, wardrobe
+encoding, image decoding) runs through run_cpu() on a fixed-size thread
+pool instead of on the event loop, so one large request can't stall the
+others on the same worker.
+"""
+import asyncio
+import collections
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+DEADLINE_HEADER = 'x-request-deadline-ms'
+# Client deadlines are capped so a huge header can't pin a slot forever
+MAX_DEADLINE_MS = float(os.environ.get('MAX_DEADLINE_MS', 60000))
+CPU_WORKERS = max(1, int(os.environ.get('CPU_WORKERS', os.cpu_count() or 1)))
+# Jobs waiting for a free CPU worker before run_cpu() sheds load
+CPU_MAX_QUEUE = int(os.environ.get('CPU_MAX_QUEUE', 256))
+RETRY_AFTER_S = int(os.environ.get('RETRY_AFTER_S', 1))
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+_cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='cpu')
+_cpu_pending = 0  # queued or running
+_cpu_lock = threading.Lock()
+
+
+class AdmissionError(Exception):
+    status_code = 503
+
+
+class Overloaded(AdmissionError):
+    status_code = 503
+
+
+class DeadlineExceeded(AdmissionError):
+    status_code = 504
+
+
+def parse_deadline(headers, default_s):
+    """Absolute time.monotonic() deadline from the request headers, or the default budget."""
+    budget_s = default_s
+    value = headers.get(DEADLINE_HEADER)
+    if value is not None:
+        try:
+            value = float(value)
+        except ValueError:
+            value = None
+        # Non-finite values are treated like unparsable ones (nan would slip through min/max)
+        if value is not None and math.isfinite(value):
+            budget_s = min(max(value, 0.0), MAX_DEADLINE_MS) / 1000.0
+    return None if budget_s is None else time.monotonic() + budget_s
+
+
+def remaining():
+    """Seconds left before the current request's deadline (None when it has none)."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(stage):
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+
+async def within_deadline(awaitable, stage):
+    """Awaits `awaitable`, cancelling it (e.g. a queued forward pass) when the deadline passes."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(left, 0.0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded during {stage}") from None
+
+
+async def run_cpu(fn, *args):
+    """
+    Runs `fn(*args)` on the bounded CPU pool. The job is skipped if the
+    request's deadline passes while it waits for a worker, and dropped from
+    the queue if the caller is cancelled first.
+    """
+    global _cpu_pending
+    name = getattr(fn, '__name__', 'cpu work')
+    check_deadline(name)
+    deadline = _deadline.get()
+    with _cpu_lock:
+        if _cpu_pending >= CPU_WORKERS + CPU_MAX_QUEUE:
+            raise Overloaded("CPU queue is full")
+        _cpu_pending += 1
+
+    def job():
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceeded(f"Deadline exceeded before {name}")
+        return fn(*args)
+
+    def done(_):
+        global _cpu_pending
+        with _cpu_lock:
+            _cpu_pending -= 1
+
+    try:
+        future = _cpu_pool.submit(job)
+    except BaseException:
+        done(None)
+        raise
+    future.add_done_callback(done)
+    # Cancelling the awaiting task cancels the job too if it hasn't started
+    return await asyncio.wrap_future(future)
+
+
+class EndpointLimiter:
+    # stats() keys that only ever grow (exported as counters by /metrics)
+    COUNTERS = ('admitted', 'shed', 'expired')
+
+    def __init__(self, name, max_concurrent, max_queue, deadline_s):
+        self.name = name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.deadline_s = deadline_s
+        self.active = 0
+        self._waiters = collections.deque()
+        self._stats = dict.fromkeys(self.COUNTERS, 0)
+
+    @classmethod
+    def from_env(cls, name, max_concurrent, max_queue, deadline_s):
+        """Defaults overridable with <NAME>_MAX_CONCURRENT, <NAME>_MAX_QUEUE and <NAME>_DEADLINE_MS."""
+        prefix = name.upper()
+        deadline_ms = os.environ.get(f'{prefix}_DEADLINE_MS')
+        return cls(name,
+                   int(os.environ.get(f'{prefix}_MAX_CONCURRENT', max_concurrent)),
+                   int(os.environ.get(f'{prefix}_MAX_QUEUE', max_queue)),
+                   float(deadline_ms) / 1000.0 if deadline_ms else deadline_s)
+
+    async def acquire(self):
+        try:
+            check_deadline(self.name)
+        except DeadlineExceeded:
+            self._stats['expired'] += 1
+            raise
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._stats['admitted'] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._stats['shed'] += 1
+            raise Overloaded(f"Too many concurrent {self.name} requests")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await within_deadline(asyncio.shield(waiter), f"{self.name} admission")
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, DeadlineExceeded):
+                self._stats['expired'] += 1
+            raise
+        self._stats['admitted'] += 1
+
+    def release(self):
+        # Hand the slot straight to the next waiter so newcomers can't jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, headers):
+        """Admits one request and sets its deadline for everything it awaits."""
+        token = _deadline.set(parse_deadline(headers, self.deadline_s))
+        try:
+            await self.acquire()
+            try:
+                yield
+            finally:
+                self.release()
+        finally:
+            _deadline.reset(token)
+
+    def stats(self):
+        return {'active': self.active, 'queued': len(self._waiters), **self._stats}
+
+
+def cpu_stats():
+    return {'workers': CPU_WORKERS, 'pending': _cpu_pending}
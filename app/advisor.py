@@ -0,0 +1,172 @@
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'static', 'advisor_rules.json')
+# Minimum cosine similarity for the TF-IDF fallback to answer instead of the default tip
+FUZZY_THRESHOLD = 0.3
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over lowercased keywords. `scan` walks the text
+    once and returns the ids of every keyword occurring as a substring,
+    which is what the old chain of `in` checks tested one keyword at a time.
+    """
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword_id, keyword in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(keyword_id)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def scan(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class AdvisorEngine:
+    """
+    Data-driven replacement for the hard-coded advisor rules.
+
+    A rule fires when all of its keywords occur in the question; the first
+    matching rule in file order wins, like the old if-chain. Questions that
+    match no rule fall back to the nearest rule by TF-IDF cosine similarity
+    over each rule's examples and keywords, then to the default tip.
+    """
+
+    def __init__(self, rules, default_tip):
+        self.rules = rules
+        self.default_tip = default_tip
+        keyword_sets = [{k.lower() for k in rule['keywords']} for rule in rules]
+        keyword_ids = {}
+        frequency = {}
+        for keywords in keyword_sets:
+            for keyword in keywords:
+                keyword_ids.setdefault(keyword, len(keyword_ids))
+                frequency[keyword] = frequency.get(keyword, 0) + 1
+        # Each rule is filed under its rarest keyword; it can only fire when that one is found,
+        # so common words like "wash" never make a lookup walk thousands of rules
+        self.anchored = [[] for _ in keyword_ids]
+        for rule_id, keywords in enumerate(keyword_sets):
+            if not keywords:
+                continue  # only reachable through the fuzzy fallback
+            anchor = min(keywords, key=lambda k: (frequency[k], keyword_ids[k]))
+            self.anchored[keyword_ids[anchor]].append((rule_id, frozenset(keyword_ids[k] for k in keywords)))
+        self.automaton = KeywordAutomaton(list(keyword_ids))
+
+        documents = [' '.join(rule.get('examples', []) + rule['keywords']) for rule in rules]
+        self.vectorizer = None
+        if any(doc.strip() for doc in documents):
+            self.vectorizer = TfidfVectorizer(lowercase=True, sublinear_tf=True, stop_words='english')
+            # Rows are L2-normalized, so a sparse dot product is the cosine similarity
+            self.matrix = self.vectorizer.fit_transform(documents).T.tocsr()
+            self.analyzer = self.vectorizer.build_analyzer()
+            self.vocabulary = self.vectorizer.vocabulary_
+            self.idf = self.vectorizer.idf_
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data['rules'], data['default'])
+
+    def match_rule(self, question):
+        """Lowest rule id whose keywords all occur in `question`, or None."""
+        found = self.automaton.scan(question.lower())
+        if not found:
+            return None
+        best = None
+        for keyword_id in found:
+            for rule_id, keywords in self.anchored[keyword_id]:
+                if best is not None and rule_id >= best:
+                    break  # rules are filed in id order
+                if keywords <= found:
+                    best = rule_id
+        return best
+
+    def _similarities(self, question):
+        # Hand-rolled TfidfVectorizer.transform for one question; the sklearn call
+        # overhead alone would dominate the sub-millisecond budget
+        counts = {}
+        for term in self.analyzer(question):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        sims = np.zeros(self.matrix.shape[1])
+        if not counts:
+            return sims
+        weights = {t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        for term_id, weight in weights.items():
+            start, end = indptr[term_id], indptr[term_id + 1]
+            sims[indices[start:end]] += data[start:end] * (weight / norm)
+        return sims
+
+    def _nearest(self, questions):
+        if self.vectorizer is None:
+            return [None] * len(questions)
+        nearest = []
+        for question in questions:
+            sims = self._similarities(question)
+            best = int(sims.argmax())
+            nearest.append(best if sims[best] >= FUZZY_THRESHOLD else None)
+        return nearest
+
+    def answer_many(self, questions):
+        rule_ids = [self.match_rule(q) for q in questions]
+        misses = [i for i, rule_id in enumerate(rule_ids) if rule_id is None]
+        if misses:
+            for i, rule_id in zip(misses, self._nearest([questions[i] for i in misses])):
+                rule_ids[i] = rule_id
+        return [{"tip": self.rules[r]['tip'] if r is not None else self.default_tip} for r in rule_ids]
+
+    def answer(self, question):
+        return self.answer_many([question])[0]
+
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = AdvisorEngine.from_file()
+    return _engine
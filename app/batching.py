@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.metrics import metrics
+
+# Defaults can be tuned per deployment without touching code
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 32))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+
+
+class BatchingEngine:
+    """
+    Collects concurrent inference requests into a single batched forward pass.
+
+    Callers await `submit(x)` with one preprocessed input of shape (224, 224, 3).
+    A background task drains the queue as soon as `max_batch_size` inputs are
+    waiting or `max_wait_ms` has elapsed since the first one arrived, runs
+    `predict_fn` on the stacked batch in a worker thread and resolves each
+    caller's future with its own row of the output.
+    """
+    # stats() keys that only ever grow (exported as counters by /metrics)
+    COUNTERS = ('requests', 'batches', 'errors')
+
+    def __init__(self, predict_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        # A single thread keeps forward passes serialized; the model is the bottleneck anyway
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='batch-infer')
+        self._queue = None
+        self._loop = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'batches': 0,
+            'errors': 0,
+            'max_batch_size_seen': 0,
+            'batch_size_histogram': {},
+            'total_wait_s': 0.0,
+            'total_infer_s': 0.0,
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, x):
+        """Queue a single input and wait for its prediction row."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((x, future, time.perf_counter()))
+        return await future
+
+    async def submit_many(self, xs):
+        """Queue several inputs at once; they may be split across batches."""
+        return await asyncio.gather(*(self.submit(x) for x in xs))
+
+    async def _collect(self):
+        first = await self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Still take whatever is already waiting without blocking
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Drop callers that gave up (e.g. client disconnected) before spending compute on them
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            inputs = np.stack([entry[0] for entry in batch])
+            try:
+                preds = await self._loop.run_in_executor(self._executor, self.predict_fn, inputs)
+            except Exception as e:
+                self._record(batch, started, error=True)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self._record(batch, started)
+            for i, (_, future, _) in enumerate(batch):
+                if not future.done():
+                    future.set_result(preds[i])
+
+    def _record(self, batch, started, error=False):
+        size = len(batch)
+        now = time.perf_counter()
+        with self._lock:
+            stats = self._stats
+            stats['requests'] += size
+            stats['batches'] += 1
+            if error:
+                stats['errors'] += 1
+            stats['max_batch_size_seen'] = max(stats['max_batch_size_seen'], size)
+            stats['batch_size_histogram'][size] = stats['batch_size_histogram'].get(size, 0) + 1
+            stats['total_wait_s'] += sum(started - queued for _, _, queued in batch)
+            stats['total_infer_s'] += now - started
+        for _, _, queued in batch:
+            metrics.observe('batch.queue_wait', started - queued)
+
+    def stats(self):
+        """Snapshot of queue depth and batch-size statistics for tuning."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['batch_size_histogram'] = dict(sorted(stats['batch_size_histogram'].items()))
+        requests, batches = stats['requests'], stats['batches']
+        stats['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['avg_batch_size'] = requests / batches if batches else 0.0
+        stats['avg_queue_wait_ms'] = 1000.0 * stats.pop('total_wait_s') / requests if requests else 0.0
+        stats['avg_batch_infer_ms'] = 1000.0 * stats.pop('total_infer_s') / batches if batches else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000.0
+        return stats
@@ -0,0 +1,185 @@
+"""
+Embeds catalog images and writes the similar-item index (app/similar_items.py).
+
+    python -m app.build_similar_index                          # the serving catalog (app/catalog.py)
+    python -m app.build_similar_index --catalog catalog.jsonl  # another JSON-lines, JSON or Parquet file
+
+Each item needs '_id' and 'category', plus either 'image' (a local path,
+relative to the catalog file) or 'imageUrl'. Items whose image can't be
+read are skipped. The pooled MobileNetV2 backbone is saved once as
+models/embedding_model.h5, so the serving side embeds the user's garments
+with exactly the same network through the model registry. It can also be
+converted with `python -m app.export_tflite --model models/embedding_model.h5`.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from app.fetch import close_client, fetch_images
+from app.model_registry import MODELS_DIR
+from app.catalog import CATALOG_PATH, read_source
+from app.similar_items import SIMILAR_INDEX_DIR, IVF_MIN_ITEMS, build_index
+from preprocessing.image_utils import load_image, to_batch
+
+EMBEDDING_MODEL_PATH = os.path.join(MODELS_DIR, 'embedding_model.h5')
+
+
+async def image_sources(items, catalog_path):
+    """Local bytes for 'image' paths, downloaded bytes for 'imageUrl'; None when unavailable."""
+    base_dir = os.path.dirname(os.path.abspath(catalog_path))
+    sources = [None] * len(items)
+    urls = {}
+    for i, item in enumerate(items):
+        if item.get('image'):
+            try:
+                with open(os.path.join(base_dir, item['image']), 'rb') as f:
+                    sources[i] = f.read()
+            except OSError as e:
+                print(f"Skipping {item.get('_id')}: {e}")
+        elif item.get('imageUrl'):
+            urls[i] = item['imageUrl']
+    if urls:
+        blobs = await fetch_images(list(urls.values()), deadline=None)
+        for i, url in urls.items():
+            sources[i] = blobs.get(url)
+    return sources
+
+
+def embed(model, items, sources, batch_size=64):
+    """Returns (kept items, float32 embeddings) for the items whose image decoded."""
+    kept, vectors = [], []
+    for start in range(0, len(items), batch_size):
+        images = []
+        for item, blob in zip(items[start:start + batch_size], sources[start:start + batch_size]):
+            if blob is None:
+                print(f"Skipping {item.get('_id')}: image unavailable")
+                continue
+            try:
+                images.append(load_image(blob))
+            except Exception as e:
+                print(f"Skipping {item.get('_id')}: {e}")
+                continue
+            kept.append(item)
+        if images:
+            vectors.append(model.predict(to_batch(images)))
+    dim = vectors[0].shape[1] if vectors else 0
+    return kept, np.concatenate(vectors) if vectors else np.zeros((0, dim), dtype=np.float32)
+
+
+class KeptItems:
+    """
+    The items that were embedded, spooled to a JSON-lines file and read back
+    by row, so build_index() can walk a million-item catalog without holding
+    it as Python dicts.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'wb+')
+        self._offsets = [0]
+        self._lines = None
+
+    def append(self, item):
+        line = json.dumps(item, default=str).encode() + b'\n'
+        self._file.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+
+    def finish(self):
+        self._file.flush()
+        self._offsets = np.array(self._offsets, dtype=np.int64)
+        self._lines = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b''
+
+    def close(self):
+        if isinstance(self._lines, mmap.mmap):
+            self._lines.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        return json.loads(self._lines[self._offsets[row]:self._offsets[row + 1]])
+
+
+def batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def embed_catalog(model, items, count, catalog_path, work_dir, batch_size=64):
+    """
+    embed() over an iterable of `count` catalog items, streamed: each batch's
+    images are read or downloaded and embedded, its vectors go straight into
+    a float16 memmap and its kept items into a KeptItems file, both under
+    `work_dir`, and nothing of it stays in memory. Returns (KeptItems,
+    float16 embeddings for them).
+    """
+    kept = KeptItems(os.path.join(work_dir, 'items.jsonl'))
+    embeddings = None
+    rows = 0
+    try:
+        for number, batch in enumerate(batches(items, batch_size), 1):
+            batch_kept, vectors = embed(model, batch, await image_sources(batch, catalog_path), batch_size)
+            if batch_kept:
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(os.path.join(work_dir, 'embeddings.npy'), mode='w+',
+                                                           dtype=np.float16, shape=(count, vectors.shape[1]))
+                embeddings[rows:rows + len(vectors)] = vectors
+                rows += len(vectors)
+                for item in batch_kept:
+                    kept.append(item)
+            if number % 100 == 0:
+                print(f"Embedded {min(number * batch_size, count)}/{count} items")
+    finally:
+        await close_client()
+    kept.finish()
+    if embeddings is None:
+        return kept, np.zeros((0, 0), dtype=np.float16)
+    embeddings.flush()
+    return kept, embeddings[:rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the catalog similar-item index")
+    parser.add_argument('--catalog', default=CATALOG_PATH)
+    parser.add_argument('--output', default=SIMILAR_INDEX_DIR)
+    parser.add_argument('--model', default=EMBEDDING_MODEL_PATH)
+    parser.add_argument('--ivf-min-items', type=int, default=IVF_MIN_ITEMS)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    from app.feature_cache import build_backbone
+    from app.inference_backend import KerasModel
+    if not os.path.exists(args.model):
+        build_backbone().save(args.model)
+        print(f"Saved {args.model}")
+    model = KerasModel.load('embedding', args.model, None)
+
+    # Counted in a first pass so the embeddings can be preallocated on disk
+    count = sum(1 for _ in read_source(args.catalog))
+    print(f"Embedding {count} catalog items...")
+    # Next to the output rather than in /tmp, which may be memory-backed
+    parent = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(parent, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=parent) as work_dir:
+        kept, embeddings = asyncio.run(embed_catalog(model, read_source(args.catalog), count, args.catalog,
+                                                     work_dir, args.batch_size))
+        try:
+            build_index(embeddings, kept, args.output, ivf_min_items=args.ivf_min_items)
+        finally:
+            del embeddings
+            kept.close()
+    print(f"Saved {args.output} ({len(kept)} items, {count - len(kept)} skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import atexit
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.inference_backend import tflite_path
+from app.model_registry import INFERENCE_BACKEND
+
+BASE_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.join(BASE_DIR, '..', 'models', 'category_model.h5')
+CLASSES_PATH = os.path.join(BASE_DIR, '..', 'models', 'category_classes.npy')
+# Files whose change invalidates the cache: the .tflite file too when a TFLite backend serves the model
+MODEL_FILES = (MODEL_PATH, CLASSES_PATH) + (
+    (tflite_path(MODEL_PATH, INFERENCE_BACKEND),) if INFERENCE_BACKEND.startswith('tflite-') else ())
+CACHE_DIR = os.environ.get('PREDICTION_CACHE_DIR', os.path.join(BASE_DIR, '..', 'cache'))
+CACHE_DB_PATH = os.path.join(CACHE_DIR, 'predictions.sqlite3')
+
+CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', 10000))
+CACHE_TTL_S = float(os.environ.get('PREDICTION_CACHE_TTL_S', 7 * 24 * 3600))
+# Rows kept per SQLite table; the oldest are pruned beyond this
+CACHE_DISK_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_DISK_MAX_ENTRIES', 1000000))
+# Disk writes waiting for the writer thread; beyond this they are dropped
+CACHE_WRITE_QUEUE = 10000
+# How often the writer thread prunes expired and excess rows
+PRUNE_INTERVAL_S = 300.0
+# How often the model files are re-stat'ed to detect a retrained model
+VERSION_CHECK_INTERVAL_S = 1.0
+
+
+def content_key(image_bytes):
+    """Content address of an uploaded/fetched image."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def files_fingerprint(paths, tag=''):
+    """Cheap version stamp for a set of files based on size and mtime, plus an optional tag."""
+    h = hashlib.sha1(f"{tag};".encode())
+    for path in paths:
+        try:
+            st = os.stat(path)
+            h.update(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+        except OSError:
+            h.update(f"{os.path.abspath(path)}:missing;".encode())
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    Two-tier cache of category predictions keyed by image content hash.
+
+    The first tier is an in-process LRU with TTL; the second is a SQLite file
+    that survives restarts and can be shared by several server processes.
+    Every entry is stamped with a fingerprint of the model files and the
+    inference backend, so retraining (a new category_model.h5,
+    category_classes.npy or .tflite export) or switching backends
+    invalidates both tiers automatically. URLs can be aliased to a content
+    hash so that repeat fetches of the same image URL are skipped entirely.
+
+    Disk writes go through a queue to one writer thread with its own
+    connection, which commits them in batches, so callers on the event loop
+    never wait for an fsync. The same thread periodically deletes expired
+    rows, aliases whose prediction is gone, and the oldest rows beyond
+    `disk_max_entries`. Disk reads hold their own lock rather than the
+    memory tier's, so async callers can run get_disk() in an executor after
+    a get_memory() miss without stalling the event loop.
+    """
+    # stats() keys that only ever grow (exported as counters by /metrics)
+    COUNTERS = ('memory_hits', 'disk_hits', 'misses', 'url_hits', 'url_misses', 'invalidations',
+                'dropped_writes', 'pruned')
+
+    def __init__(self, db_path=CACHE_DB_PATH, watch_paths=MODEL_FILES, backend=INFERENCE_BACKEND,
+                 max_entries=CACHE_MAX_ENTRIES, ttl_s=CACHE_TTL_S, disk_max_entries=CACHE_DISK_MAX_ENTRIES):
+        self.db_path = db_path
+        self.watch_paths = tuple(watch_paths)
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_max_entries = disk_max_entries
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()  # key -> (value, stored_at)
+        self._aliases = OrderedDict()  # url -> (key, stored_at)
+        self._version = None
+        self._version_checked = 0.0
+        self._db = None
+        self._db_lock = threading.Lock()  # the shared read connection, used one thread at a time
+        self._writes = queue.Queue(maxsize=CACHE_WRITE_QUEUE)
+        self._writer = None
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+    # --- Storage helpers ---
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE IF NOT EXISTS predictions '
+                   '(key TEXT PRIMARY KEY, version TEXT, value TEXT, stored_at REAL)')
+        db.execute('CREATE TABLE IF NOT EXISTS aliases '
+                   '(url TEXT PRIMARY KEY, key TEXT, stored_at REAL)')
+        db.execute('CREATE INDEX IF NOT EXISTS predictions_stored_at ON predictions (stored_at)')
+        db.execute('CREATE INDEX IF NOT EXISTS aliases_stored_at ON aliases (stored_at)')
+        db.commit()
+        return db
+
+    def _connect(self):
+        if self._db is None and self.db_path:
+            try:
+                self._db = self._open()
+            except sqlite3.Error as e:
+                print(f"Warning: prediction cache disk tier disabled - {e}")
+                self.db_path = None
+        return self._db
+
+    def _write(self, op):
+        """Queues a disk write for the writer thread; the cache is best effort, so a full queue drops it."""
+        with self._db_lock:
+            if self._connect() is None:
+                return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='prediction-cache-writer', daemon=True)
+                self._writer.start()
+        try:
+            self._writes.put_nowait(op)
+        except queue.Full:
+            self._counters['dropped_writes'] += 1
+
+    def _write_loop(self):
+        try:
+            db = self._open()
+        except sqlite3.Error as e:
+            print(f"Warning: prediction cache writer failed to start - {e}")
+            return
+        last_prune = 0.0
+        while True:
+            ops = [self._writes.get()]
+            # Whatever piled up meanwhile goes into the same transaction
+            while len(ops) < 1000:
+                try:
+                    ops.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            flushed = []
+            try:
+                for op in ops:
+                    if isinstance(op, threading.Event):
+                        flushed.append(op)
+                    elif op[0] == 'invalidate':
+                        db.execute('DELETE FROM predictions WHERE version != ?', (op[1],))
+                    else:
+                        db.execute(op[0], op[1])
+                if time.monotonic() - last_prune >= PRUNE_INTERVAL_S:
+                    last_prune = time.monotonic()
+                    self._prune(db)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: prediction cache write failed - {e}")
+                try:
+                    db.rollback()
+                except sqlite3.Error:
+                    pass
+            for event in flushed:
+                event.set()
+
+    def _prune(self, db):
+        pruned = 0
+        if self.ttl_s is not None:
+            cutoff = time.time() - self.ttl_s
+            for table in ('predictions', 'aliases'):
+                pruned += db.execute(f'DELETE FROM {table} WHERE stored_at < ?', (cutoff,)).rowcount
+        for table, column in (('predictions', 'key'), ('aliases', 'url')):
+            excess = db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] - self.disk_max_entries
+            if excess > 0:
+                pruned += db.execute(f'DELETE FROM {table} WHERE {column} IN '
+                                     f'(SELECT {column} FROM {table} ORDER BY stored_at LIMIT ?)',
+                                     (excess,)).rowcount
+        pruned += db.execute('DELETE FROM aliases WHERE NOT EXISTS '
+                             '(SELECT 1 FROM predictions WHERE predictions.key = aliases.key)').rowcount
+        self._counters['pruned'] += pruned
+
+    def flush(self, timeout=5.0):
+        """Waits until the disk writes queued so far are committed; True when they were."""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._writes.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= VERSION_CHECK_INTERVAL_S:
+            version = files_fingerprint(self.watch_paths, self.backend)
+            self._version_checked = now
+            if self._version is not None and version != self._version:
+                self._invalidate(version)
+            self._version = version
+        return self._version
+
+    def _invalidate(self, version):
+        self._memory.clear()
+        self._aliases.clear()
+        self._counters['invalidations'] += 1
+        self._write(('invalidate', version))
+
+    def _fresh(self, stored_at):
+        return self.ttl_s is None or time.time() - stored_at < self.ttl_s
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    # --- Public API ---
+
+    def _read(self, sql, params):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            try:
+                return db.execute(sql, params).fetchone()
+            except sqlite3.Error:
+                return None
+
+    def get_memory(self, key):
+        """Returns the category for a content key from the in-process tier only, or None; never touches disk."""
+        with self._lock:
+            self._current_version()
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._fresh(entry[1]):
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+            return None
+
+    def get_disk(self, key):
+        """The SQLite tier of get(), for a key get_memory() missed. Blocking; async callers use an executor."""
+        with self._lock:
+            version = self._current_version()
+        row = self._read('SELECT value, stored_at FROM predictions WHERE key = ? AND version = ?', (key, version))
+        with self._lock:
+            if row is not None and self._fresh(row[1]) and version == self._version:
+                self._remember(self._memory, key, (row[0], row[1]))
+                self._counters['disk_hits'] += 1
+                return row[0]
+            self._counters['misses'] += 1
+            return None
+
+    def get(self, key):
+        """Returns the cached category for a content key, or None."""
+        value = self.get_memory(key)
+        return value if value is not None else self.get_disk(key)
+
+    def put(self, key, value):
+        value = str(value)
+        now = time.time()
+        with self._lock:
+            version = self._current_version()
+            self._remember(self._memory, key, (value, now))
+        self._write(('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)', (key, version, value, now)))
+
+    def get_url(self, url):
+        """Returns the cached category for an image URL seen before, or None."""
+        with self._lock:
+            key = None
+            entry = self._aliases.get(url)
+            if entry is not None and self._fresh(entry[1]):
+                key = entry[0]
+            else:
+                row = self._read('SELECT key, stored_at FROM aliases WHERE url = ?', (url,))
+                if row is not None and self._fresh(row[1]):
+                    key = row[0]
+                    self._remember(self._aliases, url, (row[0], row[1]))
+            value = self.get(key) if key is not None else None
+            self._counters['url_hits' if value is not None else 'url_misses'] += 1
+            return value
+
+    def put_url(self, url, key):
+        now = time.time()
+        with self._lock:
+            self._remember(self._aliases, url, (key, now))
+        self._write(('INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)', (url, key, now)))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['url_aliases'] = len(self._aliases)
+            stats['pending_writes'] = self._writes.qsize()
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
+
+
+# Shared by app/predict.py, app/outfits.py and the Flask app.py
+prediction_cache = PredictionCache()
+# Commit what's still queued when the process exits cleanly
+atexit.register(prediction_cache.flush, 2.0)
@@ -0,0 +1,285 @@
+"""
+Product catalog used to fill wardrobe gaps.
+
+The catalog is maintained as an external file (static/catalog.jsonl by
+default, one item per line; a JSON list or, with pyarrow installed, a
+.parquet file also work). On first use it is compiled into a columnar store
+under cache/catalog/<source fingerprint>/:
+- Each string field is a UTF-8 blob plus an int64 offsets array, all
+  memory-mapped.
+- Rows are sorted by (category, style, color). Every key and every prefix
+  of it, such as (category, style), is therefore a few contiguous row
+  ranges listed in the manifest.
+
+A lookup only touches the rows it returns. get_catalog() re-stats the
+source file; when it changes, a background thread compiles the new version
+and swaps it in, so editing the catalog needs no restart and no request
+waits for a compile. Readers keep using the snapshot they already hold. A
+missing or invalid file is logged and leaves the previous catalog in place,
+or an empty one if there was none.
+"""
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from app.cache import files_fingerprint
+
+CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(os.path.dirname(__file__), '..', 'static', 'catalog.jsonl'))
+CATALOG_CACHE_DIR = os.environ.get('CATALOG_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache', 'catalog'))
+# How often the catalog file is re-stat'ed for changes
+RELOAD_CHECK_INTERVAL_S = 1.0
+FIELDS = ('_id', 'name', 'category', 'color', 'style', 'imageUrl')
+# Any other keys of an item are kept as one JSON string per row
+EXTRA = 'extra'
+
+
+def _key(value):
+    return str(value or '').lower()
+
+
+def read_source(path):
+    """Yields catalog items from a JSON-lines, JSON list or Parquet file."""
+    if path.endswith('.parquet'):
+        import pandas as pd
+        frame = pd.read_parquet(path)
+        yield from frame.where(frame.notna(), None).to_dict('records')
+        return
+    with open(path, 'r') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_strings(directory, name, values):
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(os.path.join(directory, f"{name}.bin"), 'wb') as f:
+        for i, value in enumerate(values):
+            data = value.encode()
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+def compile_catalog(source_path, directory):
+    """Builds the columnar store for `source_path` in `directory`, published with one rename."""
+    items = list(read_source(source_path))
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"Catalog items must be JSON objects, got {item!r}")
+        if not item.get('_id') or not item.get('category'):
+            raise ValueError(f"Catalog items need an '_id' and a 'category': {item}")
+    vocab = {}
+    codes = {}
+    for field in ('category', 'style', 'color'):
+        # Category is matched exactly, style and color case-insensitively
+        keys = [str(item[field]) if field == 'category' else _key(item.get(field)) for item in items]
+        vocab[field] = sorted(set(keys))
+        ids = {key: i for i, key in enumerate(vocab[field])}
+        codes[field] = np.array([ids[key] for key in keys], dtype=np.int32)
+    # Stable, so items keep their file order within a key
+    order = np.lexsort((codes['color'], codes['style'], codes['category']))
+    items = [items[row] for row in order]
+
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for field in FIELDS:
+        _write_strings(tmp_dir, field, ['' if item.get(field) is None else str(item[field]) for item in items])
+    extras = [{k: v for k, v in item.items() if k not in FIELDS} for item in items]
+    _write_strings(tmp_dir, EXTRA, [json.dumps(extra, default=str) if extra else '' for extra in extras])
+
+    partitions = []
+    keys = np.stack([codes['category'][order], codes['style'][order], codes['color'][order]], axis=1)
+    if len(keys):
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+        ends = np.r_[starts[1:], len(keys)]
+        for start, end in zip(starts, ends):
+            category, style, color = keys[start]
+            partitions.append([vocab['category'][category], vocab['style'][style], vocab['color'][color],
+                               int(start), int(end)])
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump({'count': len(items), 'source': os.path.abspath(source_path), 'partitions': partitions}, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Another worker compiled the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class Catalog:
+    """Read-only, memory-mapped view of a compiled catalog."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+        self.count = manifest['count']
+        self._offsets = {}
+        self._blobs = {}
+        for name in FIELDS + (EXTRA,):
+            self._offsets[name] = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r')
+            with open(os.path.join(directory, f"{name}.bin"), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                self._blobs[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # (category, style, color) -> [(start, end)], plus every prefix of the key
+        self._ranges = {}
+        for category, style, color, start, end in manifest['partitions']:
+            for key in ((category,), (category, style), (category, style, color)):
+                self._ranges.setdefault(key, []).append((start, end))
+        self._styles = {}
+        for category, style, _, _, _ in manifest['partitions']:
+            self._styles.setdefault(category, {})[style] = None
+
+    @classmethod
+    def empty(cls):
+        """A catalog with no items, served when there is no usable catalog file."""
+        catalog = cls.__new__(cls)
+        catalog.directory = None
+        catalog.count = 0
+        catalog._offsets = {name: np.zeros(1, dtype=np.int64) for name in FIELDS + (EXTRA,)}
+        catalog._blobs = {name: b'' for name in FIELDS + (EXTRA,)}
+        catalog._ranges = {}
+        catalog._styles = {}
+        return catalog
+
+    def __len__(self):
+        return self.count
+
+    def _strings(self, name, rows):
+        offsets = self._offsets[name]
+        blob = self._blobs[name]
+        return [blob[start:end].decode() for start, end in zip(offsets[rows].tolist(), offsets[rows + 1].tolist())]
+
+    def items_at(self, rows):
+        """Materializes the given rows as item dicts (offsets are gathered once per column)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        items = [{} for _ in range(len(rows))]
+        for field in FIELDS:
+            for item, value in zip(items, self._strings(field, rows)):
+                if value:
+                    item[field] = value
+        for item, extra in zip(items, self._strings(EXTRA, rows)):
+            if extra:
+                item.update(json.loads(extra))
+        return items
+
+    def item(self, row):
+        return self.items_at([row])[0]
+
+    def items(self, chunk=4096):
+        for start in range(0, self.count, chunk):
+            yield from self.items_at(np.arange(start, min(self.count, start + chunk)))
+
+    def ranges(self, category, styles=None, colors=None):
+        """Row ranges matching `category` and, optionally, any of `styles` and any of `colors`."""
+        if styles is None and colors is None:
+            return list(self._ranges.get((category,), []))
+        if styles is None:
+            styles = self._styles.get(category, ())
+        ranges = []
+        for style in dict.fromkeys(map(_key, styles)):
+            if colors is None:
+                ranges += self._ranges.get((category, style), [])
+            else:
+                for color in dict.fromkeys(map(_key, colors)):
+                    ranges += self._ranges.get((category, style, color), [])
+        return ranges
+
+    def select(self, category, styles=None, colors=None, limit=None):
+        """
+        Items of `category`, optionally restricted to `styles` and `colors`
+        (case-insensitive). With `limit`, rows are taken round-robin over
+        the matching colors, so a short list still covers the palette.
+        """
+        ranges = self.ranges(category, styles, colors)
+        if limit is None:
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges]) if ranges else []
+        else:
+            rows = []
+            depth = 0
+            while len(rows) < limit and ranges:
+                ranges = [(start, end) for start, end in ranges if start + depth < end]
+                for start, _ in ranges[:limit - len(rows)]:
+                    rows.append(start + depth)
+                depth += 1
+        return self.items_at(rows)
+
+
+_catalog = None
+_catalog_version = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+_reloader = None
+
+
+def load_catalog(path=CATALOG_PATH, cache_dir=CATALOG_CACHE_DIR):
+    """Opens the compiled store for the current version of `path`, compiling it first if needed."""
+    version = files_fingerprint([path])[:16]
+    directory = os.path.join(cache_dir, version)
+    if not os.path.exists(os.path.join(directory, 'manifest.json')):
+        os.makedirs(cache_dir, exist_ok=True)
+        compile_catalog(path, directory)
+        # Older versions may still be mapped by other processes; unlinking them is safe on POSIX
+        for name in os.listdir(cache_dir):
+            if name != version and '.tmp-' not in name:
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return Catalog(directory), version
+
+
+def _reload(version):
+    """Loads the catalog file (stamped `version` when it was checked) and swaps it in."""
+    global _catalog, _catalog_version
+    try:
+        catalog, version = load_catalog(CATALOG_PATH, CATALOG_CACHE_DIR)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # A missing, half-written or invalid file must not take outfit generation down
+        if _catalog is None:
+            print(f"Warning: Loading catalog {CATALOG_PATH} failed - {e}. Serving an empty catalog.")
+            catalog = Catalog.empty()
+        else:
+            print(f"Warning: Reloading catalog {CATALOG_PATH} failed - {e}. Keeping previous catalog.")
+            catalog = _catalog
+    # Recorded even on failure, so a bad file is retried once it changes, not on every check
+    _catalog, _catalog_version = catalog, version
+
+
+def get_catalog():
+    """
+    Current Catalog. Only the very first call loads (and on first run
+    compiles) it in the caller; later changes to the file are compiled on a
+    background thread while this keeps returning the previous snapshot.
+    """
+    global _last_check, _reloader
+    now = time.monotonic()
+    if _catalog is not None and now - _last_check < RELOAD_CHECK_INTERVAL_S:
+        return _catalog
+    with _reload_lock:
+        if _catalog is None:
+            _reload(files_fingerprint([CATALOG_PATH])[:16])
+            _last_check = time.monotonic()
+        elif now - _last_check >= RELOAD_CHECK_INTERVAL_S:
+            _last_check = now
+            version = files_fingerprint([CATALOG_PATH])[:16]
+            if version != _catalog_version and (_reloader is None or not _reloader.is_alive()):
+                _reloader = threading.Thread(target=_reload, args=(version,), name='catalog-reload', daemon=True)
+                _reloader.start()
+    return _catalog
+
+
+def preload_catalog():
+    """Loads the catalog on a daemon thread, so startup doesn't wait for a first-run compile."""
+    thread = threading.Thread(target=get_catalog, name='catalog-load', daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,8 @@
+import hashlib
 import os
 import pandas as pd
-from PIL import Image
 import numpy as np
+from preprocessing.image_utils import load_image as decode_image
 
 BASE_DIR = os.path.dirname(__file__)
 DATASET_DIR = os.path.join(BASE_DIR, '..', 'datasets')
@@ -9,25 +10,106 @@ SHAPE_ANN_DIR = os.path.join(DATASET_DIR, 'shape_ann')
 TRAIN_IMG_DIR = os.path.join(DATASET_DIR, 'train_images')
 VAL_IMG_DIR = os.path.join(DATASET_DIR, 'train_images')  # Adjust if val images are in a different folder
 TEST_IMG_DIR = os.path.join(DATASET_DIR, 'test_images')
+DECODED_CACHE_DIR = os.path.join(BASE_DIR, '..', 'cache', 'decoded')
 
-def load_annotations(txt_file, img_dir):
+IMAGE_SIZE = (224, 224)
+# Decoded uint8 images held in the shuffle buffer (~150 KB each at 224x224)
+SHUFFLE_BUFFER = 1024
+
+def read_annotation_columns(txt_file, img_dir):
     """
-    Returns DataFrame with columns: image_path (absolute), category (str/int)
-    Assumes each line: image_name [optional_attrs] category (last item as label)
+    Columnar version of load_annotations: returns (image_paths, categories)
+    as NumPy string arrays without building a dict per line. Only the first
+    and last fields of each line are split off; attributes in between are
+    never tokenized.
     """
-    data = []
+    names = []
+    categories = []
     with open(txt_file, 'r') as f:
         for line in f:
-            parts = line.strip().split()  # Split on any whitespace
-            if len(parts) < 2:
+            head = line.split(None, 1)
+            if len(head) < 2:
                 continue  # Skip invalid lines
-            image_name = parts[0]  # First item is image name
-            category = parts[-1]   # Last item is category
-            image_path = os.path.join(img_dir, image_name)
-            data.append({'image_path': image_path, 'category': category})
-    df = pd.DataFrame(data)
-    return df
+            names.append(head[0])
+            categories.append(head[1].rsplit(None, 1)[-1])
+    prefix = os.path.join(img_dir, '')
+    image_paths = np.array([prefix + name for name in names], dtype=object)
+    return image_paths, np.array(categories, dtype=object)
+
+def load_annotations(txt_file, img_dir):
+    """
+    Returns DataFrame with columns: image_path (absolute), category (str/int)
+    Assumes each line: image_name [optional_attrs] category (last item as label)
+    """
+    image_paths, categories = read_annotation_columns(txt_file, img_dir)
+    return pd.DataFrame({'image_path': image_paths, 'category': categories})
 
 def load_image(image_path):
-    img = Image.open(image_path).convert('RGB').resize((224, 224))
-    return np.array(img)
+    return decode_image(image_path, IMAGE_SIZE)
+
+def decode_image_tensor(path, label):
+    import tensorflow as tf
+    data = tf.io.read_file(path)
+    img = tf.io.decode_image(data, channels=3, expand_animations=False)
+    img = tf.image.resize(img, IMAGE_SIZE, method='bicubic', antialias=True)
+    # Stay uint8 until batching: 4x less memory in shuffle buffers and the disk cache
+    img = tf.cast(tf.clip_by_value(tf.round(img), 0, 255), tf.uint8)
+    img.set_shape(IMAGE_SIZE + (3,))
+    return img, label
+
+def _fingerprint(image_paths, labels):
+    h = hashlib.sha1(repr(IMAGE_SIZE).encode())
+    for path, label in zip(image_paths, labels):
+        h.update(f"{path}\t{label}\n".encode())
+    return h.hexdigest()[:16]
+
+def _with_sharded_cache(ds, cache_dir, num_shards):
+    """
+    Saves decoded uint8 images as `num_shards` files on the first pass and
+    streams them back on later runs, skipping JPEG decode entirely.
+    """
+    import tensorflow as tf
+    done_marker = os.path.join(cache_dir, '_COMPLETE')
+    if not os.path.exists(done_marker):
+        os.makedirs(cache_dir, exist_ok=True)
+        ds.enumerate().save(cache_dir, shard_func=lambda i, _: i % num_shards)
+        open(done_marker, 'w').close()
+    cached = tf.data.Dataset.load(
+        cache_dir,
+        # Read shards concurrently so one slow file never starves the pipeline
+        reader_func=lambda shards: shards.shuffle(num_shards).interleave(
+            lambda shard: shard, cycle_length=num_shards, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False))
+    return cached.map(lambda i, example: example)
+
+def make_dataset(image_paths, labels, num_classes, batch_size=32, shuffle=True, cache_dir=None,
+                 num_shards=8, seed=None):
+    """
+    Streaming tf.data pipeline over (image_path, int label) pairs.
+
+    Files are decoded and resized in parallel, optionally cached as sharded
+    uint8 tensors under `cache_dir`, shuffled with a bounded buffer, batched,
+    run through MobileNetV2's preprocess_input and prefetched. Memory stays
+    bounded by the buffers, not the dataset size. Unreadable images are
+    skipped, like the old load_dataset.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+
+    keep = [i for i, path in enumerate(image_paths) if os.path.exists(path)]
+    image_paths = np.asarray(image_paths, dtype=object)[keep].astype(str)
+    labels = np.asarray(labels, dtype=np.int32)[keep]
+
+    ds = tf.data.Dataset.from_tensor_slices((image_paths, labels))
+    if shuffle and not cache_dir:
+        # Shuffling paths is free; decoded images then only pass through once
+        ds = ds.shuffle(len(image_paths), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(decode_image_tensor, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    ds = ds.ignore_errors()
+    if cache_dir:
+        ds = _with_sharded_cache(ds, os.path.join(cache_dir, _fingerprint(image_paths, labels)), num_shards)
+        if shuffle:
+            ds = ds.shuffle(SHUFFLE_BUFFER, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda x, y: (preprocess_input(tf.cast(x, tf.float32)), tf.one_hot(y, num_classes)),
+                num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,83 @@
+"""
+Converts models/category_model.h5 to TFLite for the CPU serving backends.
+
+    python -m app.export_tflite                     # both variants
+    python -m app.export_tflite --variant int8 --calibration-size 500
+
+float16 halves the weights and keeps float32 activations. int8 quantizes
+weights and activations using a representative calibration set drawn from
+the training annotations; its inputs and outputs stay float32 so the
+serving code feeds both variants the same preprocessed batches.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from app.data_loader import read_annotation_columns, SHAPE_ANN_DIR, TRAIN_IMG_DIR
+from app.inference_backend import tflite_path
+from app.model_registry import MODELS_DIR
+from preprocessing.image_utils import prepare_image
+
+CATEGORY_MODEL_PATH = os.path.join(MODELS_DIR, 'category_model.h5')
+
+
+def calibration_paths(ann_path, img_dir, size, seed=0):
+    """A random sample of training images, spread over the whole annotation file."""
+    paths, _ = read_annotation_columns(ann_path, img_dir)
+    rng = np.random.default_rng(seed)
+    return paths[rng.permutation(len(paths))[:size]]
+
+
+def representative_dataset(paths):
+    def gen():
+        for path in paths:
+            try:
+                batch = prepare_image(path)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            yield [batch]
+    return gen
+
+
+def convert(model, variant, paths=None):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        converter.representative_dataset = representative_dataset(paths)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the category model to TFLite")
+    parser.add_argument('--model', default=CATEGORY_MODEL_PATH)
+    parser.add_argument('--variant', choices=['fp16', 'int8', 'all'], default='all')
+    parser.add_argument('--annotations', default=os.path.join(SHAPE_ANN_DIR, 'train_ann_file.txt'))
+    parser.add_argument('--images', default=TRAIN_IMG_DIR)
+    parser.add_argument('--calibration-size', type=int, default=200)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model, compile=False)
+    variants = ['fp16', 'int8'] if args.variant == 'all' else [args.variant]
+    for variant in variants:
+        paths = None
+        if variant == 'int8':
+            paths = calibration_paths(args.annotations, args.images, args.calibration_size)
+            print(f"Calibrating int8 on {len(paths)} training images...")
+        out_path = tflite_path(args.model, f'tflite-{variant}')
+        data = convert(model, variant, paths)
+        tmp_path = out_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, out_path)
+        print(f"Saved {out_path} ({len(data) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
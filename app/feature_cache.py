@@ -0,0 +1,192 @@
+"""
+Frozen-backbone feature cache for fast head retraining.
+
+Both training scripts freeze MobileNetV2 and only fit a Dense head, so the
+pooled 1280-d backbone features of an image never change. FeatureStore runs
+the backbone once per image and keeps the features in a memory-mapped
+.npy file keyed by image path, under a directory named after the backbone
+version. Head training, early stopping and sweeps then run on those
+features in seconds; export_full_model stitches the trained head back onto
+the backbone so serving still loads a single .h5.
+"""
+import json
+import os
+
+import numpy as np
+
+from app.data_loader import IMAGE_SIZE, decode_image_tensor
+
+BASE_DIR = os.path.dirname(__file__)
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, '..', 'cache', 'features')
+# Bump whenever the backbone, its weights or the preprocessing change
+BACKBONE_VERSION = f"mobilenet_v2-imagenet-{IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}-avg"
+FEATURE_DIM = 1280
+
+
+def build_backbone():
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    return MobileNetV2(weights='imagenet', include_top=False, pooling='avg', input_shape=IMAGE_SIZE + (3,))
+
+
+class FeatureStore:
+    """Append-only float16 feature matrix on disk plus a path -> row index."""
+
+    def __init__(self, root=FEATURE_CACHE_DIR, version=BACKBONE_VERSION):
+        self.directory = os.path.join(root, version)
+        self.features_path = os.path.join(self.directory, 'features.npy')
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.rows = {}
+        self.count = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            self.rows, self.count = data['rows'], data['count']
+        self._backbone = None
+
+    def _open(self, mode='r'):
+        return np.load(self.features_path, mmap_mode=mode)
+
+    def _reserve(self, extra):
+        """Makes room for `extra` more rows, doubling capacity as needed."""
+        needed = self.count + extra
+        capacity = self._open().shape[0] if os.path.exists(self.features_path) else 0
+        if needed <= capacity:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        new_capacity = max(needed, capacity * 2, 1024)
+        tmp_path = self.features_path + '.tmp.npy'
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16, shape=(new_capacity, FEATURE_DIM))
+        if capacity:
+            grown[:self.count] = self._open()[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.features_path)
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows': self.rows, 'count': self.count}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def missing(self, image_paths):
+        return [path for path in dict.fromkeys(image_paths) if path not in self.rows]
+
+    def extract(self, image_paths, batch_size=64):
+        """Runs the backbone over every path not cached yet; unreadable images are skipped."""
+        import tensorflow as tf
+        from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+
+        todo = [path for path in self.missing(image_paths) if os.path.exists(path)]
+        if not todo:
+            return 0
+        if self._backbone is None:
+            self._backbone = build_backbone()
+        self._reserve(len(todo))
+        out = self._open('r+')
+
+        # The "label" slot carries the position in `todo` so skipped images never shift rows
+        ds = tf.data.Dataset.from_tensor_slices((np.array(todo, dtype=str), np.arange(len(todo), dtype=np.int64)))
+        ds = ds.map(decode_image_tensor, num_parallel_calls=tf.data.AUTOTUNE).ignore_errors()
+        ds = ds.batch(batch_size).map(lambda x, i: (preprocess_input(tf.cast(x, tf.float32)), i),
+                                      num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+        added = 0
+        for images, positions in ds:
+            feats = self._backbone(images, training=False).numpy()
+            start = self.count
+            out[start:start + len(feats)] = feats.astype(np.float16)
+            for offset, position in enumerate(positions.numpy()):
+                self.rows[todo[position]] = start + offset
+            self.count += len(feats)
+            added += len(feats)
+        out.flush()
+        self._save_index()
+        return added
+
+    def features(self, image_paths):
+        """
+        Returns (features, kept_mask): float32 features for every cached path,
+        in the given order, and a mask of which input paths had features.
+        """
+        rows = np.array([self.rows.get(path, -1) for path in image_paths], dtype=np.int64)
+        kept = rows >= 0
+        if not kept.any():
+            return np.zeros((0, FEATURE_DIM), dtype=np.float32), kept
+        return np.asarray(self._open()[rows[kept]], dtype=np.float32), kept
+
+
+def train_head(x_train, y_train, x_val, y_val, num_classes, learning_rate=1e-3, epochs=50,
+               batch_size=256, patience=5, verbose=0):
+    """Fits a softmax Dense head on cached features; returns (head, best val accuracy)."""
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.layers import Dense, Input
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.utils import to_categorical
+
+    head = Sequential([Input(shape=(FEATURE_DIM,)), Dense(num_classes, activation='softmax')])
+    head.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='categorical_crossentropy',
+                 metrics=['accuracy'])
+    history = head.fit(x_train, to_categorical(y_train, num_classes),
+                       validation_data=(x_val, to_categorical(y_val, num_classes)),
+                       epochs=epochs, batch_size=batch_size, verbose=verbose,
+                       callbacks=[EarlyStopping(monitor='val_accuracy', patience=patience,
+                                                restore_best_weights=True)])
+    return head, max(history.history['val_accuracy'])
+
+
+def sweep_heads(x_train, y_train, x_val, y_val, num_classes, learning_rates=(3e-4, 1e-3, 3e-3, 1e-2),
+                batch_sizes=(64, 256)):
+    """Grid search over head hyperparameters; cheap because no backbone pass is involved."""
+    best = None
+    for lr in learning_rates:
+        for batch_size in batch_sizes:
+            head, acc = train_head(x_train, y_train, x_val, y_val, num_classes,
+                                   learning_rate=lr, batch_size=batch_size)
+            print(f"lr={lr:g} batch_size={batch_size}: val_accuracy={acc:.4f}")
+            if best is None or acc > best[1]:
+                best = (head, acc, {'learning_rate': lr, 'batch_size': batch_size})
+    return best
+
+
+def export_full_model(head, num_classes):
+    """
+    Rebuilds the serving architecture (backbone + GlobalAveragePooling2D +
+    Dense) and copies the trained head weights into it.
+    """
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    from tensorflow.keras.layers import Dense, GlobalAveragePooling2D
+    from tensorflow.keras.models import Model
+
+    base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=IMAGE_SIZE + (3,))
+    base_model.trainable = False
+    x = GlobalAveragePooling2D()(base_model.output)
+    output = Dense(num_classes, activation='softmax')(x)
+    model = Model(inputs=base_model.input, outputs=output)
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
+    return model
+
+
+def build_multi_head_model(head_sizes):
+    """
+    One MobileNetV2 backbone and pooled feature vector feeding a softmax head
+    per attribute, e.g. {'category': 13, 'style': 4}. The model's outputs
+    are a dict keyed the same way, so tagging an image is a single forward
+    pass however many attributes are predicted.
+    """
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    from tensorflow.keras.layers import Dense, GlobalAveragePooling2D
+    from tensorflow.keras.models import Model
+
+    base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=IMAGE_SIZE + (3,))
+    base_model.trainable = False
+    x = GlobalAveragePooling2D()(base_model.output)
+    outputs = {name: Dense(size, activation='softmax', name=name)(x) for name, size in head_sizes.items()}
+    return Model(inputs=base_model.input, outputs=outputs)
+
+
+def export_multi_head_model(heads):
+    """Like export_full_model, for {name: (trained head, num_classes)} sharing one backbone."""
+    model = build_multi_head_model({name: num_classes for name, (_, num_classes) in heads.items()})
+    for name, (head, _) in heads.items():
+        model.get_layer(name).set_weights(head.layers[-1].get_weights())
+    return model
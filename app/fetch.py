@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+import httpx
+
+# Per-image timeout matches the old requests.get(..., timeout=5)
+FETCH_TIMEOUT_S = float(os.environ.get('FETCH_TIMEOUT_S', 5))
+# Upper bound on simultaneous downloads for a single outfit request
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 8))
+# Overall budget for the whole fetch stage of one request
+FETCH_DEADLINE_S = float(os.environ.get('FETCH_DEADLINE_S', 10))
+# Images larger than this are treated as failed downloads
+FETCH_MAX_BYTES = int(os.environ.get('FETCH_MAX_BYTES', 10 * 1024 * 1024))
+
+_client = None
+
+
+def get_client():
+    """Process-wide pooled HTTP client so connections are reused across requests."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT_S,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _fetch_one(client, url, semaphore, max_bytes):
+    async with semaphore:
+        # Streamed, so an oversized body is abandoned as soon as it crosses the limit
+        async with client.stream('GET', url) as response:
+            response.raise_for_status()
+            declared = response.headers.get('content-length', '')
+            if declared.isdigit() and int(declared) > max_bytes:
+                raise ValueError(f"Image at {url} exceeds {max_bytes} bytes")
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Image at {url} exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+
+async def fetch_images(urls, client=None, concurrency=FETCH_CONCURRENCY, deadline=FETCH_DEADLINE_S,
+                       max_bytes=FETCH_MAX_BYTES):
+    """
+    Downloads `urls` concurrently and returns {url: bytes or None}.
+
+    At most `concurrency` downloads run at once and the whole stage is
+    abandoned after `deadline` seconds; anything unfinished or failed maps
+    to None so callers can fall back per item, as does any body over
+    `max_bytes`. Pass `client` to point the fetcher at a stand-in server in
+    tests (see tests/test_fetch.py).
+    """
+    urls = list(dict.fromkeys(urls))  # de-duplicate, keep order
+    if not urls:
+        return {}
+    client = client or get_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = {url: asyncio.ensure_future(_fetch_one(client, url, semaphore, max_bytes)) for url in urls}
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for url, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[url] = task.result()
+        else:
+            results[url] = None
+    return results
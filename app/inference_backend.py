@@ -0,0 +1,184 @@
+"""
+Interchangeable inference backends for the serving models.
+
+Every backend exposes the same small surface used by the registry and the
+serving code: `predict(batch)` on a preprocessed float32 (N, 224, 224, 3)
+batch, `class_names` and `warmup()`. For multi-head models `predict`
+returns a dict of per-head outputs and `class_names` is a dict of labels. KerasModel runs the original .h5
+model; TFLiteModel runs a converted float16 or int8 .tflite file through a
+pool of interpreters, which is much lighter per call on CPU-only nodes.
+
+TFLite interpreters have static shapes, and resizing one reallocates all of
+its tensors. TFLiteModel therefore pads every batch up to a bucket size
+(powers of two up to the batching engine's max) and keeps one allocated
+interpreter per bucket, so variable micro-batches never trigger a resize.
+"""
+import os
+import queue
+
+import numpy as np
+
+INPUT_SHAPE = (224, 224, 3)
+BACKENDS = ('keras', 'tflite-fp16', 'tflite-int8')
+# Interpreter sets per TFLite model; each handles one call at a time. The batching
+# engine runs one forward pass at a time, so one set is enough for the serving path
+TFLITE_POOL_SIZE = int(os.environ.get('TFLITE_POOL_SIZE', 1))
+# Threads used inside a single interpreter invocation
+TFLITE_NUM_THREADS = int(os.environ.get('TFLITE_NUM_THREADS', 1))
+# Largest batch an interpreter is allocated for; larger batches run in chunks of this size
+TFLITE_MAX_BATCH = int(os.environ.get('BATCH_MAX_SIZE', 32))
+
+
+def tflite_path(h5_path, backend):
+    """models/category_model.h5 -> models/category_model_fp16.tflite (or _int8)."""
+    variant = backend.split('-', 1)[1]
+    return f"{os.path.splitext(h5_path)[0]}_{variant}.tflite"
+
+
+def batch_buckets(max_batch):
+    """Powers of two below `max_batch`, then `max_batch` itself: (1, 2, 4, ..., max_batch)."""
+    buckets = []
+    size = 1
+    while size < max_batch:
+        buckets.append(size)
+        size *= 2
+    return tuple(buckets) + (max(1, max_batch),)
+
+
+def _interpreter_class():
+    # The standalone runtime is much smaller than full TensorFlow when it is installed
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class KerasModel:
+    def __init__(self, name, model, class_names):
+        import tensorflow as tf
+        self.name = name
+        self.backend = 'keras'
+        self.model = model
+        self.class_names = class_names
+        self._fn = tf.function(lambda x: model(x, training=False),
+                               input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)])
+
+    @classmethod
+    def load(cls, name, path, class_names):
+        import tensorflow as tf
+        return cls(name, tf.keras.models.load_model(path, compile=False), class_names)
+
+    def predict(self, batch):
+        """
+        Forward pass on a preprocessed float batch of shape (N, 224, 224, 3).
+        Multi-head models (dict outputs) return {head: probabilities}.
+        """
+        outputs = self._fn(np.asarray(batch, dtype=np.float32))
+        if isinstance(outputs, dict):
+            return {name: value.numpy() for name, value in outputs.items()}
+        return outputs.numpy()
+
+    def warmup(self, batch_sizes):
+        for size in batch_sizes:
+            self.predict(np.zeros((size,) + INPUT_SHAPE, dtype=np.float32))
+
+
+class TFLiteModel:
+    """
+    A fixed pool of TFLite interpreter sets over one .tflite file. Each set
+    holds one interpreter per batch bucket, allocated on first use (warmup
+    allocates the buckets of the batch sizes it is given), and serves one
+    call at a time.
+    """
+
+    def __init__(self, name, path, class_names, backend, pool_size=TFLITE_POOL_SIZE,
+                 num_threads=TFLITE_NUM_THREADS, max_batch=TFLITE_MAX_BATCH):
+        self._interpreter_class = _interpreter_class()
+        self.name = name
+        self.backend = backend
+        self.path = path
+        self.class_names = class_names
+        self.num_threads = num_threads
+        self.buckets = batch_buckets(max_batch)
+        self._pool = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            self._pool.put({})  # bucket size -> interpreter
+
+    @classmethod
+    def load(cls, name, path, class_names, backend):
+        return cls(name, path, class_names, backend)
+
+    def _interpreter(self, interpreters, size):
+        interpreter = interpreters.get(size)
+        if interpreter is None:
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=self.num_threads)
+            input_detail = interpreter.get_input_details()[0]
+            if tuple(input_detail['shape']) != (size,) + INPUT_SHAPE:
+                interpreter.resize_tensor_input(input_detail['index'], (size,) + INPUT_SHAPE)
+            interpreter.allocate_tensors()
+            interpreters[size] = interpreter
+        return interpreter
+
+    @staticmethod
+    def _invoke(interpreter, batch):
+        input_detail = interpreter.get_input_details()[0]
+        output_detail = interpreter.get_output_details()[0]
+        if input_detail['dtype'] != np.float32:
+            # Fully integer models take quantized input
+            scale, zero_point = input_detail['quantization']
+            batch = np.round(batch / scale + zero_point).astype(input_detail['dtype'])
+        interpreter.set_tensor(input_detail['index'], batch)
+        interpreter.invoke()
+        out = interpreter.get_tensor(output_detail['index'])
+        if output_detail['dtype'] != np.float32:
+            scale, zero_point = output_detail['quantization']
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+    def _run(self, interpreters, batch):
+        outputs = []
+        largest = self.buckets[-1]
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            n = len(chunk)
+            size = self._bucket(n)
+            if size != n:
+                padded = np.zeros((size,) + chunk.shape[1:], dtype=np.float32)
+                padded[:n] = chunk
+                chunk = padded
+            # Copied, so the result doesn't alias the interpreter's output buffer
+            outputs.append(self._invoke(self._interpreter(interpreters, size), chunk)[:n].copy())
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        interpreters = self._pool.get()
+        try:
+            return self._run(interpreters, batch)
+        finally:
+            self._pool.put(interpreters)
+
+    def _bucket(self, n):
+        return next(bucket for bucket in self.buckets if bucket >= n)
+
+    def warmup(self, batch_sizes):
+        # Only the buckets the batching engine is expected to emit; the rest allocate on first use
+        sizes = sorted({self._bucket(min(max(1, size), self.buckets[-1])) for size in batch_sizes})
+        sets = [self._pool.get() for _ in range(self._pool.qsize())]
+        try:
+            for size in sizes:
+                for interpreters in sets:
+                    self._run(interpreters, np.zeros((size,) + INPUT_SHAPE, dtype=np.float32))
+        finally:
+            for interpreters in sets:
+                self._pool.put(interpreters)
+
+
+def load_model(name, h5_path, class_names, backend='keras'):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'keras':
+        return KerasModel.load(name, h5_path, class_names)
+    return TFLiteModel.load(name, tflite_path(h5_path, backend), class_names, backend)
@@ -0,0 +1,669 @@
+"""
+Out-of-process inference pool shared by every API worker on a node.
+
+One pool server holds a fixed number of model processes. With several
+uvicorn workers, they all talk to this pool over a local socket, so the
+node keeps N model copies however many HTTP workers it runs, and the API
+workers never import TensorFlow.
+
+    python -m app.inference_pool --workers 4 --address /run/ai-service/pool.sock
+    INFERENCE_POOL_ADDRESS=/run/ai-service/pool.sock uvicorn main:app --workers 8
+
+Tensors never go through the socket. Each client connection owns one
+SharedMemory segment sized for a full batch. The client writes the batch
+there (uint8 images or preprocessed float32), sends only the segment name
+and the shape, and reads the probabilities back from the same segment.
+
+The control channel carries length-prefixed JSON frames, never pickle, and
+both ends prove they hold the pool's authkey (an HMAC challenge-response)
+before anything else is exchanged. A Unix socket is created in a private
+0700 directory. Unless INFERENCE_POOL_AUTHKEY is set, the pool generates a
+random key into a 0600 file next to the socket for clients of the same
+user to read. A TCP address requires INFERENCE_POOL_AUTHKEY.
+
+Nothing waits forever. A request that finds no free model process within
+INFERENCE_POOL_TIMEOUT_S fails. A model process that doesn't answer within
+that time is killed and replaced, and its request fails. A crashed process
+is replaced too (with backoff if it keeps failing to load), and the request
+it was running is retried once on another process. Clients keep up to
+INFERENCE_POOL_CONNECTIONS connections, so one slow call doesn't serialize
+the rest. A connection that times out is discarded along with its segment.
+"""
+import argparse
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import secrets
+import signal
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+INPUT_SHAPE = (224, 224, 3)
+# The default socket lives in a per-user directory that only its owner can enter
+POOL_ADDRESS = os.environ.get('INFERENCE_POOL_ADDRESS') or os.path.join(
+    tempfile.gettempdir(), f"ai-service-inference-{os.getuid()}", 'pool.sock')
+POOL_MAX_BATCH = int(os.environ.get('BATCH_MAX_SIZE', 32))
+# Intra-op threads per model process; the pool gets available cores // this many processes
+POOL_THREADS_PER_WORKER = int(os.environ.get('INFERENCE_POOL_THREADS_PER_WORKER', 2))
+# Longest a request may wait for a free model process, and longest a model process may take to answer it
+POOL_TIMEOUT_S = float(os.environ.get('INFERENCE_POOL_TIMEOUT_S', 30.0))
+# Connections (each with its own segment) one API process keeps to the pool
+POOL_CONNECTIONS = int(os.environ.get('INFERENCE_POOL_CONNECTIONS', 4))
+WORKER_LOAD_TIMEOUT_S = 300.0
+MAX_RESTART_BACKOFF_S = 30.0
+HANDSHAKE_TIMEOUT_S = 5.0
+# Client segments each model process keeps attached
+MAX_ATTACHED_SEGMENTS = 64
+# Control frames are small JSON objects; anything bigger is not a client of ours
+MAX_FRAME_BYTES = 64 * 1024
+KEY_FILE_NAME = 'authkey'
+DTYPES = ('|u1', '<f4')
+SEGMENT_NAME = re.compile(r'[A-Za-z0-9_.-]{1,200}')
+_FRAME_HEADER = struct.Struct('!I')
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(threads_per_worker=POOL_THREADS_PER_WORKER):
+    return max(1, available_cores() // max(1, threads_per_worker))
+
+
+def parse_address(address):
+    """'host:port' for TCP on localhost setups, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and not address.startswith('/'):
+        return (host, int(port))
+    return address
+
+
+def _private_dir(path, create=False):
+    """Makes sure `path` is a directory only this user can enter (created 0700 if asked)."""
+    if create:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be a directory owned by this user with mode 0700")
+    return path
+
+
+def resolve_authkey(address, create=False):
+    """
+    INFERENCE_POOL_AUTHKEY when set. Otherwise a Unix-socket pool uses the key
+    file next to its socket: the pool writes a fresh random one (`create`),
+    clients read it. TCP pools must be given a key.
+    """
+    key = os.environ.get('INFERENCE_POOL_AUTHKEY')
+    if key:
+        return key.encode()
+    if not isinstance(address, str):
+        raise RuntimeError("Set INFERENCE_POOL_AUTHKEY to serve or reach the inference pool over TCP")
+    directory = _private_dir(os.path.dirname(os.path.abspath(address)), create=create)
+    key_path = os.path.join(directory, KEY_FILE_NAME)
+    if create:
+        key = secrets.token_hex(32)
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(key)
+        return key.encode()
+    with open(key_path, 'r') as f:
+        return f.read().strip().encode()
+
+
+def _digest(authkey, role, challenge):
+    # The role keeps one side's answer from being replayed as the other's
+    return hmac.new(authkey, role + bytes.fromhex(challenge), hashlib.sha256).hexdigest()
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise EOFError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(_FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    size, = _FRAME_HEADER.unpack(_recv_exact(sock, _FRAME_HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ConnectionError(f"control frame of {size} bytes exceeds {MAX_FRAME_BYTES}")
+    message = json.loads(_recv_exact(sock, size))
+    if not isinstance(message, dict):
+        raise ConnectionError("control frames must be JSON objects")
+    return message
+
+
+def _attach(name):
+    """Attaches to a client's segment without letting this process's resource tracker unlink it."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _worker_main(model_name, conn, threads):
+    """
+    Entry point of one model process: load, report ready, then serve
+    (segment, n, dtype, offset) requests from the pool over its private pipe.
+    """
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['TFLITE_NUM_THREADS'] = str(threads)
+    os.environ['TFLITE_POOL_SIZE'] = '1'
+    from app.model_registry import registry
+    from preprocessing.image_utils import preprocess_input
+
+    registry.pool_address = None  # this process *is* the pool
+    try:
+        loaded = registry.get(model_name)
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', [str(name) for name in loaded.class_names]))
+
+    segments = OrderedDict()
+    while True:
+        try:
+            shm_name, n, dtype, out_offset = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            shm = segments.pop(shm_name, None) or _attach(shm_name)
+            segments[shm_name] = shm
+            while len(segments) > MAX_ATTACHED_SEGMENTS:
+                segments.popitem(last=False)[1].close()
+            batch = np.ndarray((n,) + INPUT_SHAPE, dtype=np.dtype(dtype), buffer=shm.buf)
+            if batch.dtype == np.uint8:
+                batch = preprocess_input(batch)  # converts to a new float32 array
+            preds = np.asarray(loaded.predict(batch), dtype=np.float32)
+            if out_offset + preds.nbytes > shm.size:
+                raise ValueError(f"segment {shm_name} has no room for {preds.shape} outputs")
+            np.ndarray(preds.shape, dtype=np.float32, buffer=shm.buf, offset=out_offset)[:] = preds
+            del batch
+            conn.send(('ok', preds.shape[1]))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class _Job:
+    def __init__(self, message):
+        self.message = message
+        self.attempts = 0
+        self.reply = None
+        self.done = threading.Event()
+        self._state = 'queued'
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Claims a queued job for a model process; False if its client already gave up on it."""
+        with self._lock:
+            if self._state != 'queued':
+                return False
+            self._state = 'running'
+            return True
+
+    def requeue(self):
+        with self._lock:
+            self._state = 'queued'
+
+    def cancel(self):
+        """Withdraws the job if no model process has picked it up yet."""
+        with self._lock:
+            if self._state != 'queued':
+                return False
+            self._state = 'cancelled'
+            return True
+
+    def finish(self, reply):
+        self.reply = reply
+        self.done.set()
+
+
+class InferencePool:
+    """Pool server: accepts API-worker connections and dispatches their batches to model processes."""
+
+    def __init__(self, model_name='category', address=POOL_ADDRESS, workers=None,
+                 threads_per_worker=POOL_THREADS_PER_WORKER, max_batch=POOL_MAX_BATCH, authkey=None,
+                 timeout=POOL_TIMEOUT_S):
+        self.model_name = model_name
+        self.address = parse_address(address)
+        self.workers = workers or default_workers(threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.max_batch = max_batch
+        self.authkey = authkey
+        self.timeout = timeout
+        if self.authkey is None and not isinstance(self.address, str):
+            self.authkey = resolve_authkey(self.address)  # fails before any model is loaded
+        self.class_names = None
+        self._ctx = get_context('spawn')  # TensorFlow is not fork-safe
+        self._jobs = queue.Queue()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._listener = None
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'errors': 0, 'timeouts': 0, 'restarts': 0, 'clients': 0,
+                       'auth_failures': 0, 'workers_alive': 0}
+
+    def _spawn(self, slot):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, name=f"inference-worker-{slot}",
+                                    args=(self.model_name, child_conn, self.threads_per_worker), daemon=True)
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(WORKER_LOAD_TIMEOUT_S):
+            process.kill()
+            raise RuntimeError(f"worker {slot} did not load within {WORKER_LOAD_TIMEOUT_S:.0f}s")
+        status, payload = parent_conn.recv()
+        if status != 'ready':
+            process.join(timeout=5)
+            raise RuntimeError(f"worker {slot} failed to load: {payload}")
+        if self.class_names is None:
+            self.class_names = payload
+            self._ready.set()
+        return process, parent_conn
+
+    def _supervise(self, slot):
+        """Keeps one model process alive and feeds it jobs one at a time."""
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                process, conn = self._spawn(slot)
+            except (RuntimeError, EOFError, OSError) as e:
+                print(f"Warning: Inference worker {slot} - {e}; retrying in {backoff:.1f}s")
+                self._count('restarts')
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RESTART_BACKOFF_S)
+                continue
+            backoff = 0.5
+            self._count('workers_alive')
+            try:
+                self._serve_jobs(slot, process, conn)
+            finally:
+                self._count('workers_alive', -1)
+                conn.close()
+                if process.is_alive():
+                    process.terminate()
+                process.join(timeout=5)
+
+    def _serve_jobs(self, slot, process, conn):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if not job.start():
+                continue  # its client timed out while it was queued
+            try:
+                conn.send(job.message)
+                if not conn.poll(self.timeout):
+                    print(f"Warning: Inference worker {slot} (pid {process.pid}) hung for "
+                          f"{self.timeout:.0f}s; restarting")
+                    self._count('restarts')
+                    process.kill()
+                    job.finish(('error', f"inference timed out after {self.timeout:.0f}s"))
+                    return
+                reply = conn.recv()
+            except (EOFError, OSError):
+                print(f"Warning: Inference worker {slot} (pid {process.pid}) died; restarting")
+                self._count('restarts')
+                job.attempts += 1
+                if job.attempts < 2:
+                    job.requeue()
+                    self._jobs.put(job)  # let another process retry it once
+                else:
+                    job.finish(('error', 'inference worker crashed'))
+                return
+            job.finish(reply)
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self._stats[key] += delta
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(model=self.model_name, workers=self.workers, queued=self._jobs.qsize())
+        return stats
+
+    def _wait(self, job):
+        timeout = self.timeout
+        while not job.done.wait(timeout):
+            if job.cancel():
+                self._count('timeouts')
+                return ('error', f"no inference worker free within {self.timeout:.0f}s")
+            # Running: the supervisor answers or kills the process within its own timeout
+            timeout = self.timeout
+        return job.reply
+
+    def _parse_predict(self, message):
+        segment, n = message.get('segment'), message.get('n')
+        dtype, out_offset = message.get('dtype'), message.get('out_offset')
+        if not isinstance(segment, str) or not SEGMENT_NAME.fullmatch(segment):
+            raise ValueError("invalid segment name")
+        if type(n) is not int or not 0 < n <= self.max_batch:
+            raise ValueError(f"'n' must be between 1 and {self.max_batch}")
+        if dtype not in DTYPES:
+            raise ValueError(f"'dtype' must be one of {DTYPES}")
+        if type(out_offset) is not int or out_offset < n * int(np.prod(INPUT_SHAPE)) * np.dtype(dtype).itemsize:
+            raise ValueError("'out_offset' overlaps the input batch")
+        return segment, n, dtype, out_offset
+
+    def _handshake(self, sock):
+        challenge = secrets.token_hex(16)
+        send_message(sock, {'challenge': challenge})
+        reply = recv_message(sock)
+        answer, client_challenge = reply.get('auth'), reply.get('challenge')
+        if not isinstance(answer, str) or not isinstance(client_challenge, str) \
+                or not hmac.compare_digest(answer, _digest(self.authkey, b'client', challenge)):
+            self._count('auth_failures')
+            return False
+        send_message(sock, {'auth': _digest(self.authkey, b'server', client_challenge),
+                            'model': self.model_name, 'class_names': self.class_names,
+                            'max_batch': self.max_batch, 'input_shape': INPUT_SHAPE})
+        return True
+
+    def _handle_client(self, sock):
+        self._count('clients')
+        try:
+            # A peer that never completes the handshake can't hold the thread
+            sock.settimeout(HANDSHAKE_TIMEOUT_S)
+            if not self._handshake(sock):
+                return
+            sock.settimeout(None)
+            while True:
+                message = recv_message(sock)
+                if message.get('op') == 'stats':
+                    send_message(sock, self.stats())
+                    continue
+                try:
+                    if message.get('op') != 'predict':
+                        raise ValueError(f"unknown op {message.get('op')!r}")
+                    job = _Job(self._parse_predict(message))
+                except ValueError as e:
+                    send_message(sock, {'status': 'error', 'error': str(e)})
+                    continue
+                self._jobs.put(job)
+                status, payload = self._wait(job)
+                self._count('requests')
+                if status != 'ok':
+                    self._count('errors')
+                    send_message(sock, {'status': 'error', 'error': payload})
+                else:
+                    send_message(sock, {'status': 'ok', 'classes': payload})
+        except (EOFError, OSError, ValueError):
+            pass  # disconnects, timeouts and garbage frames all just end the connection
+        finally:
+            self._count('clients', -1)
+            sock.close()
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.settimeout(HANDSHAKE_TIMEOUT_S)
+        try:
+            probe.connect(self.address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.address)  # left behind by a pool that didn't shut down cleanly
+        except OSError:
+            pass
+        else:
+            raise RuntimeError(f"An inference pool is already listening on {self.address}")
+        finally:
+            probe.close()
+
+    def _listen(self):
+        if not isinstance(self.address, str):
+            return socket.create_server(self.address, backlog=128)
+        if self.authkey is None:
+            self.authkey = resolve_authkey(self.address, create=True)
+        else:
+            _private_dir(os.path.dirname(os.path.abspath(self.address)), create=True)
+        self._remove_stale_socket()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.address)
+        os.chmod(self.address, 0o600)
+        listener.listen(128)
+        return listener
+
+    def serve_forever(self):
+        for slot in range(self.workers):
+            threading.Thread(target=self._supervise, args=(slot,), name=f"supervise-{slot}", daemon=True).start()
+        # Clients are told the class names on connect, so wait for the first model
+        self._ready.wait()
+        self._listener = self._listen()
+        print(f"Inference pool for '{self.model_name}' serving on {self.address} with {self.workers} workers")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    sock, _ = self._listener.accept()
+                except OSError:
+                    if self._stopping.is_set():
+                        break
+                    continue
+                threading.Thread(target=self._handle_client, args=(sock,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        for _ in range(self.workers):
+            self._jobs.put(None)
+        if self._listener is not None:
+            self._listener.close()
+            if isinstance(self.address, str):
+                try:
+                    os.unlink(self.address)
+                except FileNotFoundError:
+                    pass
+
+
+class _Channel:
+    """One authenticated connection to the pool plus the segment its batches travel through."""
+
+    def __init__(self, address, authkey, timeout):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(HANDSHAKE_TIMEOUT_S)
+            try:
+                self.sock.connect(address)
+            except OSError:
+                self.sock.close()
+                raise
+        else:
+            self.sock = socket.create_connection(address, timeout=HANDSHAKE_TIMEOUT_S)
+        self.shm = None
+        try:
+            self.hello = self._handshake(authkey)
+            self.sock.settimeout(timeout)
+            # Room for a float32 batch, followed by the float32 probabilities
+            max_batch = self.hello['max_batch']
+            self.out_offset = max_batch * int(np.prod(INPUT_SHAPE)) * 4
+            self.shm = SharedMemory(create=True, size=self.out_offset + max_batch * len(self.hello['class_names']) * 4)
+        except BaseException:
+            self.close()
+            raise
+
+    def _handshake(self, authkey):
+        challenge = recv_message(self.sock)['challenge']
+        mine = secrets.token_hex(16)
+        send_message(self.sock, {'auth': _digest(authkey, b'client', challenge), 'challenge': mine})
+        try:
+            hello = recv_message(self.sock)
+        except EOFError:
+            raise ConnectionError("Inference pool rejected our authkey (is INFERENCE_POOL_AUTHKEY the same?)")
+        if not hmac.compare_digest(str(hello.get('auth', '')), _digest(authkey, b'server', mine)):
+            raise ConnectionError("Inference pool failed authentication (is INFERENCE_POOL_AUTHKEY the same?)")
+        return hello
+
+    def request(self, message):
+        send_message(self.sock, message)
+        return recv_message(self.sock)
+
+    def close(self):
+        self.sock.close()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class RemoteModel:
+    """
+    Client side of the pool, with the same predict/warmup/class_names surface
+    as the local backends, so the registry can hand it out in their place.
+    Up to `connections` calls run at once, each on its own connection.
+    """
+    # predict() takes raw uint8 images; the model process applies preprocess_input
+    accepts_uint8 = True
+
+    def __init__(self, name, address=POOL_ADDRESS, authkey=None, connections=POOL_CONNECTIONS,
+                 timeout=POOL_TIMEOUT_S):
+        self.name = name
+        self.backend = 'pool'
+        self.address = parse_address(address)
+        self.authkey = authkey
+        # Covers the pool's wait for a free model process plus the model process's own limit
+        self.timeout = 2 * timeout + HANDSHAKE_TIMEOUT_S
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, connections))
+        self._closed = False
+        self._idle.put(self._open())
+        atexit.register(self.close)
+
+    def _open(self):
+        # Re-read every time: a restarted pool writes a new key file
+        authkey = self.authkey or resolve_authkey(self.address)
+        channel = _Channel(self.address, authkey, self.timeout)
+        hello = channel.hello
+        if hello['model'] != self.name:
+            channel.close()
+            raise RuntimeError(f"Inference pool at {self.address} serves '{hello['model']}', not '{self.name}'")
+        self.class_names = np.array(hello['class_names'], dtype=object)
+        self.max_batch = hello['max_batch']
+        return channel
+
+    @contextmanager
+    def _channel(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free inference pool connection within {self.timeout:.0f}s")
+        try:
+            try:
+                channel = self._idle.get_nowait()
+            except queue.Empty:
+                channel = self._open()
+            try:
+                yield channel
+            except (EOFError, OSError, ValueError):
+                # A reply may still be in flight; the connection can't be reused
+                channel.close()
+                raise
+            if self._closed:
+                channel.close()
+            else:
+                self._idle.put(channel)
+        finally:
+            self._slots.release()
+
+    def _predict_chunk(self, chunk):
+        with self._channel() as channel:
+            np.ndarray(chunk.shape, dtype=chunk.dtype, buffer=channel.shm.buf)[:] = chunk
+            reply = channel.request({'op': 'predict', 'segment': channel.shm.name, 'n': len(chunk),
+                                     'dtype': chunk.dtype.str, 'out_offset': channel.out_offset})
+            if reply.get('status') == 'ok':
+                return np.ndarray((len(chunk), reply['classes']), dtype=np.float32, buffer=channel.shm.buf,
+                                  offset=channel.out_offset).copy()
+        raise RuntimeError(f"Inference pool error: {reply.get('error')}")
+
+    def predict(self, batch):
+        """uint8 images or preprocessed float32, shape (N, 224, 224, 3); batches larger than the pool's are split."""
+        batch = np.asarray(batch)
+        if batch.dtype not in (np.uint8, np.float32):
+            batch = batch.astype(np.float32)
+        outputs = []
+        for start in range(0, len(batch), self.max_batch):
+            chunk = batch[start:start + self.max_batch]
+            try:
+                outputs.append(self._predict_chunk(chunk))
+            except socket.timeout:
+                # The pool is stuck, not gone; fail this batch rather than pile more onto it
+                raise TimeoutError(f"Inference pool did not answer within {self.timeout:.0f}s")
+            except (EOFError, OSError):
+                # The pool restarted; retry once on a fresh connection
+                outputs.append(self._predict_chunk(chunk))
+        return np.concatenate(outputs) if outputs else np.zeros((0, len(self.class_names)), dtype=np.float32)
+
+    def warmup(self, batch_sizes):
+        for size in batch_sizes:
+            self.predict(np.zeros((size,) + INPUT_SHAPE, dtype=np.uint8))
+
+    def stats(self):
+        with self._channel() as channel:
+            return channel.request({'op': 'stats'})
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared inference pool")
+    parser.add_argument('--model', default='category')
+    parser.add_argument('--address', default=POOL_ADDRESS,
+                        help="Unix socket path or host:port (TCP requires INFERENCE_POOL_AUTHKEY)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Model processes (default: available cores // --threads-per-worker)")
+    parser.add_argument('--threads-per-worker', type=int, default=POOL_THREADS_PER_WORKER)
+    parser.add_argument('--max-batch', type=int, default=POOL_MAX_BATCH)
+    parser.add_argument('--timeout', type=float, default=POOL_TIMEOUT_S,
+                        help="Seconds a request may wait for, and then run on, a model process")
+    args = parser.parse_args()
+
+    pool = InferencePool(args.model, args.address, args.workers, args.threads_per_worker, args.max_batch,
+                         timeout=args.timeout)
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        pool.serve_forever()
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Per-stage latency histograms, error counters and an opt-in sampling profiler.
+
+Code marks the stages it wants to see with `span('predict.decode')`; the
+duration goes into a histogram labelled by stage, and an exception leaving
+the span is counted by stage and exception type before it propagates.
+`render()` emits everything in the Prometheus text exposition format for
+/metrics.
+
+The profiler samples every thread's Python stack at a fixed interval while a
+request is running and writes the samples as collapsed stacks
+("frame;frame;frame count" per line), the input format of flamegraph.pl and
+speedscope.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; roughly log-spaced from sub-millisecond lookups to multi-second batches
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache', 'profiles'))
+PROFILE_INTERVAL_S = float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000.0
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(BUCKETS, value)
+        if i < len(BUCKETS):
+            self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+def _labels(pairs):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    def __init__(self, prefix='ai_service'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}    # stage -> Histogram
+        self._errors = {}    # (stage, exception type) -> count
+        self._requests = {}  # (method, endpoint, status) -> Histogram
+        self._collectors = []
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def count_error(self, stage, exc):
+        key = (stage, type(exc).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def observe_request(self, method, endpoint, status, seconds):
+        key = (method, endpoint, str(status))
+        with self._lock:
+            hist = self._requests.get(key)
+            if hist is None:
+                hist = self._requests[key] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """Times the block under `stage`; exceptions are counted and re-raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.count_error(stage, e)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def add_collector(self, fn, prefix='', counters=()):
+        """
+        `fn()` returns {name: number}, exported at render time as `prefix` +
+        name. Names in `counters` only ever grow and are exported as counters
+        (with a `_total` suffix); everything else is a gauge.
+        """
+        self._collectors.append((fn, prefix, frozenset(counters)))
+
+    def _histogram_lines(self, name, series):
+        for labels, hist in series:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist.counts):
+                cumulative += count
+                yield f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}"
+            yield f"{name}_bucket{_labels(labels + [('le', '+Inf')])} {hist.total}"
+            yield f"{name}_sum{_labels(labels)} {hist.sum}"
+            yield f"{name}_count{_labels(labels)} {hist.total}"
+
+    def render(self):
+        p = self.prefix
+        with self._lock:
+            stages = [([('stage', stage)], _copy(hist)) for stage, hist in sorted(self._stages.items())]
+            requests = [([('method', m), ('endpoint', e), ('status', s)], _copy(hist))
+                        for (m, e, s), hist in sorted(self._requests.items())]
+            errors = sorted(self._errors.items())
+
+        lines = [f"# HELP {p}_request_seconds HTTP request latency by endpoint and status.",
+                 f"# TYPE {p}_request_seconds histogram"]
+        lines += self._histogram_lines(f"{p}_request_seconds", requests)
+        lines += [f"# HELP {p}_stage_seconds Latency of instrumented stages inside a request.",
+                  f"# TYPE {p}_stage_seconds histogram"]
+        lines += self._histogram_lines(f"{p}_stage_seconds", stages)
+        lines += [f"# HELP {p}_stage_errors_total Exceptions raised inside a stage, by type.",
+                  f"# TYPE {p}_stage_errors_total counter"]
+        lines += [f"{p}_stage_errors_total{_labels([('stage', stage), ('exception', exc)])} {count}"
+                  for (stage, exc), count in errors]
+        for fn, prefix, counters in self._collectors:
+            try:
+                values = fn()
+            except Exception as e:
+                self.count_error('metrics.collect', e)
+                continue
+            for name, value in sorted(values.items()):
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                if name in counters:
+                    lines += [f"# TYPE {p}_{prefix}{name}_total counter", f"{p}_{prefix}{name}_total {value}"]
+                else:
+                    lines += [f"# TYPE {p}_{prefix}{name} gauge", f"{p}_{prefix}{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(hist):
+    copy = Histogram()
+    copy.counts, copy.total, copy.sum = list(hist.counts), hist.total, hist.sum
+    return copy
+
+
+class SamplingProfiler:
+    """Samples all Python threads' stacks from a background thread until stopped."""
+
+    def __init__(self, interval_s=PROFILE_INTERVAL_S):
+        self.interval_s = interval_s
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def dump(self, label, directory=PROFILE_DIR):
+        """Writes the collapsed stacks to `directory` and returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}-{time.time_ns() % 10**9}.folded")
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        return path
+
+
+metrics = Metrics()
+span = metrics.span
@@ -0,0 +1,157 @@
+"""
+Central registry for the serving models.
+
+Each model is loaded at most once per process and shared by every module
+that needs it. TensorFlow is only imported when the first model is actually
+loaded, so importing main.py stays cheap. After loading, the model is wrapped
+by the configured inference backend (Keras with a fixed (None, 224, 224, 3)
+float32 input signature, or a TFLite interpreter pool) and warmed up, so
+the first real request does not pay for graph tracing or allocation.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.inference_backend import load_model
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+# keras (the .h5 model), tflite-fp16 or tflite-int8 (see app/export_tflite.py)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+# When set, these models are served by the shared out-of-process pool (app/inference_pool.py)
+INFERENCE_POOL_ADDRESS = os.environ.get('INFERENCE_POOL_ADDRESS')
+INFERENCE_POOL_MODELS = os.environ.get('INFERENCE_POOL_MODELS', 'category').split(',')
+# Batch sizes exercised during warmup; the batching engine produces sizes up to its max
+WARMUP_BATCH_SIZES = (1, int(os.environ.get('BATCH_MAX_SIZE', 32)))
+# After a failed load, get() fails fast until the retry time; the wait doubles per failure up to the max
+LOAD_RETRY_INITIAL_S = float(os.environ.get('MODEL_LOAD_RETRY_INITIAL_S', 1.0))
+LOAD_RETRY_MAX_S = float(os.environ.get('MODEL_LOAD_RETRY_MAX_S', 60.0))
+
+
+def load_class_names(path):
+    """Labels saved next to a model: .npy for one head, .json {head: labels} for multi-head models."""
+    if not path:
+        return None
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            return {head: np.array(labels, dtype=object) for head, labels in json.load(f).items()}
+    return np.load(path, allow_pickle=True)
+
+
+class ModelRegistry:
+    def __init__(self, backend=INFERENCE_BACKEND, pool_address=INFERENCE_POOL_ADDRESS):
+        self.backend = backend
+        self.pool_address = pool_address
+        self._specs = {}
+        self._models = {}
+        self._errors = {}
+        self._retry_at = {}  # name -> (time.monotonic() of the next attempt, current backoff)
+        self._locks = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, classes_path=None):
+        with self._lock:
+            self._specs[name] = (path, classes_path)
+            self._locks.setdefault(name, threading.Lock())
+
+    def install(self, name, loaded):
+        """Serves an already-built model under `name` (e.g. a stand-in for benchmarks)."""
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+        self._errors.pop(name, None)
+        self._retry_at.pop(name, None)
+        self._models[name] = loaded
+
+    def _check_backoff(self, name):
+        retry = self._retry_at.get(name)
+        if retry is not None and time.monotonic() < retry[0]:
+            raise RuntimeError(f"Model '{name}' is unavailable ({self._errors.get(name)}); "
+                               f"retrying in {retry[0] - time.monotonic():.1f}s")
+
+    def get(self, name):
+        """
+        Returns the backend model for `name`, loading and warming it up on
+        first use. After a failed load, calls fail fast until the backoff
+        expires, then the next one tries again.
+        """
+        loaded = self._models.get(name)
+        if loaded is not None:
+            return loaded
+        self._check_backoff(name)
+        with self._locks[name]:
+            if name not in self._models:
+                # Callers that queued behind a failed attempt share its backoff
+                self._check_backoff(name)
+                self._load(name)
+        return self._models[name]
+
+    def get_optional(self, name):
+        """Like get(), but returns None while the model can't be loaded (same retry backoff)."""
+        try:
+            return self.get(name)
+        except Exception:
+            return None
+
+    def _load(self, name):
+        path, classes_path = self._specs[name]
+        started = time.perf_counter()
+        try:
+            if self.pool_address and name in INFERENCE_POOL_MODELS:
+                # No TensorFlow in this process; the pool holds the model
+                from app.inference_pool import RemoteModel
+                loaded = RemoteModel(name, self.pool_address)
+            else:
+                class_names = load_class_names(classes_path)
+                loaded = load_model(name, path, class_names, backend=self.backend)
+            loaded_at = time.perf_counter()
+            loaded.warmup(WARMUP_BATCH_SIZES)
+        except Exception as e:
+            previous = self._retry_at.get(name)
+            backoff = min(LOAD_RETRY_MAX_S, previous[1] * 2) if previous else LOAD_RETRY_INITIAL_S
+            self._retry_at[name] = (time.monotonic() + backoff, backoff)
+            self._errors[name] = f"{type(e).__name__}: {e}"
+            print(f"Warning: Loading model '{name}' failed - {e}; retrying in {backoff:.1f}s")
+            raise
+        self._errors.pop(name, None)
+        self._retry_at.pop(name, None)
+        self._timings[name] = {'load_s': loaded_at - started, 'warmup_s': time.perf_counter() - loaded_at}
+        self._models[name] = loaded
+
+    def load_in_background(self, names):
+        """Loads and warms up `names` on a daemon thread; readiness flips once all succeed."""
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # Logged by _load, recorded in _errors and surfaced by status()
+        thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names):
+        return all(name in self._models for name in names)
+
+    def status(self, names):
+        return {
+            name: {
+                'ready': name in self._models,
+                'backend': getattr(self._models.get(name), 'backend', self.backend),
+                'error': self._errors.get(name),
+                **self._timings.get(name, {}),
+            }
+            for name in names
+        }
+
+
+registry = ModelRegistry()
+registry.register('category', os.path.join(MODELS_DIR, 'category_model.h5'),
+                  os.path.join(MODELS_DIR, 'category_classes.npy'))
+# Multi-head category + style tagger (training/image_tagging_train.py --multi-head)
+registry.register('tagging', os.path.join(MODELS_DIR, 'clothing_tagger.h5'),
+                  os.path.join(MODELS_DIR, 'clothing_tagger_labels.json'))
+# Pooled MobileNetV2 backbone for catalog similarity (app/build_similar_index.py)
+registry.register('embedding', os.path.join(MODELS_DIR, 'embedding_model.h5'))
@@ -1,7 +1,8 @@
+from app.advisor import get_engine
+
+# Rules now live in static/advisor_rules.json; see app/advisor.py
 def handle_user_question(question):
-    q = question.lower()
-    if "jean" in q and "wash" in q:
-        return {"tip": "Wash jeans in cold water and air dry for longevity."}
-    if "hole" in q and "repair" in q:
-        return {"tip": "Use an iron-on patch or hand-stitch small holes to extend garment life."}
-    return {"tip": "Try to repair, upcycle or donate clothing for sustainable fashion!"}
+    return get_engine().answer(question)
+
+def handle_user_questions(questions):
+    return get_engine().answer_many(questions)
@@ -1,53 +1,46 @@
+import asyncio
 import os
+from collections import OrderedDict
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-from PIL import Image
-import requests
-import io
-
-# Load trained model for re-categorization if needed
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'category_model.h5')
-CLASSES_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'category_classes.npy')
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    class_names = np.load(CLASSES_PATH, allow_pickle=True)
-except Exception as e:
-    model = None
-    class_names = []
-    print(f"Warning: Model loading failed - {e}. Using defaults for categorization.")
-
-# Expanded virtual catalog (unchanged from before)
-VIRTUAL_CATALOG = {
-    'Tops': [
-        {'_id': 'vc_top_casual_1', 'name': 'White Cotton T-Shirt', 'category': 'Tops', 'color': 'White', 'style': 'Casual', 'imageUrl': 'https://placehold.co/400x400/ffffff/000000?text=White+T-Shirt'},
-        {'_id': 'vc_top_work_1', 'name': 'Blue Button-Down Shirt', 'category': 'Tops', 'color': 'Blue', 'style': 'Work', 'imageUrl': 'https://placehold.co/400x400/0000ff/ffffff?text=Button-Down'},
-        {'_id': 'vc_top_party_1', 'name': 'Sequined Blouse', 'category': 'Tops', 'color': 'Silver', 'style': 'Party', 'imageUrl': 'https://placehold.co/400x400/c0c0c0/000000?text=Sequined+Blouse'},
-        {'_id': 'vc_top_formal_1', 'name': 'Black Blazer', 'category': 'Tops', 'color': 'Black', 'style': 'Formal', 'imageUrl': 'https://placehold.co/400x400/000000/ffffff?text=Black+Blazer'},
-    ],
-    'Bottoms': [
-        {'_id': 'vc_bottom_casual_1', 'name': 'Blue Jeans', 'category': 'Bottoms', 'color': 'Blue', 'style': 'Casual', 'imageUrl': 'https://placehold.co/400x400/0000ff/ffffff?text=Blue+Jeans'},
-        {'_id': 'vc_bottom_work_1', 'name': 'Gray Slacks', 'category': 'Bottoms', 'color': 'Gray', 'style': 'Work', 'imageUrl': 'https://placehold.co/400x400/808080/ffffff?text=Gray+Slacks'},
-        {'_id': 'vc_bottom_party_1', 'name': 'Red Mini Skirt', 'category': 'Bottoms', 'color': 'Red', 'style': 'Party', 'imageUrl': 'https://placehold.co/400x400/ff0000/ffffff?text=Red+Skirt'},
-        {'_id': 'vc_bottom_formal_1', 'name': 'Black Tailored Pants', 'category': 'Bottoms', 'color': 'Black', 'style': 'Formal', 'imageUrl': 'https://placehold.co/400x400/000000/ffffff?text=Tailored+Pants'},
-    ],
-    'Shoes': [
-        {'_id': 'vc_shoes_casual_1', 'name': 'White Sneakers', 'category': 'Shoes', 'color': 'White', 'style': 'Casual', 'imageUrl': 'https://placehold.co/400x400/ffffff/000000?text=White+Sneakers'},
-        {'_id': 'vc_shoes_work_1', 'name': 'Brown Loafers', 'category': 'Shoes', 'color': 'Brown', 'style': 'Work', 'imageUrl': 'https://placehold.co/400x400/8b4513/ffffff?text=Loafers'},
-        {'_id': 'vc_shoes_party_1', 'name': 'Gold Heels', 'category': 'Shoes', 'color': 'Gold', 'style': 'Party', 'imageUrl': 'https://placehold.co/400x400/ffd700/000000?text=Gold+Heels'},
-        {'_id': 'vc_shoes_formal_1', 'name': 'Black Oxfords', 'category': 'Shoes', 'color': 'Black', 'style': 'Formal', 'imageUrl': 'https://placehold.co/400x400/000000/ffffff?text=Oxfords'},
-    ]
-}
+from concurrent.futures import ThreadPoolExecutor
+from app.fetch import fetch_images
+from app.cache import prediction_cache, content_key
+from app.scoring import EncodedItems, best_triple, top_k_triples
+from app.model_registry import registry
+from app.metrics import metrics, span
+from app.similar_items import get_index as get_similar_index
+from app.catalog import get_catalog
+from app.admission import run_cpu
+from preprocessing.image_utils import load_image, to_batch
+
+# Largest number of outfits a single /generate-outfit call may ask for
+MAX_TOP_K = 50
+# Catalog items suggested per missing category when a similar-item index is built
+SIMILAR_SUGGESTIONS = int(os.environ.get('SIMILAR_SUGGESTIONS', 5))
+# Wardrobe garments embedded to query the index; the rest of the wardrobe is ignored
+SIMILAR_MAX_QUERY_ITEMS = int(os.environ.get('SIMILAR_MAX_QUERY_ITEMS', 16))
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', 4096))
+OUTFIT_CATEGORIES = ('Tops', 'Bottoms', 'Shoes')
+# Catalog items per category considered when the wardrobe has a gap and no similar-item suggestions
+CATALOG_FALLBACK_LIMIT = int(os.environ.get('CATALOG_FALLBACK_LIMIT', 12))
+
+# Decode pool for fetched wardrobe images; PIL releases the GIL while decoding
+_decode_pool = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 2), thread_name_prefix='outfit-decode')
+
+# imageUrl -> backbone embedding of the user's garments
+_embedding_cache = OrderedDict()
 
 # Scoring functions (with safeguards for empty lists)
+OCCASION_STYLES = {
+    'casual': ['Casual', 'Neutral', 'Work'],
+    'work': ['Work', 'Formal', 'Neutral', 'Casual'],
+    'party': ['Party', 'Casual', 'Neutral'],
+    'formal': ['Formal', 'Work', 'Neutral']
+}
+
 def occasion_filter(items, style_preference):
-    allowed_styles = {
-        'casual': ['Casual', 'Neutral', 'Work'],
-        'work': ['Work', 'Formal', 'Neutral', 'Casual'],
-        'party': ['Party', 'Casual', 'Neutral'],
-        'formal': ['Formal', 'Work', 'Neutral']
-    }.get(style_preference.lower(), ['Neutral'])
-    return [item for item in items if item.get('style', '').lower() in [s.lower() for s in allowed_styles]]
+    allowed_styles = OCCASION_STYLES.get(style_preference.lower(), ['Neutral'])
+    return [item for item in items if (item.get('style') or '').lower() in [s.lower() for s in allowed_styles]]
 
 def style_score(items, style_preference):
     if not items:
@@ -96,70 +89,283 @@ def body_type_score(items, height, weight):
             score += 3
     return score / len(items)
 
-def generate_outfit(payload):
+# Payload fields generate_outfit reads as strings, numbers and positive integers. Strings may be
+# absent but not null (generate_outfit lowercases them); the others may be absent or null
+STRING_FIELDS = ('style', 'body_color', 'wardrobe_id')
+NUMBER_FIELDS = ('height', 'weight')
+INTEGER_FIELDS = ('top_k', 'max_item_repeats')
+ITEM_STRING_FIELDS = ('_id', 'name', 'category', 'color', 'style', 'imageUrl')
+
+def validate_payload(payload):
+    """Raises ValueError with a client-facing message for fields generate_outfit can't use."""
+    for field in STRING_FIELDS:
+        if field in payload and not isinstance(payload[field], str):
+            raise ValueError(f"'{field}' must be a string")
+    for field in NUMBER_FIELDS:
+        value = payload.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValueError(f"'{field}' must be a number")
+    for field in INTEGER_FIELDS:
+        value = payload.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            raise ValueError(f"'{field}' must be a positive integer")
     wardrobe = payload.get('wardrobe', [])
-    style_preference = payload.get('style', 'Casual').lower()
-    height = payload.get('height')
-    weight = payload.get('weight')
-    body_color = payload.get('body_color', 'Neutral').lower()
+    if not isinstance(wardrobe, list) or any(not isinstance(item, dict) for item in wardrobe):
+        raise ValueError("'wardrobe' must be a list of objects")
+    for item in wardrobe:
+        for field in ITEM_STRING_FIELDS:
+            if item.get(field) is not None and not isinstance(item[field], str):
+                raise ValueError(f"Wardrobe item field '{field}' must be a string")
 
-    # Re-categorize wardrobe using trained model if categories are missing/inaccurate
+async def categorize_wardrobe(wardrobe, client=None):
+    """
+    Fills in missing categories in place. Images are fetched concurrently,
+    decoded in parallel and classified with one batched predict call.
+    """
+    # Trained model for re-categorization, shared with /predict-category via the registry
+    model = None
+    if any(not item.get('category') for item in wardrobe):
+        with span('outfit.model_load'):
+            model = await asyncio.get_running_loop().run_in_executor(None, registry.get_optional, 'category')
+    to_classify = []
     for item in wardrobe:
         if 'category' not in item or not item['category']:
             if model is not None and 'imageUrl' in item:
-                try:
-                    response = requests.get(item['imageUrl'], timeout=5)
-                    response.raise_for_status()
-                    img = Image.open(io.BytesIO(response.content)).convert('RGB').resize((224, 224))
-                    arr = preprocess_input(np.expand_dims(np.array(img), 0))
-                    preds = model.predict(arr)
-                    item['category'] = class_names[np.argmax(preds[0])]
-                except Exception as e:
-                    item['category'] = 'Unknown'  # Fallback to avoid crash
+                to_classify.append(item)
             else:
                 item['category'] = 'Tops'  # Default
+    if not to_classify:
+        return wardrobe
+
+    # Images fetched before resolve straight from the URL alias, no download needed
+    to_fetch = []
+    for item in to_classify:
+        cached = prediction_cache.get_url(item['imageUrl'])
+        if cached is not None:
+            item['category'] = cached
+        else:
+            to_fetch.append(item)
+    if not to_fetch:
+        return wardrobe
+
+    loop = asyncio.get_running_loop()
+    with span('outfit.fetch'):
+        blobs = await fetch_images([item['imageUrl'] for item in to_fetch], client=client)
+
+    # content key -> (image bytes, items showing that image)
+    to_decode = {}
+    for item in to_fetch:
+        blob = blobs.get(item['imageUrl'])
+        if blob is None:
+            item['category'] = 'Unknown'  # Fallback to avoid crash
+            continue
+        key = content_key(blob)
+        prediction_cache.put_url(item['imageUrl'], key)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            item['category'] = cached
+        else:
+            to_decode.setdefault(key, (blob, []))[1].append(item)
+
+    async def decode(blob):
+        try:
+            return await loop.run_in_executor(_decode_pool, load_image, blob)
+        except Exception as e:
+            metrics.count_error('outfit.decode', e)
+            return None
+
+    with span('outfit.decode'):
+        decoded = await asyncio.gather(*(decode(blob) for blob, _ in to_decode.values()))
+    ready = []
+    for (key, (_, items)), arr in zip(to_decode.items(), decoded):
+        if arr is None:
+            for item in items:
+                item['category'] = 'Unknown'
+        else:
+            ready.append((items, key, arr))
+    if not ready:
+        return wardrobe
 
-    # Filter wardrobe by occasion
-    tops = occasion_filter([item for item in wardrobe if item['category'] == 'Tops'], style_preference)
-    bottoms = occasion_filter([item for item in wardrobe if item['category'] == 'Bottoms'], style_preference)
-    shoes = occasion_filter([item for item in wardrobe if item['category'] == 'Shoes'], style_preference)
+    with span('outfit.preprocess'):
+        batch = to_batch([arr for _, _, arr in ready])
+    try:
+        with span('outfit.model'):
+            preds = await loop.run_in_executor(None, model.predict, batch)
+        for (items, key, _), row in zip(ready, preds):
+            category = model.class_names[np.argmax(row)]
+            prediction_cache.put(key, category)
+            for item in items:
+                item['category'] = category
+    except Exception:
+        for items, _, _ in ready:
+            for item in items:
+                item['category'] = 'Unknown'
+    return wardrobe
 
-    candidates = []
-    catalog_tops = [t for t in VIRTUAL_CATALOG['Tops'] if t['style'].lower() == style_preference]
-    catalog_bottoms = [b for b in VIRTUAL_CATALOG['Bottoms'] if b['style'].lower() == style_preference]
-    catalog_shoes = [s for s in VIRTUAL_CATALOG['Shoes'] if s['style'].lower() == style_preference]
+async def embed_wardrobe(items, client=None):
+    """(m, d) backbone embeddings of up to SIMILAR_MAX_QUERY_ITEMS garments, or None."""
+    urls = list(dict.fromkeys(item['imageUrl'] for item in items if item.get('imageUrl')))[:SIMILAR_MAX_QUERY_ITEMS]
+    vectors = {url: _embedding_cache[url] for url in urls if url in _embedding_cache}
+    missing = [url for url in urls if url not in vectors]
+    if missing:
+        loop = asyncio.get_running_loop()
+        with span('outfit.similar.model_load'):
+            model = await loop.run_in_executor(None, registry.get_optional, 'embedding')
+        if model is not None:
+            with span('outfit.similar.fetch'):
+                blobs = await fetch_images(missing, client=client)
+
+            async def decode(blob):
+                try:
+                    return await loop.run_in_executor(_decode_pool, load_image, blob)
+                except Exception as e:
+                    metrics.count_error('outfit.similar.decode', e)
+                    return None
+
+            fetched = [url for url in missing if blobs.get(url) is not None]
+            with span('outfit.similar.decode'):
+                decoded = await asyncio.gather(*(decode(blobs[url]) for url in fetched))
+            ready = [(url, arr) for url, arr in zip(fetched, decoded) if arr is not None]
+            if ready:
+                with span('outfit.similar.embed'):
+                    embeddings = await loop.run_in_executor(None, model.predict, to_batch([arr for _, arr in ready]))
+                for (url, _), vector in zip(ready, embeddings):
+                    vectors[url] = _embedding_cache[url] = vector
+                while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    _embedding_cache.popitem(last=False)
+    if not vectors:
+        return None
+    return np.stack([vectors[url] for url in urls if url in vectors])
+
+def missing_categories(payload, index=None):
+    """Outfit categories with no wardrobe item left after the occasion filter."""
+    style_preference = payload.get('style', 'Casual').lower()
+    if index is not None:
+        allowed = OCCASION_STYLES.get(style_preference, ['Neutral'])
+        return [category for category in OUTFIT_CATEGORIES if not index.select(category, allowed)[0]]
+    wardrobe = payload.get('wardrobe', [])
+    return [category for category in OUTFIT_CATEGORIES
+            if not occasion_filter([item for item in wardrobe if item.get('category') == category], style_preference)]
+
+async def suggest_similar(items, categories, style_preference, client=None):
+    """
+    {category: catalog items nearest to the user's garments} for the given
+    categories, restricted to `style_preference` like the virtual catalog
+    fallback. Empty when no index is built or no garment could be embedded.
+    """
+    similar_index = get_similar_index()
+    if similar_index is None or not categories:
+        return {}
+    queries = await embed_wardrobe(items, client=client)
+    if queries is None:
+        return {}
+    # A scan over memory-mapped float16 rows; keep it off the event loop
+    return await run_cpu(search_similar, similar_index, queries, categories, style_preference)
+
+def search_similar(similar_index, queries, categories, style_preference):
+    with span('outfit.similar.search'):
+        return {category: [dict(item, similarity=round(score, 4)) for item, score in
+                           similar_index.search(queries, category, SIMILAR_SUGGESTIONS, styles=[style_preference])]
+                for category in categories}
+
+async def generate_outfit(payload, client=None, index=None):
+    if index is None:
+        await categorize_wardrobe(payload.get('wardrobe', []), client=client)
+    suggestions = {}
+    if get_similar_index() is not None:
+        gaps = await run_cpu(missing_categories, payload, index)
+        if gaps:
+            items = index.items() if index is not None else payload.get('wardrobe', [])
+            suggestions = await suggest_similar(items, gaps, payload.get('style', 'Casual').lower(), client=client)
+    # Scoring is synchronous NumPy work; keep it off the event loop
+    return await run_cpu(build_outfit, payload, index, suggestions)
+
+def build_outfit(payload, index=None, suggestions=None):
+    """
+    Picks the best outfit(s) for `payload`. When a WardrobeIndex is given,
+    its pre-encoded partitions are used instead of payload['wardrobe'].
+    `suggestions` ({category: catalog items}, see suggest_similar) fills
+    wardrobe gaps ahead of the virtual catalog.
+    """
+    suggestions = suggestions or {}
+    style_preference = payload.get('style', 'Casual').lower()
+    height = payload.get('height')
+    weight = payload.get('weight')
+    body_color = payload.get('body_color', 'Neutral').lower()
+
+    with span('outfit.filter'):
+        if index is not None:
+            # Partitions are already keyed by (category, style); no per-request scan or re-encode
+            allowed = OCCASION_STYLES.get(style_preference, ['Neutral'])
+            (tops, enc_tops), (bottoms, enc_bottoms), (shoes, enc_shoes) = (
+                index.select(category, allowed) for category in ('Tops', 'Bottoms', 'Shoes'))
+        else:
+            wardrobe = payload.get('wardrobe', [])
+            for item in wardrobe:
+                if 'category' not in item or not item['category']:
+                    item['category'] = 'Tops'  # Default when called without categorize_wardrobe
+
+            # Filter wardrobe by occasion
+            tops = occasion_filter([item for item in wardrobe if item['category'] == 'Tops'], style_preference)
+            bottoms = occasion_filter([item for item in wardrobe if item['category'] == 'Bottoms'], style_preference)
+            shoes = occasion_filter([item for item in wardrobe if item['category'] == 'Shoes'], style_preference)
+            enc_tops = enc_bottoms = enc_shoes = None
+
+    # Only the categories the wardrobe can't fill are looked up, each an indexed (category, style) range
+    catalog = get_catalog()
+    catalog_tops, catalog_bottoms, catalog_shoes = (
+        (suggestions.get(category) or catalog.select(category, [style_preference], limit=CATALOG_FALLBACK_LIMIT))
+        if not own else []
+        for category, own in (('Tops', tops), ('Bottoms', bottoms), ('Shoes', shoes)))
 
     # Generate combinations (relaxed to allow more mixed results)
     sources_tops = tops if tops else catalog_tops
     sources_bottoms = bottoms if bottoms else catalog_bottoms
     sources_shoes = shoes if shoes else catalog_shoes
 
-    for top in sources_tops:
-        for bottom in sources_bottoms:
-            for shoe in sources_shoes:
-                current = [top, bottom, shoe]
-                num_suggested = sum(1 for i in current if '_id' in i and 'vc_' in i['_id'])
-                if num_suggested >= len(current):  # Avoid all-suggested, but allow partial
-                    continue
-                score = style_score(current, style_preference) + color_score(current, body_color) + body_type_score(current, height, weight)
-                candidates.append((current, score))
-
-    if not candidates:
+    top_k = payload.get('top_k')
+    # Reuse the index encodings where the wardrobe supplied the items; catalog fallbacks are tiny
+    with span('outfit.encode'):
+        encoded = tuple(enc if own and enc is not None else EncodedItems(src, from_catalog=not own)
+                        for own, enc, src in ((tops, enc_tops, sources_tops),
+                                              (bottoms, enc_bottoms, sources_bottoms),
+                                              (shoes, enc_shoes, sources_shoes)))
+    with span('outfit.score'):
+        if top_k is None:
+            # Score every triple at once; see app/scoring.py for the vectorized equivalent of
+            # style_score + color_score + body_type_score
+            best = best_triple(*encoded, style_preference, body_color, height, weight)
+            ranked = [best] if best is not None else []
+        else:
+            top_k = min(top_k, MAX_TOP_K)
+            max_item_repeats = payload.get('max_item_repeats')
+            ranked = top_k_triples(*encoded, top_k, style_preference, body_color, height, weight,
+                                   max_item_repeats=max_item_repeats)
+
+    if not ranked:
         # Fallback to a basic suggestion if nothing matches
-        fallback_top = catalog_tops[0] if catalog_tops else {'_id': 'fallback', 'name': 'Basic Top', 'category': 'Tops', 'color': 'White', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}
-        fallback_bottom = catalog_bottoms[0] if catalog_bottoms else {'_id': 'fallback', 'name': 'Basic Bottom', 'category': 'Bottoms', 'color': 'Black', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}
-        fallback_shoe = catalog_shoes[0] if catalog_shoes else {'_id': 'fallback', 'name': 'Basic Shoes', 'category': 'Shoes', 'color': 'Black', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}
-        best_outfit = [fallback_top, fallback_bottom, fallback_shoe]
-        best_score = 0
-        user_items = []
-        suggested_items = best_outfit
+        fallback_top = (catalog_tops or catalog.select('Tops', [style_preference], limit=1) or [{'_id': 'fallback', 'name': 'Basic Top', 'category': 'Tops', 'color': 'White', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}])[0]
+        fallback_bottom = (catalog_bottoms or catalog.select('Bottoms', [style_preference], limit=1) or [{'_id': 'fallback', 'name': 'Basic Bottom', 'category': 'Bottoms', 'color': 'Black', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}])[0]
+        fallback_shoe = (catalog_shoes or catalog.select('Shoes', [style_preference], limit=1) or [{'_id': 'fallback', 'name': 'Basic Shoes', 'category': 'Shoes', 'color': 'Black', 'style': style_preference, 'imageUrl': 'https://placehold.co/400x400'}])[0]
+        outfits = [{
+            "userItems": [],
+            "suggestedItems": [fallback_top, fallback_bottom, fallback_shoe],
+            "score": 0
+        }]
     else:
-        best_outfit, best_score = max(candidates, key=lambda x: x[1])
-        user_items = [item for item in best_outfit if '_id' in item and 'vc_' not in item['_id']]
-        suggested_items = [item for item in best_outfit if '_id' in item and 'vc_' in item['_id']]
+        from_catalog = (not tops, not bottoms, not shoes)
+        outfits = [_describe_outfit([sources_tops[t], sources_bottoms[b], sources_shoes[s]], score, from_catalog)
+                   for (t, b, s), score in ranked]
+
+    result = dict(outfits[0])
+    if top_k is not None:
+        result["outfits"] = outfits
+    return result
 
+def _describe_outfit(outfit, score, from_catalog=(False, False, False)):
+    # Catalog items are recognized by the slot they filled, not by their ids
     return {
-        "userItems": user_items,
-        "suggestedItems": suggested_items,
-        "score": best_score
+        "userItems": [item for item, catalog in zip(outfit, from_catalog) if '_id' in item and not catalog],
+        "suggestedItems": [item for item, catalog in zip(outfit, from_catalog) if '_id' in item and catalog],
+        "score": score
     }
@@ -1,29 +1,159 @@
-import numpy as np
-import tensorflow as tf
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-from PIL import Image
-import io
+import asyncio
 import os
+import zipfile
+import numpy as np
+from app.batching import BatchingEngine
+from app.cache import prediction_cache, content_key
+from app.model_registry import registry
+from app.metrics import metrics, span
+from app.admission import run_cpu, within_deadline
+from preprocessing.image_utils import load_image, preprocess_input
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'category_model.h5')
-CLASSES_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'category_classes.npy')
+engine = None
 
-model = None
-class_names = None
+# Images per bulk request; further files or archive members are ignored
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 2000))
+BULK_MAX_IMAGE_BYTES = int(os.environ.get('BULK_MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+# Images of one bulk request decoded/classified concurrently; a batch's worth keeps the model busy
+BULK_WINDOW = int(os.environ.get('BULK_WINDOW', os.environ.get('BATCH_MAX_SIZE', 32)))
+ZIP_CONTENT_TYPES = ('application/zip', 'application/x-zip-compressed')
 
 def load_model_once():
-    global model, class_names
-    if model is None:
-        model = tf.keras.models.load_model(MODEL_PATH)
-        class_names = np.load(CLASSES_PATH, allow_pickle=True)
+    """Shared category model from the registry (loaded and warmed up once per process)."""
+    return registry.get('category')
+
+def get_engine(loaded):
+    global engine
+    if engine is None:
+        # Requests queue uint8 images; the stacked batch is scaled to float once, in place
+        def infer(batch):
+            # The shared inference pool takes the uint8 batch as is and scales it in the model process
+            if not getattr(loaded, 'accepts_uint8', False):
+                with span('predict.preprocess'):
+                    batch = preprocess_input(batch)
+            with span('predict.model'):
+                return loaded.predict(batch)
+        engine = BatchingEngine(infer)
+    return engine
+
+async def classify_image_bytes(image_bytes):
+    """Category for one encoded image: cache first, then decode and a batched forward pass."""
+    loop = asyncio.get_running_loop()
+    with span('predict.cache_lookup'):
+        key = content_key(image_bytes)
+        cached = prediction_cache.get_memory(key)
+        if cached is None:
+            # The SQLite tier is a blocking read; keep it off the event loop
+            cached = await loop.run_in_executor(None, prediction_cache.get_disk, key)
+    if cached is not None:
+        return cached
+    # Only blocks (off the event loop) if the startup warmup hasn't finished yet
+    with span('predict.model_load'):
+        loaded = await loop.run_in_executor(None, load_model_once)
+    # Decoding is CPU-bound; keep it off the event loop like the forward pass
+    with span('predict.decode'):
+        arr = await run_cpu(load_image, image_bytes)
+    # Queue wait plus the batched forward pass this request rode in; an expired
+    # request is cancelled and dropped from the batch before it is computed
+    with span('predict.batch'):
+        preds = await within_deadline(get_engine(loaded).submit(arr), 'predict.batch')
+    pred_idx = np.argmax(preds)
+    category = str(loaded.class_names[pred_idx])
+    prediction_cache.put(key, category)
+    return category
 
 async def predict_category(file):
-    load_model_once()
-    image_bytes = await file.read()
-    img = Image.open(io.BytesIO(image_bytes)).convert('RGB').resize((224, 224))
-    arr = np.expand_dims(np.array(img), 0)
-    arr = preprocess_input(arr)
-    preds = model.predict(arr)
-    pred_idx = np.argmax(preds[0])
-    category = class_names[pred_idx]
-    return {"category": str(category)}
+    with span('predict.read_upload'):
+        image_bytes = await file.read()
+    return {"category": await classify_image_bytes(image_bytes)}
+
+def _is_zip(upload):
+    return (upload.content_type in ZIP_CONTENT_TYPES or (upload.filename or '').lower().endswith('.zip')
+            or zipfile.is_zipfile(upload.file))
+
+def iter_uploaded_images(uploads):
+    """
+    Yields (filename, bytes or an Exception) for every image in the upload,
+    opening zip archives member by member so only one image is in memory
+    at a time. Blocking; meant to be stepped from an executor.
+    """
+    count = 0
+    for upload in uploads:
+        upload.file.seek(0)
+        is_zip = _is_zip(upload)
+        upload.file.seek(0)
+        if is_zip:
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile as e:
+                yield upload.filename, e
+                continue
+            with archive:
+                for info in archive.infolist():
+                    if info.is_dir() or os.path.basename(info.filename).startswith('.'):
+                        continue
+                    if count >= BULK_MAX_ITEMS:
+                        return
+                    count += 1
+                    if info.file_size > BULK_MAX_IMAGE_BYTES:
+                        yield info.filename, ValueError(f"Image larger than {BULK_MAX_IMAGE_BYTES} bytes")
+                        continue
+                    yield info.filename, archive.read(info)
+        else:
+            if count >= BULK_MAX_ITEMS:
+                return
+            count += 1
+            data = upload.file.read(BULK_MAX_IMAGE_BYTES + 1)
+            if len(data) > BULK_MAX_IMAGE_BYTES:
+                yield upload.filename, ValueError(f"Image larger than {BULK_MAX_IMAGE_BYTES} bytes")
+            else:
+                yield upload.filename, data
+
+async def predict_categories(uploads, window=BULK_WINDOW):
+    """
+    Classifies every uploaded image (plain files or zip archives) and yields
+    one result dict per image as soon as it is ready, in completion order.
+    At most `window` images are in flight, so memory stays bounded however
+    large the upload is, while concurrent images still share forward passes
+    through the batching engine.
+    """
+    loop = asyncio.get_running_loop()
+    images = iter_uploaded_images(uploads)
+    pending = set()
+    exhausted = False
+    index = 0
+
+    async def classify(i, name, data):
+        result = {"index": i, "filename": name}
+        if isinstance(data, Exception):
+            result["error"] = str(data)
+            return result
+        try:
+            result["category"] = await classify_image_bytes(data)
+        except Exception as e:
+            metrics.count_error('predict.bulk_item', e)
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                with span('predict.bulk_read'):
+                    item = await loop.run_in_executor(None, next, images, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(classify(index, *item)))
+                index += 1
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: t.result()["index"]):
+                yield task.result()
+    finally:
+        # Client went away mid-stream: don't keep classifying for nobody
+        for task in pending:
+            task.cancel()
+
+def batching_stats():
+    return engine.stats() if engine is not None else {}
@@ -0,0 +1,291 @@
+"""
+Vectorized outfit scoring.
+
+Every wardrobe item is encoded once into small numeric arrays (style id,
+color class flags, name flags). Per-request scores are then derived from
+those arrays, and all tops x bottoms x shoes triples are scored with
+broadcasted NumPy ops instead of a Python triple loop. The arithmetic is
+ordered exactly like style_score + color_score + body_type_score in
+app/outfits.py, so the selected outfit and its score are unchanged.
+"""
+import heapq
+
+import numpy as np
+
+# Same color groups as app/outfits.py color_score
+WARM_COLORS = ('red', 'orange', 'yellow', 'gold')
+COOL_COLORS = ('blue', 'green', 'purple', 'silver')
+PARTY_COLORS = ('red', 'gold', 'silver')
+FORMAL_COLORS = ('black', 'gray', 'navy')
+BASIC_COLORS = ('black', 'white', 'gray')
+
+# Color flag bits
+WARM, COOL, PARTY_COLOR, FORMAL_COLOR, BASIC = 1, 2, 4, 8, 16
+# Style flag bits (substring checks on the lowercased style)
+STYLE_PARTY, STYLE_FORMAL, STYLE_NEUTRAL = 1, 2, 4
+# Name flag bits (substring checks on the lowercased name)
+ELONGATING, LOOSE, FITTED = 1, 2, 4
+
+# Upper bound on the number of triple scores materialized at once
+CHUNK_ELEMENTS = 1 << 21
+
+def color_flags(color):
+    flags = 0
+    if color in WARM_COLORS:
+        flags |= WARM
+    if color in COOL_COLORS:
+        flags |= COOL
+    if color in PARTY_COLORS:
+        flags |= PARTY_COLOR
+    if color in FORMAL_COLORS:
+        flags |= FORMAL_COLOR
+    if color in BASIC_COLORS:
+        flags |= BASIC
+    return flags
+
+
+def encode_item(item):
+    """
+    Features of one item: (lowercased style, style flags, color flags, name
+    flags). Missing or null fields encode like empty strings.
+    """
+    style = (item.get('style') or '').lower()
+    style_flags = ((STYLE_PARTY if 'party' in style else 0)
+                   | (STYLE_FORMAL if 'formal' in style else 0)
+                   | (STYLE_NEUTRAL if 'neutral' in style else 0))
+    name = (item.get('name') or '').lower()
+    name_flags = ((ELONGATING if 'elongating' in name else 0)
+                  | (LOOSE if 'loose' in name else 0)
+                  | (FITTED if 'fitted' in name else 0))
+    return (style, style_flags, color_flags((item.get('color') or '').lower()), name_flags)
+
+
+class EncodedItems:
+    """
+    Numeric features for a list of items, computed once per item.
+    `from_catalog` marks catalog suggestions (True for every item, or a
+    per-item mask); triples made only of them are never picked.
+    """
+
+    def __init__(self, items, rows=None, from_catalog=False):
+        self.items = list(items)
+        # Callers that keep encode_item() rows around (e.g. the wardrobe index) pass them in
+        if rows is None:
+            rows = [encode_item(item) for item in self.items]
+        n = len(self.items)
+        # Styles are client strings, so ids come from a vocabulary local to these items
+        self._style_ids = {}
+        self.style = np.fromiter((self._style_ids.setdefault(r[0], len(self._style_ids)) for r in rows),
+                                 dtype=np.int32, count=n)
+        self.style_flags = np.fromiter((r[1] for r in rows), dtype=np.uint8, count=n)
+        self.color_flags = np.fromiter((r[2] for r in rows), dtype=np.uint8, count=n)
+        self.name_flags = np.fromiter((r[3] for r in rows), dtype=np.uint8, count=n)
+        self.from_catalog = np.broadcast_to(np.asarray(from_catalog, dtype=bool), (n,))
+
+    def __len__(self):
+        return len(self.items)
+
+    def style_scores(self, style_preference):
+        pref = self._style_ids.get(style_preference.lower(), -1)
+        return np.where(self.style == pref, 10.0,
+                        np.where(self.style_flags & STYLE_NEUTRAL, 3.0, 0.0))
+
+    def color_scores(self, body_color):
+        body_color = body_color.lower()
+        flags = self.color_flags
+        # Mirrors the if/elif chain in color_score; np.select takes the first true branch
+        conditions = [
+            (flags & WARM).astype(bool) & (body_color == 'warm'),
+            (flags & COOL).astype(bool) & (body_color == 'cool'),
+            (flags & PARTY_COLOR).astype(bool) & (self.style_flags & STYLE_PARTY).astype(bool),
+            (flags & FORMAL_COLOR).astype(bool) & (self.style_flags & STYLE_FORMAL).astype(bool),
+            (flags & BASIC).astype(bool),
+        ]
+        return np.select(conditions, [5.0, 5.0, 4.0, 4.0, 2.0], default=0.0)
+
+    def body_type_scores(self, height, weight):
+        if not height or not weight:
+            return None  # body_type_score contributes exactly 0
+        bmi_proxy = weight / (height ** 2)
+        flags = self.name_flags
+        conditions = [
+            (flags & ELONGATING).astype(bool) & (height < 165),
+            (flags & LOOSE).astype(bool) & (bmi_proxy > 25),
+            (flags & FITTED).astype(bool) & (bmi_proxy < 18.5),
+        ]
+        return np.select(conditions, [4.0, 3.0, 3.0], default=0.0)
+
+    def unit_scores(self, style_preference, body_color, height, weight):
+        """Per-item (style, color, body) score vectors for one request."""
+        return (self.style_scores(style_preference),
+                self.color_scores(body_color),
+                self.body_type_scores(height, weight))
+
+
+def _triple_sum(a, b, c):
+    # Same association order as the running `score +=` loop: (a + b) + c
+    return (a[:, None, None] + b[None, :, None]) + c[None, None, :]
+
+
+def score_block(unit_tops, unit_bottoms, unit_shoes):
+    """Scores every triple of a (tops, bottoms, shoes) block, shape (T, B, S)."""
+    total = _triple_sum(unit_tops[0], unit_bottoms[0], unit_shoes[0]) / 3
+    total = total + _triple_sum(unit_tops[1], unit_bottoms[1], unit_shoes[1]) / 3
+    if unit_tops[2] is not None:
+        total = total + _triple_sum(unit_tops[2], unit_bottoms[2], unit_shoes[2]) / 3
+    return total
+
+
+def _slice_units(units, start, stop):
+    return tuple(u[start:stop] if u is not None else None for u in units)
+
+
+def best_triple(tops, bottoms, shoes, style_preference, body_color, height, weight):
+    """
+    Returns ((top_idx, bottom_idx, shoe_idx), score) for the best triple, or
+    None when every triple is excluded. `tops`, `bottoms` and `shoes` are
+    EncodedItems. Ties resolve to the first triple in loop order, matching
+    max() over the old candidates list.
+    """
+    if not len(tops) or not len(bottoms) or not len(shoes):
+        return None
+    unit_t = tops.unit_scores(style_preference, body_color, height, weight)
+    unit_b = bottoms.unit_scores(style_preference, body_color, height, weight)
+    unit_s = shoes.unit_scores(style_preference, body_color, height, weight)
+    # Triples made only of catalog suggestions are skipped
+    all_catalog_bs = bottoms.from_catalog[:, None] & shoes.from_catalog[None, :]
+
+    per_top = len(bottoms) * len(shoes)
+    step = max(1, CHUNK_ELEMENTS // per_top)
+    best = None
+    for start in range(0, len(tops), step):
+        stop = min(start + step, len(tops))
+        block = score_block(_slice_units(unit_t, start, stop), unit_b, unit_s)
+        excluded = tops.from_catalog[start:stop, None, None] & all_catalog_bs[None, :, :]
+        if excluded.all():
+            continue
+        block[excluded] = -np.inf
+        flat = int(np.argmax(block))
+        score = float(block.flat[flat])
+        if best is None or score > best[1]:
+            t, b, s = np.unravel_index(flat, block.shape)
+            best = ((start + int(t), int(b), int(s)), score)
+    return best
+
+
+# Slack added to upper bounds so float rounding can never prune a true candidate
+BOUND_EPS = 1e-9
+
+
+class _TripleSpace:
+    """Per-request view of three EncodedItems used by the top-K searches."""
+
+    def __init__(self, tops, bottoms, shoes, style_preference, body_color, height, weight):
+        self.sizes = (len(tops), len(bottoms), len(shoes))
+        self.units = [enc.unit_scores(style_preference, body_color, height, weight) for enc in (tops, bottoms, shoes)]
+        self.totals = [s + c + (b if b is not None else 0.0) for s, c, b in self.units]
+        # Visit items best-first so the bounds tighten quickly
+        self.orders = [np.argsort(-total, kind='stable') for total in self.totals]
+        self.max_b = float(self.totals[1].max())
+        self.max_s = float(self.totals[2].max())
+        self.from_catalog = (tops.from_catalog, bottoms.from_catalog, shoes.from_catalog)
+
+    def bound(self, t, b=None):
+        """Upper bound on any triple score below a top (and optionally a bottom)."""
+        partial = self.totals[0][t] + (self.totals[1][b] if b is not None else self.max_b)
+        return (partial + self.max_s) / 3 + BOUND_EPS
+
+    def row_scores(self, t, b):
+        """Exact scores of (t, b, every shoe), same arithmetic as score_block."""
+        unit_t, unit_b, unit_s = self.units
+        row = ((unit_t[0][t] + unit_b[0][b]) + unit_s[0]) / 3
+        row = row + ((unit_t[1][t] + unit_b[1][b]) + unit_s[1]) / 3
+        if unit_t[2] is not None:
+            row = row + ((unit_t[2][t] + unit_b[2][b]) + unit_s[2]) / 3
+        if self.from_catalog[0][t] and self.from_catalog[1][b]:
+            row = np.where(self.from_catalog[2], -np.inf, row)
+        return row
+
+
+def top_k_triples(tops, bottoms, shoes, k, style_preference, body_color, height, weight, max_item_repeats=None):
+    """
+    Returns up to `k` distinct ((top_idx, bottom_idx, shoe_idx), score) pairs,
+    best first. With `max_item_repeats`, no single item appears in more than
+    that many of the returned outfits (chosen greedily in score order).
+
+    Items are visited in descending order of their own score and whole
+    subtrees are skipped once their upper bound cannot beat the current K-th
+    best, so most triples are never scored. Only the K results (plus
+    per-item usage counters) are held, never the full candidate set.
+    """
+    if k < 1 or not all((len(tops), len(bottoms), len(shoes))):
+        return []
+    space = _TripleSpace(tops, bottoms, shoes, style_preference, body_color, height, weight)
+    if max_item_repeats:
+        return _top_k_diverse(space, k, max_item_repeats)
+    return _top_k_heap(space, k)
+
+
+def _top_k_heap(space, k):
+    heap = []  # min-heap of (score, -seq, triple); ties keep the earlier discovery
+    seq = 0
+    order_t, order_b, _ = space.orders
+    for t in order_t:
+        if len(heap) == k and space.bound(t) <= heap[0][0]:
+            break
+        for b in order_b:
+            if len(heap) == k and space.bound(t, b) <= heap[0][0]:
+                break
+            row = space.row_scores(t, b)
+            threshold = heap[0][0] if len(heap) == k else -np.inf
+            candidates = np.flatnonzero(row > threshold)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-row[candidates], k - 1)[:k]]
+            # Best-first, lowest index first on ties
+            for s in candidates[np.lexsort((candidates, -row[candidates]))]:
+                entry = (float(row[s]), -seq, (int(t), int(b), int(s)))
+                seq += 1
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[0] > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    break
+    return [(triple, score) for score, _, triple in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+
+def _top_k_diverse(space, k, max_item_repeats):
+    usage = [np.zeros(n, dtype=np.int32) for n in space.sizes]
+    taken = {}  # (top, bottom) -> shoes already returned with that pair
+    results = []
+    order_t, order_b, _ = space.orders
+    for _ in range(k):
+        best = None
+        for t in order_t:
+            if usage[0][t] >= max_item_repeats:
+                continue
+            if best is not None and space.bound(t) <= best[1]:
+                break
+            for b in order_b:
+                if usage[1][b] >= max_item_repeats:
+                    continue
+                if best is not None and space.bound(t, b) <= best[1]:
+                    break
+                row = space.row_scores(t, b)
+                row = np.where(usage[2] >= max_item_repeats, -np.inf, row)
+                for s in taken.get((t, b), ()):
+                    row[s] = -np.inf
+                s = int(np.argmax(row))
+                if row[s] == -np.inf:
+                    continue
+                if best is None or row[s] > best[1]:
+                    best = ((int(t), int(b), s), float(row[s]))
+        if best is None:
+            break
+        (t, b, s), _score = best
+        results.append(best)
+        usage[0][t] += 1
+        usage[1][b] += 1
+        usage[2][s] += 1
+        taken.setdefault((t, b), []).append(s)
+    return results
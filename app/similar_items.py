@@ -0,0 +1,258 @@
+"""
+Nearest-neighbour search over catalog item embeddings.
+
+Catalog images are embedded offline (app/build_similar_index.py) with the
+pooled MobileNetV2 backbone. build_index() L2-normalizes the vectors, groups
+the rows by category and writes them as one float16 matrix, so cosine
+similarity is a plain matrix product. Small categories are searched
+exactly. Categories with at least IVF_MIN_ITEMS rows also get an IVF-style
+coarse partition: spherical k-means centroids, with each list's rows stored
+contiguously. A search then scores only NPROBE lists, taken in turn from
+each query vector's nearest centroids, so adding garments to a query does
+not multiply its cost.
+
+Item metadata is kept as JSON lines with a byte-offset array, so only the
+K hits are ever parsed, however large the catalog is. get_index() swaps in
+a rebuilt index (or notices a newly built one) without a restart.
+"""
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from app.cache import files_fingerprint
+
+SIMILAR_INDEX_DIR = os.environ.get('SIMILAR_INDEX_DIR',
+                                   os.path.join(os.path.dirname(__file__), '..', 'models', 'similar_items'))
+# Categories with at least this many items get a coarse IVF partition
+IVF_MIN_ITEMS = int(os.environ.get('SIMILAR_IVF_MIN_ITEMS', 10000))
+# IVF lists scanned per search, shared by all of its query vectors
+NPROBE = int(os.environ.get('SIMILAR_NPROBE', 16))
+KMEANS_ITERATIONS = 10
+# Rows converted to float32 and scored at once
+CHUNK_ROWS = 16384
+# How often get_index() re-stats the manifest for a rebuilt index
+RELOAD_CHECK_INTERVAL_S = 1.0
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _style_key(style):
+    return str(style or '').lower()
+
+
+def ivf_list_count(n):
+    # ~250 rows per list at 1M items
+    return int(np.clip(4 * np.sqrt(n), 8, 8192))
+
+
+def spherical_kmeans(embeddings, rows, lists, iterations=KMEANS_ITERATIONS, sample_size=None, seed=0):
+    """Unit-norm centroids for embeddings[rows], trained on a random sample of them."""
+    rng = np.random.default_rng(seed)
+    n = len(rows)
+    sample_size = min(n, sample_size or max(lists * 10, 10000))
+    sample = normalize(embeddings[np.sort(rng.choice(rows, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, lists, replace=False)]
+    for _ in range(iterations):
+        assignment = assign_lists(sample, np.arange(sample_size), centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        sizes = np.bincount(assignment, minlength=lists)
+        # Empty lists are reseeded from random sample points
+        empty = sizes == 0
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(embeddings, rows, centroids):
+    """Index of the most similar centroid for each of embeddings[rows], in chunks."""
+    out = np.empty(len(rows), dtype=np.int64)
+    step = CHUNK_ROWS // 4
+    for start in range(0, len(rows), step):
+        chunk = normalize(embeddings[rows[start:start + step]])
+        out[start:start + len(chunk)] = (chunk @ centroids.T).argmax(axis=1)
+    return out
+
+
+def build_index(embeddings, items, directory=SIMILAR_INDEX_DIR, ivf_min_items=IVF_MIN_ITEMS):
+    """
+    Writes a searchable index for `items` (dicts with at least 'category')
+    and their (n, d) `embeddings` (any float dtype, not necessarily
+    normalized). The new index replaces `directory` in one rename, so a
+    serving process never sees a half-written one.
+    """
+    n, dim = embeddings.shape
+    if n != len(items):
+        raise ValueError(f"{n} embeddings for {len(items)} items")
+    categories = np.array([str(item.get('category')) for item in items])
+    style_vocab = sorted({_style_key(item.get('style')) for item in items})
+    style_ids = {style: i for i, style in enumerate(style_vocab)}
+    style_codes = np.array([style_ids[_style_key(item.get('style'))] for item in items], dtype=np.int16)
+
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    order = []
+    partitions = {}
+    centroids = []
+    centroid_count = 0
+    for category in sorted(set(categories)):
+        rows = np.flatnonzero(categories == category)
+        partition = {'start': len(order), 'end': len(order) + len(rows), 'lists': None, 'centroids': None}
+        if len(rows) >= ivf_min_items:
+            lists = ivf_list_count(len(rows))
+            category_centroids = spherical_kmeans(embeddings, rows, lists)
+            assignment = assign_lists(embeddings, rows, category_centroids)
+            rows = rows[np.argsort(assignment, kind='stable')]
+            partition['lists'] = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=lists))]).tolist()
+            partition['centroids'] = [centroid_count, centroid_count + lists]
+            centroids.append(category_centroids)
+            centroid_count += lists
+        partitions[category] = partition
+        order.extend(rows.tolist())
+    order = np.array(order, dtype=np.int64)
+
+    matrix = np.lib.format.open_memmap(os.path.join(tmp_dir, 'embeddings.npy'), mode='w+',
+                                       dtype=np.float16, shape=(n, dim))
+    for start in range(0, n, CHUNK_ROWS):
+        matrix[start:start + CHUNK_ROWS] = normalize(embeddings[order[start:start + CHUNK_ROWS]])
+    matrix.flush()
+    del matrix
+    if centroids:
+        np.save(os.path.join(tmp_dir, 'centroids.npy'), np.concatenate(centroids).astype(np.float32))
+    np.save(os.path.join(tmp_dir, 'styles.npy'), style_codes[order])
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    with open(os.path.join(tmp_dir, 'items.jsonl'), 'wb') as f:
+        for i, row in enumerate(order):
+            line = json.dumps(items[row], default=str).encode() + b'\n'
+            f.write(line)
+            offsets[i + 1] = offsets[i] + len(line)
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump({'count': n, 'dim': dim, 'styles': style_vocab, 'partitions': partitions}, f)
+
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class SimilarItemIndex:
+    """Read-only view of an index written by build_index(); the matrix stays memory-mapped."""
+
+    def __init__(self, directory=SIMILAR_INDEX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+        self.count = manifest['count']
+        self.partitions = manifest['partitions']
+        self._style_ids = {style: i for i, style in enumerate(manifest['styles'])}
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.styles = np.load(os.path.join(directory, 'styles.npy'))
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'))
+        centroids_path = os.path.join(directory, 'centroids.npy')
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        with open(os.path.join(directory, 'items.jsonl'), 'rb') as f:
+            self._items = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b''
+
+    def item(self, row):
+        return json.loads(self._items[self.offsets[row]:self.offsets[row + 1]])
+
+    def _candidate_ranges(self, queries, partition, nprobe):
+        start, end = partition['start'], partition['end']
+        if partition['lists'] is None:
+            return [(start, end)]
+        first, last = partition['centroids']
+        coarse = queries @ self.centroids[first:last].T
+        nprobe = min(nprobe, last - first)
+        nearest = np.argsort(-coarse, axis=1)[:, :nprobe]
+        # Round-robin over the queries: every query's best list, then every second best, ...
+        ranked = nearest.T.ravel()
+        _, first_seen = np.unique(ranked, return_index=True)
+        probed = ranked[np.sort(first_seen)][:nprobe]
+        offsets = partition['lists']
+        return [(start + offsets[i], start + offsets[i + 1]) for i in probed if offsets[i + 1] > offsets[i]]
+
+    def search(self, queries, category, k=10, styles=None, nprobe=NPROBE):
+        """
+        The `k` items of `category` most similar to any of the (m, d)
+        `queries`, as [(item, cosine similarity)] best first. `styles`
+        restricts the candidates to those styles (case-insensitive).
+        """
+        partition = self.partitions.get(category)
+        if partition is None or k <= 0:
+            return []
+        queries = normalize(np.atleast_2d(queries))
+        allowed = None
+        if styles is not None:
+            allowed = np.array([self._style_ids[s] for s in map(_style_key, styles) if s in self._style_ids],
+                               dtype=np.int16)
+            if not len(allowed):
+                return []
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start, end in self._candidate_ranges(queries, partition, nprobe):
+            for chunk_start in range(start, end, CHUNK_ROWS):
+                rows = np.arange(chunk_start, min(end, chunk_start + CHUNK_ROWS))
+                if allowed is not None:
+                    rows = rows[np.isin(self.styles[rows], allowed)]
+                    if not len(rows):
+                        continue
+                    vectors = self.embeddings[rows]
+                else:
+                    vectors = self.embeddings[rows[0]:rows[-1] + 1]
+                # Nearest to any of the user's garments
+                scores = (vectors.astype(np.float32) @ queries.T).max(axis=1)
+                best_rows = np.concatenate([best_rows, rows])
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_rows) > k:
+                    keep = np.argpartition(-best_scores, k - 1)[:k]
+                    best_rows, best_scores = best_rows[keep], best_scores[keep]
+        ranked = np.argsort(-best_scores, kind='stable')
+        return [(self.item(best_rows[i]), float(best_scores[i])) for i in ranked]
+
+
+_index = None
+_index_version = None
+_last_check = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The process-wide index, or None when none has been built. The manifest is
+    re-stat'ed every RELOAD_CHECK_INTERVAL_S, so an index built or rebuilt
+    after startup is picked up without a restart.
+    """
+    global _index, _index_version, _last_check
+    now = time.monotonic()
+    if _index_version is not None and now - _last_check < RELOAD_CHECK_INTERVAL_S:
+        return _index
+    with _index_lock:
+        _last_check = now
+        manifest_path = os.path.join(SIMILAR_INDEX_DIR, 'manifest.json')
+        version = files_fingerprint([manifest_path])
+        if version != _index_version:
+            if not os.path.exists(manifest_path):
+                print(f"Warning: No similar-item index at {SIMILAR_INDEX_DIR}; "
+                      f"catalog suggestions fall back to the catalog's style lookup.")
+                _index, _index_version = None, version
+            else:
+                try:
+                    _index, _index_version = SimilarItemIndex(SIMILAR_INDEX_DIR), version
+                except (OSError, ValueError, KeyError) as e:
+                    # Retried at the next check; e.g. caught between build_index()'s two renames
+                    print(f"Warning: Loading similar-item index failed - {e}. Keeping previous index.")
+    return _index
@@ -1,18 +1,95 @@
+import heapq
 import json
 import os
+import threading
+import time
 
 TIPS_PATH = os.path.join(os.path.dirname(__file__), '..', 'static', 'tips.json')
-with open(TIPS_PATH, 'r') as f:
-    TIP_DATA = json.load(f)
+# How often tips.json is re-stat'ed for changes
+RELOAD_CHECK_INTERVAL_S = 1.0
+MAX_TIPS = 3
+
+
+class TipIndex:
+    """
+    Inverted index over the tip corpus: normalized tag -> ascending tip ids.
+    Built once per version of tips.json; a lookup merges at most two posting
+    lists and stops after MAX_TIPS hits, so cost no longer grows with the corpus.
+    """
+
+    def __init__(self, tips):
+        self.tips = tips
+        self.texts = [tip['text'] for tip in tips]
+        self.by_tag = {}
+        for tip_id, tip in enumerate(tips):
+            for tag in {t.lower() for t in tip['tags']}:
+                self.by_tag.setdefault(tag, []).append(tip_id)
+        self.fallback = [self.texts[i] for i in self.by_tag.get('general', [])[:MAX_TIPS]]
+
+    def lookup(self, category, material):
+        postings = [self.by_tag.get(key, []) for key in (category, material) if key]
+        matched = []
+        last = None
+        # Posting lists are sorted, so merging keeps the original tips.json order
+        for tip_id in heapq.merge(*postings):
+            if tip_id != last:
+                matched.append(self.texts[tip_id])
+                last = tip_id
+                if len(matched) == MAX_TIPS:
+                    break
+        return matched or list(self.fallback)
+
+
+_index = None
+_index_mtime = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def load_tips(path=TIPS_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def get_tip_index():
+    """Current TipIndex, rebuilt and swapped in atomically when tips.json changes."""
+    global _index, _index_mtime, _last_check, TIP_DATA
+    now = time.monotonic()
+    if _index is not None and now - _last_check < RELOAD_CHECK_INTERVAL_S:
+        return _index
+    with _reload_lock:
+        _last_check = now
+        try:
+            mtime = os.stat(TIPS_PATH).st_mtime_ns
+        except OSError:
+            mtime = _index_mtime
+        if _index is None or mtime != _index_mtime:
+            try:
+                index = TipIndex(load_tips())
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if _index is None:
+                    raise
+                # A half-written or invalid file must not take the endpoint down
+                print(f"Warning: Reloading tips failed - {e}. Keeping previous tips.")
+            else:
+                _index, _index_mtime = index, mtime
+                TIP_DATA = index.tips
+    return _index
+
+
+TIP_DATA = get_tip_index().tips
+
 
 def get_sustainability_tip(payload):
     item_category = payload.get("category", "").lower()
     material = payload.get("material", "").lower()
-    matched = []
-    for tip in TIP_DATA:
-        tags = [t.lower() for t in tip['tags']]
-        if (item_category and item_category in tags) or (material and material in tags):
-            matched.append(tip['text'])
-    if not matched:
-        matched = [tip['text'] for tip in TIP_DATA if 'general' in [t.lower() for t in tip['tags']]]
-    return {"tips": matched[:3]}
+    return {"tips": get_tip_index().lookup(item_category, material)}
+
+
+def get_sustainability_tips(payloads):
+    """Resolves many category/material pairs against a single index snapshot."""
+    index = get_tip_index()
+    return [
+        {"tips": index.lookup(payload.get("category", "").lower(), payload.get("material", "").lower())}
+        for payload in payloads
+    ]
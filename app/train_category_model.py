@@ -1,52 +1,67 @@
+import argparse
 import os
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
+from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
 from tensorflow.keras.layers import Dense, GlobalAveragePooling2D
 from tensorflow.keras.models import Model
 from tensorflow.keras.callbacks import EarlyStopping
-from tensorflow.keras.utils import to_categorical
-from app.data_loader import load_annotations, load_image, SHAPE_ANN_DIR, TRAIN_IMG_DIR, VAL_IMG_DIR
-
-def load_dataset(ann_path, img_dir, n=None):
-    df = load_annotations(ann_path, img_dir)
-    images = []
-    labels = []
-    for idx, row in df.iterrows():
-        if n and idx >= n:
-            break
-        image_path = row['image_path']
-        if os.path.exists(image_path):
-            try:
-                images.append(load_image(image_path))
-                labels.append(str(row['category']))
-            except Exception as e:
-                print(f"Skipping {image_path}: {e}")
-    return np.array(images), np.array(labels)
+from app.feature_cache import FeatureStore, train_head, sweep_heads, export_full_model
+from app.data_loader import read_annotation_columns, make_dataset, SHAPE_ANN_DIR, TRAIN_IMG_DIR, VAL_IMG_DIR, DECODED_CACHE_DIR
+
+def load_split(ann_path, img_dir, n=None):
+    """Image paths and string labels for one annotation file (first `n` lines if given)."""
+    image_paths, labels = read_annotation_columns(ann_path, img_dir)
+    if n:
+        image_paths, labels = image_paths[:n], labels[:n]
+    return image_paths, labels.astype(str)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the garment category model")
+    parser.add_argument('--train-limit', type=int, default=None, help="Use only the first N training annotations")
+    parser.add_argument('--val-limit', type=int, default=None, help="Use only the first N validation annotations")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=12)
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"Cache decoded images as sharded uint8 tensors (e.g. {DECODED_CACHE_DIR})")
+    parser.add_argument('--cached-features', action='store_true',
+                        help="Run the frozen backbone once, cache pooled features and train only the head on them")
+    parser.add_argument('--sweep', action='store_true', help="With --cached-features, grid-search head hyperparameters")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     train_ann = os.path.join(SHAPE_ANN_DIR, 'train_ann_file.txt')
     val_ann = os.path.join(SHAPE_ANN_DIR, 'val_ann_file.txt')
 
-    print("Loading data...")
-    X_train, y_train = load_dataset(train_ann, TRAIN_IMG_DIR, n=2000)  # Use n=None for all, or increase as needed
-    X_val, y_val = load_dataset(val_ann, VAL_IMG_DIR, n=500)
+    print("Loading annotations...")
+    train_paths, y_train = load_split(train_ann, TRAIN_IMG_DIR, n=args.train_limit)
+    val_paths, y_val = load_split(val_ann, VAL_IMG_DIR, n=args.val_limit)
 
     le = LabelEncoder()
     y_train_enc = le.fit_transform(y_train)
-    y_val_enc = le.transform(y_val)
-    y_train_oh = to_categorical(y_train_enc)
-    y_val_oh = to_categorical(y_val_enc)
-
-    X_train = preprocess_input(X_train)
-    X_val = preprocess_input(X_val)
+    known = np.isin(y_val, le.classes_)
+    if not known.all():
+        print(f"Dropping {int((~known).sum())} validation images with labels unseen in training")
+    val_paths, y_val_enc = val_paths[known], le.transform(y_val[known])
+    num_classes = len(le.classes_)
 
     print(f"Classes: {list(le.classes_)}")
 
+    if args.cached_features:
+        model = train_from_cached_features(train_paths, y_train_enc, val_paths, y_val_enc, num_classes, args)
+        save_model(model, le)
+        return
+
+    # Images are streamed from disk in parallel; nothing is materialized as one big array
+    train_ds = make_dataset(train_paths, y_train_enc, num_classes, batch_size=args.batch_size,
+                            shuffle=True, cache_dir=args.cache_dir)
+    val_ds = make_dataset(val_paths, y_val_enc, num_classes, batch_size=args.batch_size,
+                          shuffle=False, cache_dir=args.cache_dir)
+
     base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
     x = GlobalAveragePooling2D()(base_model.output)
-    output = Dense(len(le.classes_), activation='softmax')(x)
+    output = Dense(num_classes, activation='softmax')(x)
     model = Model(inputs=base_model.input, outputs=output)
 
     for layer in base_model.layers:
@@ -54,10 +69,31 @@ def main():
 
     model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
 
-    model.fit(X_train, y_train_oh, validation_data=(X_val, y_val_oh),
-              epochs=12, batch_size=32,
+    model.fit(train_ds, validation_data=val_ds,
+              epochs=args.epochs,
               callbacks=[EarlyStopping(patience=3, restore_best_weights=True)])
 
+    save_model(model, le)
+
+def train_from_cached_features(train_paths, y_train, val_paths, y_val, num_classes, args):
+    """Head-only training on backbone features computed once and kept in the feature cache."""
+    store = FeatureStore()
+    print(f"Extracting features for {len(store.missing(list(train_paths) + list(val_paths)))} uncached images...")
+    store.extract(list(train_paths) + list(val_paths), batch_size=max(args.batch_size, 64))
+    x_train, kept_train = store.features(train_paths)
+    x_val, kept_val = store.features(val_paths)
+    y_train, y_val = y_train[kept_train], y_val[kept_val]
+
+    if args.sweep:
+        head, acc, params = sweep_heads(x_train, y_train, x_val, y_val, num_classes)
+        print(f"Best head: {params} (val_accuracy={acc:.4f})")
+    else:
+        head, acc = train_head(x_train, y_train, x_val, y_val, num_classes,
+                               batch_size=max(args.batch_size, 256), verbose=1)
+        print(f"Head val_accuracy={acc:.4f}")
+    return export_full_model(head, num_classes)
+
+def save_model(model, le):
     os.makedirs('./models', exist_ok=True)
     model.save('models/category_model.h5')
     np.save('models/category_classes.npy', le.classes_)
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # No cross-process locking (e.g. Windows); run a single worker there
+    fcntl = None
+
+from api.recommendation import calculate_color_harmony
+from app.scoring import EncodedItems, encode_item
+
+BASE_DIR = os.path.dirname(__file__)
+WARDROBE_DIR = os.environ.get('WARDROBE_STORE_DIR', os.path.join(BASE_DIR, '..', 'cache', 'wardrobes'))
+# Number of per-user indexes kept in memory before the least recently used is dropped
+MAX_LOADED_WARDROBES = int(os.environ.get('MAX_LOADED_WARDROBES', 1000))
+# A wardrobe's change log is folded into its snapshot once it outgrows both this and the snapshot
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+class WardrobeIndex:
+    """
+    Pre-processed view of one user's wardrobe.
+
+    Each item is encoded once on upsert (scoring features, color id) and
+    filed under (category, lowercased style) so an occasion filter is a
+    union of a few partitions instead of a scan. A color-harmony matrix over
+    the colors seen in this wardrobe is grown one row/column at a time as
+    new colors arrive, so recommend_outfit never recomputes color distances.
+    """
+
+    def __init__(self, wardrobe_id, items=()):
+        self.wardrobe_id = wardrobe_id
+        self._lock = threading.RLock()
+        # What of the on-disk snapshot and log this index reflects; see WardrobeStore._sync
+        self._snapshot_key = None
+        self._log_offset = 0
+        self.reset(items)
+
+    def reset(self, items=(), version=0):
+        """Replaces the whole wardrobe with `items`."""
+        with self._lock:
+            self.version = 0
+            self._items = {}  # _id -> item
+            self._rows = {}  # _id -> encode_item() row
+            self._seq = {}  # _id -> insertion sequence, keeps wardrobe order stable
+            self._next_seq = 0
+            self._partitions = {}  # (category, style) -> set of _ids
+            self._color_ids = {}  # lowercased color -> row in harmony
+            self._item_color = {}  # _id -> color id
+            self.harmony = np.zeros((0, 0))
+            self.upsert(items)
+            self.version = version
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _partition_key(item):
+        return item.get('category'), str(item.get('style', '')).lower()
+
+    def _color_id(self, color):
+        key = str(color).lower()
+        if key not in self._color_ids:
+            colors = list(self._color_ids)
+            n = len(colors)
+            grown = np.zeros((n + 1, n + 1))
+            grown[:n, :n] = self.harmony
+            for j, other in enumerate(colors + [key]):
+                grown[n, j] = grown[j, n] = calculate_color_harmony(key, other)
+            self.harmony = grown
+            self._color_ids[key] = n
+        return self._color_ids[key]
+
+    def _remove(self, item_id):
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return False
+        bucket = self._partitions.get(self._partition_key(item))
+        if bucket is not None:
+            bucket.discard(item_id)
+            if not bucket:
+                del self._partitions[self._partition_key(item)]
+        self._rows.pop(item_id, None)
+        self._item_color.pop(item_id, None)
+        return True
+
+    def upsert(self, items):
+        """Adds or replaces items by `_id`; only the touched items are re-encoded."""
+        with self._lock:
+            changed = 0
+            for item in items:
+                item_id = item.get('_id')
+                if not item_id:
+                    raise ValueError("Wardrobe items need an '_id'")
+                self._remove(item_id)
+                if item_id not in self._seq:
+                    self._seq[item_id] = self._next_seq
+                    self._next_seq += 1
+                self._items[item_id] = item
+                self._rows[item_id] = encode_item(item)
+                self._item_color[item_id] = self._color_id(item.get('color'))
+                self._partitions.setdefault(self._partition_key(item), set()).add(item_id)
+                changed += 1
+            if changed:
+                self.version += 1
+            return changed
+
+    def delete(self, item_ids):
+        with self._lock:
+            removed = 0
+            for item_id in item_ids:
+                if self._remove(item_id):
+                    self._seq.pop(item_id, None)
+                    removed += 1
+            if removed:
+                self.version += 1
+            return removed
+
+    def items(self):
+        with self._lock:
+            return sorted(self._items.values(), key=lambda item: self._seq[item['_id']])
+
+    def select(self, category, styles=None):
+        """
+        Items of `category` (optionally only the given styles) in wardrobe
+        order, with their EncodedItems built from the cached rows.
+        """
+        with self._lock:
+            if styles is None:
+                ids = set()
+                for (cat, _), bucket in self._partitions.items():
+                    if cat == category:
+                        ids |= bucket
+            else:
+                ids = set()
+                for style in {str(s).lower() for s in styles}:
+                    ids |= self._partitions.get((category, style), set())
+            ordered = sorted(ids, key=self._seq.__getitem__)
+            items = [self._items[i] for i in ordered]
+            return items, EncodedItems(items, rows=[self._rows[i] for i in ordered])
+
+    def color_ids(self, items):
+        with self._lock:
+            return np.array([self._item_color[item['_id']] for item in items], dtype=np.intp)
+
+    def to_json(self):
+        return {'wardrobe_id': self.wardrobe_id, 'version': self.version, 'items': self.items()}
+
+
+# Never equal to a _stat_key(), so _sync reloads the whole wardrobe
+_RELOAD = object()
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class WardrobeStore:
+    """
+    Per-user WardrobeIndex objects, persisted per wardrobe as a JSON snapshot
+    plus an append-only log of upserts and deletes, so a change writes only
+    the touched items. Once the log outgrows the snapshot it is folded into
+    a new snapshot (written to a unique temp file and renamed into place).
+
+    Several server processes can share the directory: writers hold an
+    exclusive flock on the wardrobe's lock file, and get() compares the
+    snapshot's stat and the log's length with what its cached index has
+    applied, replaying only the new log records under a shared lock.
+    """
+
+    def __init__(self, directory=WARDROBE_DIR, max_loaded=MAX_LOADED_WARDROBES):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _path(self, wardrobe_id, suffix='.json'):
+        # Hash the id so arbitrary user ids are safe file names
+        digest = hashlib.sha1(str(wardrobe_id).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}{suffix}")
+
+    @contextmanager
+    def _file_lock(self, wardrobe_id, exclusive):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(wardrobe_id, '.lock'), 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _cached(self, wardrobe_id):
+        with self._lock:
+            index = self._indexes.pop(wardrobe_id, None)
+            if index is None:
+                index = WardrobeIndex(wardrobe_id)
+            self._indexes[wardrobe_id] = index  # most recently used goes last
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.pop(next(iter(self._indexes)))
+            return index
+
+    def _stale(self, index):
+        if _stat_key(self._path(index.wardrobe_id)) != index._snapshot_key:
+            return True
+        log_key = _stat_key(self._path(index.wardrobe_id, '.log'))
+        return (log_key[1] if log_key else 0) != index._log_offset
+
+    def _sync(self, index):
+        """Brings `index` up to date with the files on disk; the caller holds the file lock."""
+        snapshot_path = self._path(index.wardrobe_id)
+        snapshot_key = _stat_key(snapshot_path)
+        if snapshot_key != index._snapshot_key:
+            data = {}
+            if snapshot_key is not None:
+                with open(snapshot_path, 'r') as f:
+                    data = json.load(f)
+            index.reset(data.get('items', []), data.get('version', 0))
+            index._snapshot_key = snapshot_key
+            index._log_offset = 0
+        try:
+            with open(self._path(index.wardrobe_id, '.log'), 'rb') as f:
+                f.seek(index._log_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b''
+        complete = tail.rfind(b'\n') + 1
+        for line in tail[:complete].splitlines():
+            record = json.loads(line)
+            # Records already folded into the snapshot (a compaction cut short) are skipped
+            if record['version'] <= index.version:
+                continue
+            if record['op'] == 'upsert':
+                index.upsert(record['items'])
+            else:
+                index.delete(record['ids'])
+            index.version = record['version']
+        index._log_offset += complete
+
+    def _exists(self, wardrobe_id):
+        return os.path.exists(self._path(wardrobe_id)) or os.path.exists(self._path(wardrobe_id, '.log'))
+
+    def get(self, wardrobe_id, create=False):
+        """Returns the index for `wardrobe_id`, or None if it does not exist."""
+        if not self._exists(wardrobe_id):
+            if not create:
+                with self._lock:
+                    self._indexes.pop(wardrobe_id, None)
+                return None
+        index = self._cached(wardrobe_id)
+        if self._stale(index):
+            with self._file_lock(wardrobe_id, exclusive=False), index._lock:
+                self._sync(index)
+        return index
+
+    def _compact(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(index.wardrobe_id)
+        # Unique per writer, so concurrent compactions can't clobber each other's temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(index.to_json(), f, default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        open(self._path(index.wardrobe_id, '.log'), 'wb').close()
+        index._snapshot_key = _stat_key(path)
+        index._log_offset = 0
+
+    def _append(self, index, record):
+        """Appends one record; the caller holds the exclusive file lock and has just run _sync."""
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps(record, default=str).encode() + b'\n'
+        with open(self._path(index.wardrobe_id, '.log'), 'ab') as f:
+            if f.tell() > index._log_offset:
+                # A torn earlier write (crash, ENOSPC) left a partial line; start this record on a clean one
+                f.truncate(index._log_offset)
+            f.write(line)
+        index._log_offset += len(line)
+        snapshot_key = index._snapshot_key
+        if index._log_offset > max(COMPACT_MIN_BYTES, snapshot_key[1] if snapshot_key else 0):
+            self._compact(index)
+
+    def _discard(self, index):
+        # The in-memory change got ahead of a failed write: callers still holding
+        # `index` re-read it from scratch at their next _sync, everyone else gets a new one
+        index._snapshot_key = _RELOAD
+        with self._lock:
+            if self._indexes.get(index.wardrobe_id) is index:
+                del self._indexes[index.wardrobe_id]
+
+    def upsert_items(self, wardrobe_id, items):
+        index = self._cached(wardrobe_id)
+        with self._file_lock(wardrobe_id, exclusive=True), index._lock:
+            # Another process may have written since this index was loaded
+            self._sync(index)
+            changed = index.upsert(items)
+            if changed or not self._exists(wardrobe_id):
+                try:
+                    self._append(index, {'op': 'upsert', 'version': index.version, 'items': items})
+                except BaseException:
+                    self._discard(index)
+                    raise
+        return index, changed
+
+    def delete_items(self, wardrobe_id, item_ids):
+        if not self._exists(wardrobe_id):
+            return None, 0
+        index = self._cached(wardrobe_id)
+        with self._file_lock(wardrobe_id, exclusive=True), index._lock:
+            self._sync(index)
+            removed = index.delete(item_ids)
+            if removed:
+                try:
+                    self._append(index, {'op': 'delete', 'version': index.version, 'ids': list(item_ids)})
+                except BaseException:
+                    self._discard(index)
+                    raise
+        return index, removed
+
+
+wardrobe_store = WardrobeStore()
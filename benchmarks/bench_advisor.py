@@ -0,0 +1,98 @@
+"""
+Compares the compiled advisor engine with the original /ask-advisor code.
+
+    python -m benchmarks.bench_advisor --rules 10000 --questions 2000
+"""
+import argparse
+import random
+import time
+
+from app.advisor import AdvisorEngine
+
+WORDS = ['jean', 'wash', 'hole', 'repair', 'wool', 'cotton', 'silk', 'stain', 'shrink', 'iron',
+         'fade', 'button', 'zipper', 'sweater', 'shirt', 'dress', 'coat', 'boot', 'linen', 'dry',
+         'fold', 'store', 'moth', 'pill', 'bleach', 'dye', 'hem', 'patch', 'sew', 'donate']
+
+
+def legacy_handle_user_question(question):
+    """The hard-coded rule chain /ask-advisor used before app/advisor.py."""
+    q = question.lower()
+    if "jean" in q and "wash" in q:
+        return {"tip": "Wash jeans in cold water and air dry for longevity."}
+    if "hole" in q and "repair" in q:
+        return {"tip": "Use an iron-on patch or hand-stitch small holes to extend garment life."}
+    return {"tip": "Try to repair, upcycle or donate clothing for sustainable fashion!"}
+
+
+def legacy_scan(rules, default_tip, question):
+    """The same if-chain pattern extended to every rule: one substring pass per keyword."""
+    q = question.lower()
+    for rule in rules:
+        if all(k in q for k in rule['keywords']):
+            return {"tip": rule['tip']}
+    return {"tip": default_tip}
+
+
+def synthetic_rules(n, rng):
+    rules = []
+    for i in range(n):
+        keywords = rng.sample(WORDS, rng.randint(1, 3)) + [f"kw{i}"]
+        rules.append({
+            'keywords': keywords,
+            'tip': f"Tip {i}",
+            'examples': [' '.join(rng.sample(WORDS, 5)) + f" kw{i}"],
+        })
+    return rules
+
+
+def synthetic_questions(n, n_rules, rng):
+    questions = []
+    for _ in range(n):
+        words = rng.sample(WORDS, 6)
+        if rng.random() < 0.5:
+            words.append(f"kw{rng.randrange(n_rules)}")
+        questions.append("How do I " + ' '.join(words) + '?')
+    return questions
+
+
+def timed(fn, questions):
+    start = time.perf_counter()
+    for q in questions:
+        fn(q)
+    return (time.perf_counter() - start) / len(questions) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--questions', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = synthetic_rules(args.rules, rng)
+    questions = synthetic_questions(args.questions, args.rules, rng)
+    default_tip = "Try to repair, upcycle or donate clothing for sustainable fashion!"
+
+    start = time.perf_counter()
+    engine = AdvisorEngine(rules, default_tip)
+    print(f"compile {args.rules} rules: {time.perf_counter() - start:.2f}s")
+
+    # The compiled matcher must agree with the linear scan on keyword rules
+    for q in questions[:200]:
+        rule_id = engine.match_rule(q)
+        if rule_id is not None:
+            assert legacy_scan(rules, default_tip, q)['tip'] == rules[rule_id]['tip'], q
+
+    print(f"legacy handle_user_question (2 rules): {timed(legacy_handle_user_question, questions):9.1f} us/question")
+    print(f"legacy-style scan ({args.rules} rules):  {timed(lambda q: legacy_scan(rules, default_tip, q), questions):9.1f} us/question")
+    print(f"engine keyword match only:           {timed(engine.match_rule, questions):9.1f} us/question")
+    print(f"engine answer (with TF-IDF fallback):{timed(engine.answer, questions):9.1f} us/question")
+    start = time.perf_counter()
+    engine.answer_many(questions)
+    batch_us = (time.perf_counter() - start) / len(questions) * 1e6
+    print(f"engine answer_many (batch):          {batch_us:9.1f} us/question")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Accuracy vs latency report for the category model inference backends.
+
+Runs every available backend (keras, tflite-fp16, tflite-int8) over a
+held-out set from the validation annotations and reports top-1 accuracy,
+agreement with the Keras predictions, and per-call latency at batch sizes
+1 and 32. Export the TFLite variants first with `python -m app.export_tflite`.
+
+    python -m benchmarks.bench_backends --limit 1000
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.data_loader import read_annotation_columns, load_image, SHAPE_ANN_DIR, VAL_IMG_DIR
+from app.export_tflite import CATEGORY_MODEL_PATH
+from app.inference_backend import BACKENDS, load_model, tflite_path
+from app.model_registry import MODELS_DIR
+from preprocessing.image_utils import to_batch
+
+
+def load_held_out(ann_path, img_dir, limit):
+    paths, labels = read_annotation_columns(ann_path, img_dir)
+    images, kept = [], []
+    for i, path in enumerate(paths[:limit]):
+        try:
+            images.append(load_image(path))
+            kept.append(i)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+    return to_batch(images), labels[kept].astype(str)
+
+
+def predict_all(model, x, batch_size=32):
+    return np.concatenate([model.predict(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+
+def latency_ms(model, x, batch_size, repeats):
+    batch = x[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(batch, (batch_size,) + x.shape[1:])
+    model.predict(batch)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict(batch)
+        times.append((time.perf_counter() - started) * 1000)
+    return {'p50': float(np.percentile(times, 50)), 'p95': float(np.percentile(times, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--annotations', default=os.path.join(SHAPE_ANN_DIR, 'val_ann_file.txt'))
+    parser.add_argument('--images', default=VAL_IMG_DIR)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--output', help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    class_names = np.load(os.path.join(MODELS_DIR, 'category_classes.npy'), allow_pickle=True).astype(str)
+    x, labels = load_held_out(args.annotations, args.images, args.limit)
+    print(f"Held-out set: {len(x)} images")
+
+    report = {}
+    reference = None
+    for backend in BACKENDS:
+        if backend != 'keras' and not os.path.exists(tflite_path(CATEGORY_MODEL_PATH, backend)):
+            print(f"{backend}: not exported, skipping")
+            continue
+        model = load_model('category', CATEGORY_MODEL_PATH, class_names, backend=backend)
+        predicted = predict_all(model, x).argmax(axis=1)
+        if reference is None:
+            reference = predicted
+        size_path = CATEGORY_MODEL_PATH if backend == 'keras' else tflite_path(CATEGORY_MODEL_PATH, backend)
+        report[backend] = {
+            'size_mb': os.path.getsize(size_path) / 1e6,
+            'accuracy': float(np.mean(class_names[predicted] == labels)),
+            'agreement_with_keras': float(np.mean(predicted == reference)),
+            'latency_ms_batch_1': latency_ms(model, x, 1, args.repeats),
+            'latency_ms_batch_32': latency_ms(model, x, 32, max(1, args.repeats // 5)),
+        }
+        print(f"{backend}: {json.dumps(report[backend])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Catalog lookups at scale: the indexed, memory-mapped store (app/catalog.py)
+against the old per-request list-comprehension scan over a list of dicts.
+
+Writes a synthetic JSON-lines catalog, compiles it, and times the
+(category, style) fallback lookup /generate-outfit does for a wardrobe gap,
+plus compile, open and hot-reload costs.
+
+    python -m benchmarks.bench_catalog --items 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.catalog import Catalog, compile_catalog, read_source
+from benchmarks import harness, synthetic
+
+LIMIT = 12
+
+
+def write_catalog(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = ('Tops', 'Bottoms', 'Shoes')
+    with open(path, 'w') as f:
+        for i in range(n):
+            category = categories[i % 3]
+            color, style = rng.choice(synthetic.COLORS), rng.choice(synthetic.STYLES)
+            f.write(json.dumps({'_id': f"cat_{i}", 'name': f"{color} {style} {category[:-1]} {i}",
+                                'category': category, 'color': str(color), 'style': str(style),
+                                'imageUrl': f"https://example.com/catalog/{i}.jpg", 'price': 20 + i % 80}) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--budget', type=float, default=2.0, help="Seconds per timed case")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='catalog-bench-')
+    source = os.path.join(root, 'catalog.jsonl')
+    write_catalog(source, args.items)
+    print(f"{args.items} items, {os.path.getsize(source) / 1e6:.1f} MB of JSON lines")
+
+    started = time.perf_counter()
+    compile_catalog(source, os.path.join(root, 'v1'))
+    print(f"compile: {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    catalog = Catalog(os.path.join(root, 'v1'))
+    print(f"open: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # What build_outfit did before: the whole catalog as dicts, filtered on every request
+    legacy = {}
+    for item in read_source(source):
+        legacy.setdefault(item['category'], []).append(item)
+
+    styles = [s.lower() for s in synthetic.STYLES]
+    counter = iter(range(10 ** 9))
+
+    def legacy_lookup():
+        style = styles[next(counter) % len(styles)]
+        return [item for item in legacy['Shoes'] if item['style'].lower() == style]
+
+    def indexed_lookup():
+        style = styles[next(counter) % len(styles)]
+        return catalog.select('Shoes', [style], limit=LIMIT)
+
+    def indexed_lookup_all():
+        style = styles[next(counter) % len(styles)]
+        return catalog.select('Shoes', [style])
+
+    results = {
+        f"catalog/scan/{args.items}": harness.time_calls(legacy_lookup, budget_s=args.budget),
+        f"catalog/indexed-limit{LIMIT}/{args.items}": harness.time_calls(indexed_lookup, budget_s=args.budget),
+        f"catalog/indexed-all/{args.items}": harness.time_calls(indexed_lookup_all, budget_s=args.budget),
+    }
+    harness.print_table(results)
+
+    # Hot reload: serving keeps answering from the old snapshot while the new version compiles
+    with open(source, 'a') as f:
+        f.write(json.dumps({'_id': 'new', 'category': 'Shoes', 'style': 'Casual', 'color': 'Red'}) + '\n')
+    started = time.perf_counter()
+    compile_catalog(source, os.path.join(root, 'v2'))
+    reloaded = Catalog(os.path.join(root, 'v2'))
+    print(f"reload: {time.perf_counter() - started:.2f}s, {len(catalog)} -> {len(reloaded)} items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Async HTTP load generator for the FastAPI app.
+
+By default the app is driven in-process through httpx's ASGI transport with
+the tiny stand-in category model, so it runs offline; pass --url to load a
+running deployment instead (which then uses whatever model it serves).
+Each scenario keeps `--concurrency` requests in flight for `--duration`
+seconds and reports throughput, p50/p95/p99 latency and error counts.
+
+    python -m benchmarks.bench_load --concurrency 16 --duration 5
+    python -m benchmarks.bench_load --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+from benchmarks import harness, synthetic
+
+
+def scenarios(sizes, jpeg_sizes):
+    """Yields (name, request factory); the factory maps a request number to (method, path, kwargs)."""
+    for label in jpeg_sizes:
+        blob = synthetic.synthetic_photo(*synthetic.JPEG_SIZES[label], seed=0)
+        # Unique bytes per request so the prediction cache doesn't turn this into a cache benchmark
+        yield f"predict-category/{label}", lambda i, b=blob: (
+            'POST', '/predict-category',
+            {'files': {'file': ('photo.jpg', synthetic.unique_variant(b, i), 'image/jpeg')}})
+    for n in sizes:
+        payload = synthetic.synthetic_payload(n)
+        yield f"generate-outfit/{n}", lambda i, p=payload: ('POST', '/generate-outfit', {'json': p})
+    tips = synthetic.TIP_PAYLOADS
+    yield "sustainability-tip", lambda i: ('POST', '/sustainability-tip', {'json': tips[i % len(tips)]})
+    questions = synthetic.QUESTIONS
+    yield "ask-advisor", lambda i: ('POST', '/ask-advisor', {'json': {'question': questions[i % len(questions)]}})
+
+
+async def drive(client, make_request, concurrency, duration_s, max_requests=None):
+    """Closed-loop load: each worker sends its next request as soon as the previous one returns."""
+    latencies = []
+    errors = 0
+    numbers = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration_s
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            i = next(numbers)
+            if max_requests is not None and i >= max_requests:
+                return
+            method, path, kwargs = make_request(i)
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return harness.summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def warm_up(client, make_request):
+    """Warm-up request outside the measurement (lazy model load, first batch, imports)."""
+    method, path, kwargs = make_request(-1)
+    await client.request(method, path, **kwargs)
+
+
+async def run_async(url=None, sizes=synthetic.WARDROBE_SIZES, jpeg_sizes=tuple(synthetic.JPEG_SIZES),
+                    concurrency=16, duration_s=5.0, only=None):
+    if url:
+        transport, base_url = None, url
+    else:
+        import main
+        synthetic.install_tiny_model()
+        transport, base_url = httpx.ASGITransport(app=main.app), 'http://bench'
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=60) as client:
+        for name, make_request in scenarios(sizes, jpeg_sizes):
+            if only and only not in name:
+                continue
+            await warm_up(client, make_request)
+            results[f"http/{name}"] = await drive(client, make_request, concurrency, duration_s)
+    return results
+
+
+def run(**kwargs):
+    return asyncio.run(run_async(**kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help="Base URL of a running server; default drives the app in-process")
+    parser.add_argument('--sizes', default=','.join(map(str, synthetic.WARDROBE_SIZES)),
+                        help="Wardrobe items per category for /generate-outfit")
+    parser.add_argument('--jpeg-sizes', default=','.join(synthetic.JPEG_SIZES))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per scenario")
+    parser.add_argument('--only', help="Run only scenarios whose name contains this")
+    args = parser.parse_args()
+
+    if not args.url:
+        synthetic.isolate_state()
+    results = run(url=args.url, sizes=[int(n) for n in args.sizes.split(',')],
+                  jpeg_sizes=args.jpeg_sizes.split(','), concurrency=args.concurrency,
+                  duration_s=args.duration, only=args.only)
+    harness.print_table(results)
+
+
+if __name__ == '__main__':
+    main()
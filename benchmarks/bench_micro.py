@@ -0,0 +1,99 @@
+"""
+In-process micro-benchmarks for the request handlers and scoring functions.
+
+Each case is called back to back until its time budget runs out; results
+are summarized as throughput and p50/p95/p99 latency. Category prediction
+uses the tiny stand-in model from benchmarks/synthetic.py, so this runs
+offline and without TensorFlow.
+
+    python -m benchmarks.bench_micro --sizes 10,100 --budget 1
+"""
+import argparse
+import asyncio
+import itertools
+
+from benchmarks import harness, synthetic
+
+
+class _Upload:
+    """Just enough of FastAPI's UploadFile for predict_category."""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+
+def cases(loop, sizes, jpeg_sizes):
+    """Yields (name, zero-argument callable) for every micro-benchmark; async ones run on `loop`."""
+    from api.recommendation import recommend_outfit, recommend_outfit_indexed
+    from app.nlp import handle_user_question
+    from app.outfits import generate_outfit, build_outfit
+    from app.predict import predict_category
+    from app.sustainability import get_sustainability_tip
+    from app.wardrobe_index import WardrobeIndex
+    from preprocessing.image_utils import load_image
+
+    synthetic.install_tiny_model()
+
+    for n in sizes:
+        payload = synthetic.synthetic_payload(n)
+        ranked = synthetic.synthetic_payload(n, top_k=5)
+        index = WardrobeIndex(f"bench-{n}", payload['wardrobe'])
+        request = {key: value for key, value in payload.items() if key != 'wardrobe'}
+        yield f"generate_outfit/{n}", lambda p=payload: loop.run_until_complete(generate_outfit(p))
+        yield f"generate_outfit/top5/{n}", lambda p=ranked: loop.run_until_complete(generate_outfit(p))
+        yield f"build_outfit/indexed/{n}", lambda r=request, i=index: build_outfit(r, index=i)
+        yield f"recommend_outfit/{n}", lambda w=payload['wardrobe']: recommend_outfit(w, 'Casual', 170, 65, 'Warm')
+        yield f"recommend_outfit_indexed/{n}", lambda i=index: recommend_outfit_indexed(i, 'Casual', 170, 65, 'Warm')
+
+    tips = itertools.cycle(synthetic.TIP_PAYLOADS)
+    yield "get_sustainability_tip", lambda: get_sustainability_tip(next(tips))
+    questions = itertools.cycle(synthetic.QUESTIONS)
+    yield "handle_user_question", lambda: handle_user_question(next(questions))
+
+    for label in jpeg_sizes:
+        blob = synthetic.synthetic_photo(*synthetic.JPEG_SIZES[label], seed=0)
+        counter = itertools.count()
+        yield f"load_image/{label}", lambda b=blob: load_image(b)
+        # A fresh content hash per call, so the prediction cache never answers
+        yield f"predict_category/{label}", lambda b=blob, c=counter: loop.run_until_complete(
+            predict_category(_Upload(synthetic.unique_variant(b, next(c)))))
+
+
+def run(sizes=synthetic.WARDROBE_SIZES, jpeg_sizes=tuple(synthetic.JPEG_SIZES), budget_s=2.0, only=None):
+    results = {}
+    loop = asyncio.new_event_loop()
+    try:
+        for name, fn in cases(loop, sizes, jpeg_sizes):
+            if only and only not in name:
+                continue
+            results[f"micro/{name}"] = harness.time_calls(fn, min_calls=3, budget_s=budget_s)
+    finally:
+        # The batching engine's worker task lives on this loop
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default=','.join(map(str, synthetic.WARDROBE_SIZES)),
+                        help="Wardrobe items per category")
+    parser.add_argument('--jpeg-sizes', default=','.join(synthetic.JPEG_SIZES))
+    parser.add_argument('--budget', type=float, default=2.0, help="Seconds per case")
+    parser.add_argument('--only', help="Run only cases whose name contains this")
+    args = parser.parse_args()
+
+    synthetic.isolate_state()
+    results = run([int(n) for n in args.sizes.split(',')], args.jpeg_sizes.split(','), args.budget, args.only)
+    harness.print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Decode + preprocess cost for large phone photos: the old per-module path
+(full-resolution decode, resize, float conversion, expand_dims) against
+preprocessing.image_utils (JPEG draft decode, uint8 until a preallocated
+batch). Images are synthetic 12 MP JPEGs unless --images points at real ones.
+
+    python -m benchmarks.bench_preprocess --count 20 --size 4032x3024
+"""
+import argparse
+import glob
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.synthetic import synthetic_photo
+from preprocessing.image_utils import load_image, to_batch
+
+
+def legacy_batch(blobs):
+    arrays = []
+    for blob in blobs:
+        img = Image.open(io.BytesIO(blob)).convert('RGB').resize((224, 224))
+        arrays.append(np.expand_dims(np.array(img, dtype=np.float32), axis=0))
+    batch = np.concatenate(arrays)
+    return batch / 127.5 - 1.0
+
+
+def fast_batch(blobs):
+    return to_batch([load_image(blob) for blob in blobs])
+
+
+def best_of(fn, blobs, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        out = fn(blobs)
+        times.append(time.perf_counter() - started)
+    return min(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', help="Glob of real photos to use instead of synthetic ones")
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--size', default='4032x3024')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.images:
+        blobs = []
+        for path in sorted(glob.glob(args.images))[:args.count]:
+            with open(path, 'rb') as f:
+                blobs.append(f.read())
+    else:
+        width, height = (int(v) for v in args.size.split('x'))
+        blobs = [synthetic_photo(width, height, seed) for seed in range(args.count)]
+    print(f"{len(blobs)} images, {sum(map(len, blobs)) / len(blobs) / 1e6:.1f} MB average")
+
+    legacy_s, legacy_out = best_of(legacy_batch, blobs, args.repeats)
+    fast_s, fast_out = best_of(fast_batch, blobs, args.repeats)
+    print(f"legacy: {1000 * legacy_s / len(blobs):.1f} ms/image")
+    print(f"fast:   {1000 * fast_s / len(blobs):.1f} ms/image ({legacy_s / fast_s:.1f}x)")
+    diff = np.abs(legacy_out - fast_out)
+    print(f"max |diff| {diff.max():.3f}, mean |diff| {diff.mean():.4f} (inputs scaled to [-1, 1])")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Similar-item search latency and recall at catalog scale.
+
+Builds an index over synthetic clustered 1280-d embeddings (one category,
+so every query scans the whole catalog) twice: exact and with the IVF
+partition. Queries are a few wardrobe garments each, like
+/generate-outfit sends. Recall@K is the overlap of the IVF hits with the
+exact ones.
+
+    python -m benchmarks.bench_similar --items 1000000 --nprobe 16
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.similar_items import SimilarItemIndex, build_index
+from benchmarks import harness
+
+DIM = 1280
+
+
+def synthetic_embeddings(n, dim=DIM, clusters=500, seed=0):
+    """Float16 embeddings around `clusters` random centers, generated in chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float16)
+    for start in range(0, n, 65536):
+        size = min(65536, n - start)
+        out[start:start + size] = centers[rng.integers(0, clusters, size)] + rng.normal(size=(size, dim)).astype(np.float32)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--garments', type=int, default=4, help="Query vectors per search")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=16)
+    args = parser.parse_args()
+
+    embeddings = synthetic_embeddings(args.items)
+    items = [{'_id': f"cat_{i}", 'category': 'Tops', 'style': 'Casual'} for i in range(args.items)]
+    rng = np.random.default_rng(1)
+    queries = [embeddings[rng.integers(0, args.items, args.garments)].astype(np.float32)
+               + 0.1 * rng.normal(size=(args.garments, DIM)).astype(np.float32) for _ in range(args.queries)]
+
+    root = tempfile.mkdtemp(prefix='similar-bench-')
+    results = {}
+    hits = {}
+    for name, ivf_min_items in (('exact', args.items + 1), ('ivf', 1)):
+        started = time.perf_counter()
+        build_index(embeddings, items, f"{root}/{name}", ivf_min_items=ivf_min_items)
+        print(f"{name}: built in {time.perf_counter() - started:.1f}s")
+        index = SimilarItemIndex(f"{root}/{name}")
+        hits[name] = [[item['_id'] for item, _ in index.search(q, 'Tops', args.k, nprobe=args.nprobe)] for q in queries]
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            index.search(q, 'Tops', args.k, nprobe=args.nprobe)
+            latencies.append(time.perf_counter() - t0)
+        results[f"similar/{name}/{args.items}"] = harness.summarize(latencies, sum(latencies))
+    harness.print_table(results)
+    recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(hits['ivf'], hits['exact'])])
+    print(f"recall@{args.k} (ivf vs exact, nprobe={args.nprobe}): {recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
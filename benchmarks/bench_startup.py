@@ -0,0 +1,62 @@
+"""
+Measures cold-start cost of the FastAPI app: import time, whether importing
+main.py pulls in TensorFlow, time until the registry reports ready, and
+peak resident memory at each step. Each run happens in a fresh interpreter.
+
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+result = {
+    "import_s": imported - start,
+    "tensorflow_imported_by_main": "tensorflow" in sys.modules,
+    "rss_after_import_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}
+if LOAD:
+    from app.model_registry import registry
+    try:
+        for name in main.REQUIRED_MODELS:
+            registry.get(name)
+        result["ready_s"] = time.perf_counter() - start
+        result["models"] = registry.status(main.REQUIRED_MODELS)
+    except Exception as e:
+        result["error"] = str(e)
+    result["rss_after_ready_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+'''
+
+
+def run_once(load):
+    out = subprocess.run([sys.executable, '-c', PROBE.replace('LOAD', str(load))],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--no-load', action='store_true', help="Only measure importing main.py")
+    args = parser.parse_args()
+
+    results = [run_once(load=not args.no_load) for _ in range(args.runs)]
+    for i, result in enumerate(results):
+        print(f"run {i}: {json.dumps(result)}")
+    best_import = min(r['import_s'] for r in results)
+    print(f"best import: {best_import:.2f}s, peak RSS after import: "
+          f"{min(r['rss_after_import_mb'] for r in results):.0f} MB")
+    ready = [r['ready_s'] for r in results if 'ready_s' in r]
+    if ready:
+        print(f"best time to ready: {min(ready):.2f}s, peak RSS when ready: "
+              f"{min(r['rss_after_ready_mb'] for r in results):.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
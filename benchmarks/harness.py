@@ -0,0 +1,96 @@
+"""
+Timing, summary statistics and baseline comparison for the benchmark suite.
+
+Every case is summarized the same way (throughput and latency percentiles),
+so micro-benchmarks and HTTP load results can be stored in one JSON file and
+compared against a saved baseline.
+"""
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+# A case regresses when p95 grows or throughput drops by more than this fraction
+DEFAULT_TOLERANCE = 0.2
+
+
+def summarize(latencies_s, wall_s, errors=0):
+    latencies_ms = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    if not len(latencies_ms):
+        return {'count': 0, 'errors': errors}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'count': int(len(latencies_ms)),
+        'errors': errors,
+        'throughput_per_s': len(latencies_ms) / wall_s if wall_s > 0 else 0.0,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+
+
+def time_calls(fn, min_calls=5, max_calls=1000, budget_s=2.0):
+    """Calls `fn` sequentially until `max_calls` or the time budget is used up (at least `min_calls`)."""
+    fn()  # warm caches and lazy imports outside the measurement
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_calls:
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+        if len(latencies) >= min_calls and time.perf_counter() - started >= budget_s:
+            break
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(cases, baseline_cases, tolerance=DEFAULT_TOLERANCE):
+    """Returns a list of human-readable regressions of `cases` against `baseline_cases`."""
+    regressions = []
+    for name, current in sorted(cases.items()):
+        base = baseline_cases.get(name)
+        if not base or not base.get('count') or not current.get('count'):
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current['throughput_per_s'] < base['throughput_per_s'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_per_s']:.1f} -> "
+                               f"{current['throughput_per_s']:.1f}/s")
+        if current.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def print_table(cases):
+    print(f"{'case':<48} {'n':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>4}")
+    for name, s in sorted(cases.items()):
+        if not s.get('count'):
+            print(f"{name:<48} {'-':>6}")
+            continue
+        print(f"{name:<48} {s['count']:>6} {s['throughput_per_s']:>9.1f} {s['p50_ms']:>9.2f} "
+              f"{s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['errors']:>4}")
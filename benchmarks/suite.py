@@ -0,0 +1,75 @@
+"""
+Runs the micro-benchmarks and the HTTP load scenarios, stores the results
+as JSON and flags regressions against a baseline.
+
+    python -m benchmarks.suite --save-baseline          # record benchmarks/results/baseline.json
+    python -m benchmarks.suite                          # compare; exits 1 on regression
+    python -m benchmarks.suite --quick --only outfit    # a fast subset while iterating
+
+Results are machine specific: record the baseline on the same host (and
+with the same settings) you compare on.
+"""
+import argparse
+import os
+import sys
+
+from benchmarks import harness, synthetic
+
+BASELINE_PATH = os.path.join(harness.RESULTS_DIR, 'baseline.json')
+LATEST_PATH = os.path.join(harness.RESULTS_DIR, 'latest.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help="Small wardrobes and images, short budgets")
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--only', help="Run only cases whose name contains this")
+    parser.add_argument('--url', help="Load a running server instead of the in-process app")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--output', default=LATEST_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=harness.DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    synthetic.isolate_state()
+    # Imported after isolate_state() so the app modules pick up the throwaway directories
+    from benchmarks import bench_load, bench_micro
+
+    sizes = (10, 100) if args.quick else synthetic.WARDROBE_SIZES
+    jpeg_sizes = ('small',) if args.quick else tuple(synthetic.JPEG_SIZES)
+    cases = {}
+    if not args.skip_micro:
+        cases.update(bench_micro.run(sizes, jpeg_sizes, budget_s=0.5 if args.quick else 2.0, only=args.only))
+    if not args.skip_load:
+        cases.update(bench_load.run(url=args.url, sizes=sizes, jpeg_sizes=jpeg_sizes,
+                                    concurrency=args.concurrency, duration_s=1.0 if args.quick else 5.0,
+                                    only=args.only))
+    harness.print_table(cases)
+
+    results = {'environment': harness.environment(), 'quick': args.quick, 'cases': cases}
+    harness.save(results, args.output)
+    print(f"Saved {args.output}")
+    if args.save_baseline:
+        harness.save(results, args.baseline)
+        print(f"Saved baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; record one with --save-baseline")
+        return
+
+    baseline = harness.load(args.baseline)
+    if baseline.get('quick') != args.quick:
+        print("Warning: baseline was recorded with a different --quick setting")
+    regressions = harness.compare(cases, baseline['cases'], args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
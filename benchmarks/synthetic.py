@@ -0,0 +1,116 @@
+"""
+Synthetic inputs shared by the benchmarks: wardrobes, JPEGs and a tiny
+stand-in for the category model, so every benchmark runs offline and
+without TensorFlow.
+"""
+import io
+import os
+import random
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+CATEGORIES = ('Tops', 'Bottoms', 'Shoes')
+STYLES = ('Casual', 'Work', 'Party', 'Formal', 'Neutral')
+COLORS = ('Black', 'White', 'Blue', 'Red', 'Green', 'Yellow', 'Gray', 'Beige', 'Navy', 'Brown',
+          'Orange', 'Pink', 'Silver', 'Gold', 'Purple')
+NAME_WORDS = ('Cotton', 'Slim', 'Fitted', 'Relaxed', 'Linen', 'Wool', 'Denim', 'Leather', 'Classic', 'Loose')
+WARDROBE_SIZES = (10, 100, 1000)
+# name -> (width, height); "large" is a 12 MP phone photo
+JPEG_SIZES = {'small': (320, 240), 'medium': (1280, 960), 'large': (4032, 3024)}
+TIP_PAYLOADS = [
+    {'category': 'jeans', 'material': 'denim'},
+    {'category': 'sweater', 'material': 'wool'},
+    {'category': 'shirt', 'material': 'cotton'},
+    {'category': 'dress', 'material': 'silk'},
+]
+QUESTIONS = [
+    "How should I wash my jeans?",
+    "Can I repair a hole in my sweater?",
+    "What do I do with clothes I never wear?",
+    "How do I keep wool from shrinking in the wash?",
+]
+
+
+def isolate_state():
+    """Points the prediction cache, wardrobe store, catalog store and similar-item index at a throwaway directory.
+
+    Must run before the app modules are imported; they read these settings at import time.
+    """
+    root = tempfile.mkdtemp(prefix='ai-service-bench-')
+    os.environ.setdefault('PREDICTION_CACHE_DIR', os.path.join(root, 'cache'))
+    os.environ.setdefault('WARDROBE_STORE_DIR', os.path.join(root, 'wardrobes'))
+    os.environ.setdefault('SIMILAR_INDEX_DIR', os.path.join(root, 'similar_items'))
+    os.environ.setdefault('CATALOG_CACHE_DIR', os.path.join(root, 'catalog'))
+    return root
+
+
+def synthetic_item(i, category, rng):
+    return {
+        '_id': f"item_{category.lower()}_{i}",
+        'name': f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {category[:-1]}",
+        'category': category,
+        'style': rng.choice(STYLES),
+        'color': rng.choice(COLORS),
+        'imageUrl': f"https://placehold.co/400x400?text={category}+{i}",
+    }
+
+
+def synthetic_wardrobe(per_category, seed=0):
+    """A categorized wardrobe with `per_category` items in each of Tops, Bottoms and Shoes."""
+    rng = random.Random(seed)
+    return [synthetic_item(i, category, rng) for category in CATEGORIES for i in range(per_category)]
+
+
+def synthetic_payload(per_category, seed=0, style='Casual', top_k=None):
+    payload = {'wardrobe': synthetic_wardrobe(per_category, seed), 'style': style,
+               'height': 170, 'weight': 65, 'body_color': 'Warm'}
+    if top_k is not None:
+        payload['top_k'] = top_k
+    return payload
+
+
+def synthetic_photo(width, height, seed):
+    """Smooth noise with some edges, so it compresses roughly like a real photo."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 64), max(1, width // 64), 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BICUBIC).filter(ImageFilter.DETAIL)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def unique_variant(blob, i):
+    """Same pixels, different content hash: decoders ignore bytes after the JPEG end marker."""
+    return blob + b'bench-%d' % i
+
+
+class TinyModel:
+    """Stand-in for the category model: average-pools the batch and applies a fixed linear layer."""
+
+    def __init__(self, class_names=CATEGORIES, seed=0):
+        self.name = 'category'
+        self.backend = 'tiny'
+        self.class_names = np.array(class_names, dtype=object)
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((8 * 8 * 3, len(class_names))).astype(np.float32)
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        pooled = batch.reshape(len(batch), 8, 28, 8, 28, 3).mean(axis=(2, 4)).reshape(len(batch), -1)
+        logits = pooled @ self.weights
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def warmup(self, batch_sizes):
+        for size in batch_sizes:
+            self.predict(np.zeros((size, 224, 224, 3), dtype=np.float32))
+
+
+def install_tiny_model():
+    from app.model_registry import registry
+    model = TinyModel()
+    registry.install('category', model)
+    return model
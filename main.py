@@ -1,9 +1,23 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import json
+import os
+import time
+from typing import List
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from PIL import UnidentifiedImageError
 from fastapi.middleware.cors import CORSMiddleware
-from app.predict import predict_category
-from app.outfits import generate_outfit
-from app.sustainability import get_sustainability_tip
-from app.nlp import handle_user_question
+from app.predict import predict_category, predict_categories, batching_stats
+from app.outfits import generate_outfit, categorize_wardrobe, validate_payload
+from app.wardrobe_index import wardrobe_store
+from app.catalog import preload_catalog
+from app.fetch import close_client
+from app.cache import PredictionCache, prediction_cache
+from app.batching import BatchingEngine
+from app.model_registry import registry
+from app.sustainability import get_sustainability_tip, get_sustainability_tips
+from app.nlp import handle_user_question, handle_user_questions
+from app.metrics import metrics, SamplingProfiler
+from app.admission import AdmissionError, Overloaded, EndpointLimiter, CPU_WORKERS, RETRY_AFTER_S, run_cpu, cpu_stats
 import uvicorn
 
 app = FastAPI()
@@ -12,34 +26,240 @@ app = FastAPI()
 origins = ["http://localhost:3000", "http://localhost:5001", "https://ai-wardrobe-backend-production.up.railway.app" , "https://stylezap-wardrobe-ai.vercel.app/"]  # Adjust to your ports
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# Models that must be loaded and warmed up before /readyz reports ready
+REQUIRED_MODELS = [name for name in os.environ.get("REQUIRED_MODELS", "category").split(",") if name]
+# Per-request sampling profiles ("X-Profile: 1") are only honoured when this is switched on
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+
+# Per-endpoint admission: (max concurrent, max queued, default deadline in seconds); see app/admission.py.
+# Each is overridable with e.g. GENERATE_OUTFIT_MAX_CONCURRENT / _MAX_QUEUE / _DEADLINE_MS.
+LIMITS = {
+    # Concurrent single-image requests are what fills the batching engine's batches
+    "predict_category": EndpointLimiter.from_env("predict_category", 64, 256, 5.0),
+    # Streams for as long as the upload takes, so no default deadline
+    "predict_category_bulk": EndpointLimiter.from_env("predict_category_bulk", 2, 0, None),
+    "generate_outfit": EndpointLimiter.from_env("generate_outfit", 2 * CPU_WORKERS, 32, 10.0),
+    "upsert_wardrobe_items": EndpointLimiter.from_env("upsert_wardrobe_items", 2 * CPU_WORKERS, 32, 10.0),
+    "delete_wardrobe_item": EndpointLimiter.from_env("delete_wardrobe_item", 2 * CPU_WORKERS, 32, 10.0),
+    "sustainability_tip_batch": EndpointLimiter.from_env("sustainability_tip_batch", 2 * CPU_WORKERS, 16, 5.0),
+    "ask_advisor": EndpointLimiter.from_env("ask_advisor", 2 * CPU_WORKERS, 64, 5.0),
+    "ask_advisor_batch": EndpointLimiter.from_env("ask_advisor_batch", CPU_WORKERS, 16, 10.0),
+}
+
+# Monotonic stats (hits, admitted, shed, ...) are exported as *_total counters, the rest as gauges
+metrics.add_collector(prediction_cache.stats, "prediction_cache_", PredictionCache.COUNTERS)
+metrics.add_collector(batching_stats, "batching_", BatchingEngine.COUNTERS)
+for name, limiter in LIMITS.items():
+    metrics.add_collector(limiter.stats, f"admission_{name}_", EndpointLimiter.COUNTERS)
+metrics.add_collector(cpu_stats, "cpu_pool_")
+
+def server_error(stage, e):
+    """Counts the failure by stage and exception type before hiding it behind a 500."""
+    if isinstance(e, AdmissionError):
+        # Shed or expired, not a server fault; answered by admission_error_handler
+        return e
+    metrics.count_error(stage, e)
+    return HTTPException(status_code=500, detail=str(e))
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    Calls `release` once the response is over, however it ends. A client
+    that disconnects before the body is iterated never runs the generator's
+    finally, and Starlette skips background tasks when the send fails.
+    """
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, e: AdmissionError):
+    metrics.count_error("admission", e)
+    # 503s are retryable once the queue drains; 504 means this request's own deadline passed
+    headers = {"Retry-After": str(RETRY_AFTER_S)} if isinstance(e, Overloaded) else None
+    return JSONResponse(status_code=e.status_code, content={"detail": str(e)}, headers=headers)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    profiler = None
+    if PROFILE_REQUESTS and request.headers.get("x-profile") == "1":
+        profiler = SamplingProfiler().start()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        # Route templates keep label cardinality bounded (e.g. /wardrobes/{wardrobe_id}/items)
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.observe_request(request.method, endpoint, status, time.perf_counter() - started)
+        if profiler is not None:
+            profiler.stop()
+    if profiler is not None:
+        response.headers["X-Profile-Path"] = profiler.dump(f"{request.method}{endpoint}")
+    return response
+
+@app.on_event("startup")
+async def startup():
+    # Load and warm up off the request path; /readyz flips once this finishes
+    registry.load_in_background(REQUIRED_MODELS)
+    # Compile (first run) and map the catalog off the event loop, before the first outfit request needs it
+    preload_catalog()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_client()
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/readyz")
+async def readyz():
+    status = registry.status(REQUIRED_MODELS)
+    if registry.is_ready(REQUIRED_MODELS):
+        return {"status": "ready", "models": status}
+    return JSONResponse(status_code=503, content={"status": "not ready", "models": status})
+
 @app.post("/predict-category")
-async def predict_category_endpoint(file: UploadFile = File(...)):
+async def predict_category_endpoint(request: Request, file: UploadFile = File(...)):
     try:
-        return await predict_category(file)
+        async with LIMITS["predict_category"].admit(request.headers):
+            return await predict_category(file)
+    except UnidentifiedImageError as e:
+        metrics.count_error("predict_category", e)
+        raise HTTPException(status_code=400, detail="Uploaded file is not a readable image")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise server_error("predict_category", e)
+
+@app.post("/predict-category/bulk")
+async def predict_category_bulk_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Many images (or zip archives of images) in one multipart request. Streams
+    one NDJSON line per image as it is classified, then a summary line.
+    """
+    # Admitted before streaming starts so an overloaded server can still answer 503
+    limiter = LIMITS["predict_category_bulk"]
+    await limiter.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release()
+
+    async def lines():
+        count = errors = 0
+        try:
+            async for result in predict_categories(files):
+                count += 1
+                errors += "error" in result
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            metrics.count_error("predict_category_bulk", e)
+            yield json.dumps({"error": f"{type(e).__name__}: {e}"}) + "\n"
+        finally:
+            release()
+        yield json.dumps({"done": True, "count": count, "errors": errors}) + "\n"
+    return ReleasingStreamingResponse(lines(), release, media_type="application/x-ndjson")
+
+@app.get("/predict-category/stats")
+async def predict_category_stats_endpoint():
+    return {"batching": batching_stats(), "cache": prediction_cache.stats()}
 
 @app.post("/generate-outfit")
-async def generate_outfit_endpoint(payload: dict):
+async def generate_outfit_endpoint(request: Request, payload: dict):
+    try:
+        validate_payload(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Registered wardrobes are referenced by id instead of re-sending the whole list
+    index = None
+    if payload.get("wardrobe_id"):
+        index = wardrobe_store.get(payload["wardrobe_id"])
+        if index is None:
+            raise HTTPException(status_code=404, detail="Unknown wardrobe_id")
+    try:
+        async with LIMITS["generate_outfit"].admit(request.headers):
+            return await generate_outfit(payload, index=index)
+    except Exception as e:
+        raise server_error("generate_outfit", e)
+
+@app.put("/wardrobes/{wardrobe_id}/items")
+async def upsert_wardrobe_items_endpoint(request: Request, wardrobe_id: str, payload: dict):
+    items = payload.get("items", [])
+    if not isinstance(items, list) or any(not isinstance(item, dict) or not item.get("_id") for item in items):
+        raise HTTPException(status_code=400, detail="'items' must be a list of objects with an '_id'")
     try:
-        return generate_outfit(payload)
+        async with LIMITS["upsert_wardrobe_items"].admit(request.headers):
+            await categorize_wardrobe(items)
+            index, changed = await run_cpu(wardrobe_store.upsert_items, wardrobe_id, items)
+        return {"wardrobe_id": wardrobe_id, "upserted": changed, "count": len(index), "version": index.version}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise server_error("upsert_wardrobe_items", e)
+
+@app.delete("/wardrobes/{wardrobe_id}/items/{item_id}")
+async def delete_wardrobe_item_endpoint(request: Request, wardrobe_id: str, item_id: str):
+    try:
+        async with LIMITS["delete_wardrobe_item"].admit(request.headers):
+            # File lock, log replay and append; same path as the upsert
+            index, removed = await run_cpu(wardrobe_store.delete_items, wardrobe_id, [item_id])
+    except Exception as e:
+        raise server_error("delete_wardrobe_item", e)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Unknown wardrobe or item")
+    return {"wardrobe_id": wardrobe_id, "deleted": removed, "count": len(index), "version": index.version}
 
 @app.post("/sustainability-tip")
 async def sustainability_tip_endpoint(payload: dict):
     try:
+        # A couple of dict lookups; cheaper inline than a hop to the CPU pool
         return get_sustainability_tip(payload)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise server_error("sustainability_tip", e)
+
+@app.post("/sustainability-tip/batch")
+async def sustainability_tip_batch_endpoint(request: Request, payload: dict):
+    items = payload.get("items", [])
+    if not isinstance(items, list) or any(not isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="'items' must be a list of objects")
+    try:
+        async with LIMITS["sustainability_tip_batch"].admit(request.headers):
+            return {"results": await run_cpu(get_sustainability_tips, items)}
+    except Exception as e:
+        raise server_error("sustainability_tip_batch", e)
 
 @app.post("/ask-advisor")
-async def nlp_endpoint(payload: dict):
+async def nlp_endpoint(request: Request, payload: dict):
     try:
         question = payload.get("question", "")
-        return handle_user_question(question)
+        async with LIMITS["ask_advisor"].admit(request.headers):
+            return await run_cpu(handle_user_question, question)
+    except Exception as e:
+        raise server_error("ask_advisor", e)
+
+@app.post("/ask-advisor/batch")
+async def nlp_batch_endpoint(request: Request, payload: dict):
+    questions = payload.get("questions", [])
+    if not isinstance(questions, list) or any(not isinstance(q, str) for q in questions):
+        raise HTTPException(status_code=400, detail="'questions' must be a list of strings")
+    try:
+        async with LIMITS["ask_advisor_batch"].admit(request.headers):
+            return {"answers": await run_cpu(handle_user_questions, questions)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise server_error("ask_advisor_batch", e)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,76 @@
+"""
+Dominant garment color from decoded uint8 images.
+
+The image is downsampled, pixels that look like the background (close to
+the median color of the image border) are masked out, and a small k-means
+runs over what is left. The centroid of the largest cluster is mapped to
+the nearest named color in a palette such as COLOR_MAP in
+api/recommendation.py. Everything is vectorized across the whole batch, so
+tagging 32 images costs about as much NumPy dispatch as tagging one.
+"""
+import numpy as np
+
+# Keep every STRIDE-th pixel in each direction: 224x224 -> 56x56
+STRIDE = 4
+CLUSTERS = 4
+ITERATIONS = 8
+BORDER = 2
+# Pixels closer than this (0-255 RGB distance) to the border color count as background
+BACKGROUND_DISTANCE = 40.0
+# Fall back to all pixels when the mask keeps less than this fraction of the image
+MIN_GARMENT_FRACTION = 0.05
+
+
+def garment_mask(pixels):
+    """(B, H, W, 3) float32 -> (B, H, W) bool, False where a pixel matches the border color."""
+    border = np.concatenate([pixels[:, :BORDER].reshape(len(pixels), -1, 3),
+                             pixels[:, -BORDER:].reshape(len(pixels), -1, 3),
+                             pixels[:, :, :BORDER].reshape(len(pixels), -1, 3),
+                             pixels[:, :, -BORDER:].reshape(len(pixels), -1, 3)], axis=1)
+    background = np.median(border, axis=1)
+    distance = np.linalg.norm(pixels - background[:, None, None, :], axis=-1)
+    mask = distance > BACKGROUND_DISTANCE
+    too_small = mask.mean(axis=(1, 2)) < MIN_GARMENT_FRACTION
+    mask[too_small] = True
+    return mask
+
+
+def dominant_rgb(images, k=CLUSTERS, iterations=ITERATIONS):
+    """(B, H, W, 3) uint8 -> (B, 3) float32 RGB centroid of each image's largest garment cluster."""
+    images = np.asarray(images)
+    if images.ndim == 3:
+        images = images[np.newaxis]
+    pixels = images[:, ::STRIDE, ::STRIDE].astype(np.float32)
+    weights = garment_mask(pixels).reshape(len(pixels), -1).astype(np.float32)
+    pixels = pixels.reshape(len(pixels), -1, 3)
+
+    # Deterministic init: spread the seeds over the brightness quantiles of the garment pixels
+    brightness = pixels.sum(axis=-1) + (1.0 - weights) * 1e6  # background sorts last
+    order = np.argsort(brightness, axis=1)
+    counts = weights.sum(axis=1).astype(np.int64)
+    seeds = ((np.arange(k) + 0.5) / k * counts[:, None]).astype(np.int64)
+    centers = np.take_along_axis(pixels, np.take_along_axis(order, seeds, axis=1)[..., None], axis=1)
+
+    squared_norms = (pixels ** 2).sum(axis=-1)[..., None]
+    for _ in range(iterations):
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, as one batched matmul instead of a (B, P, k, 3) temporary
+        distances = squared_norms - 2.0 * (pixels @ centers.transpose(0, 2, 1)) + (centers ** 2).sum(axis=-1)[:, None, :]
+        assignment = (distances.argmin(axis=2)[..., None] == np.arange(k)) * weights[..., None]
+        sizes = assignment.sum(axis=1)
+        sums = assignment.transpose(0, 2, 1) @ pixels
+        # Empty clusters keep their previous center
+        centers = np.where(sizes[..., None] > 0, sums / np.maximum(sizes, 1)[..., None], centers)
+    largest = sizes.argmax(axis=1)
+    return centers[np.arange(len(centers)), largest]
+
+
+def nearest_color_names(rgb, palette):
+    """Maps (B, 3) 0-255 RGB to the nearest names in `palette` ({name: [r, g, b] in 0-1})."""
+    names = list(palette)
+    vectors = np.asarray([palette[name] for name in names], dtype=np.float32) * 255.0
+    distances = ((np.asarray(rgb, dtype=np.float32)[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=-1)
+    return [names[i] for i in distances.argmin(axis=1)]
+
+
+def dominant_color_names(images, palette):
+    return nearest_color_names(dominant_rgb(images), palette)
@@ -0,0 +1,63 @@
+"""
+Shared image preprocessing for every model input path.
+
+Images are decoded straight to (roughly) the model's input size: JPEGs use
+PIL's draft mode, which lets libjpeg scale down by 1/2, 1/4 or 1/8 while
+decoding, and anything left over is resized with `reducing_gap` so large
+images are box-reduced before the final bicubic pass. Pixels stay uint8
+until they are written into a preallocated float32 batch, which is then
+scaled in place with MobileNetV2's preprocess_input.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+TARGET_SIZE = (224, 224)
+# Box-reduce before resampling once the image is this many times larger than the target
+REDUCING_GAP = 3.0
+
+
+def load_image(source, size=TARGET_SIZE):
+    """Decodes bytes, a path or a file object to a uint8 (H, W, 3) array of `size`."""
+    img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+    # Only JPEG honours draft(); it never goes below the requested size
+    img.draft('RGB', size)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != size:
+        img = img.resize(size, Image.BICUBIC, reducing_gap=REDUCING_GAP)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def preprocess_input(x):
+    """
+    MobileNetV2 scaling from [0, 255] to [-1, 1], same as the Keras helper.
+    float32 arrays are scaled in place; anything else is converted once.
+    """
+    if not (isinstance(x, np.ndarray) and x.dtype == np.float32):
+        x = np.asarray(x, dtype=np.float32)
+        if not x.flags.writeable:
+            x = x.copy()
+    x /= 127.5
+    x -= 1.0
+    return x
+
+
+def new_batch(n, size=TARGET_SIZE):
+    return np.empty((n, size[1], size[0], 3), dtype=np.float32)
+
+
+def to_batch(images, size=TARGET_SIZE):
+    """Writes uint8 images into one preallocated float32 batch and preprocesses it in place."""
+    batch = new_batch(len(images), size)
+    for i, img in enumerate(images):
+        batch[i] = img
+    return preprocess_input(batch)
+
+
+def prepare_image(source, size=TARGET_SIZE):
+    """One image as a preprocessed (1, H, W, 3) float32 batch."""
+    batch = new_batch(1, size)
+    batch[0] = load_image(source, size)
+    return preprocess_input(batch)
@@ -0,0 +1,25 @@
+"""
+parse_deadline: the client's deadline header is clamped, and anything that
+isn't a finite number falls back to the endpoint's default budget.
+"""
+import time
+
+import pytest
+
+from app.admission import DEADLINE_HEADER, MAX_DEADLINE_MS, parse_deadline
+
+
+def budget(value, default_s=2.0):
+    headers = {} if value is None else {DEADLINE_HEADER: value}
+    return parse_deadline(headers, default_s) - time.monotonic()
+
+
+@pytest.mark.parametrize('value', [None, 'soon', 'nan', 'NaN', 'inf', '-inf'])
+def test_unusable_headers_use_the_default(value):
+    assert 1.9 < budget(value) <= 2.0
+
+
+def test_header_is_clamped():
+    assert 0.4 < budget('500') <= 0.5
+    assert budget('-5') <= 0
+    assert budget(str(MAX_DEADLINE_MS * 10)) <= MAX_DEADLINE_MS / 1000.0
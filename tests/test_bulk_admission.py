@@ -0,0 +1,62 @@
+"""
+The bulk endpoint's admission slot must come back however the streamed
+response ends, including clients that leave before the body is read.
+"""
+import asyncio
+import io
+
+import httpx
+import pytest
+from starlette.datastructures import UploadFile
+
+import main
+
+LIMITER = main.LIMITS["predict_category_bulk"]
+
+
+def upload():
+    return UploadFile(file=io.BytesIO(b'not an image'), filename='notes.txt')
+
+
+def scope(spec_version):
+    return {'type': 'http', 'asgi': {'version': '3.0', 'spec_version': spec_version}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': '/predict-category/bulk', 'headers': []}
+
+
+async def hang_up(message):
+    # The client is gone before the first byte goes out
+    raise OSError("connection reset")
+
+
+async def slow_start(message):
+    await asyncio.sleep(0.5)
+
+
+async def disconnected():
+    return {'type': 'http.disconnect'}
+
+
+async def abandon(spec_version, send):
+    response = await main.predict_category_bulk_endpoint(files=[upload()])
+    try:
+        await response(scope(spec_version), disconnected, send)
+    except Exception:
+        pass  # e.g. ClientDisconnect; what matters is the slot
+
+
+@pytest.mark.parametrize('spec_version, send', [('2.4', hang_up), ('2.0', slow_start)],
+                         ids=['send-fails', 'disconnect-before-body'])
+def test_abandoned_bulk_streams_release_their_slot(spec_version, send):
+    async def run():
+        for _ in range(LIMITER.max_concurrent + 2):
+            await abandon(spec_version, send)
+        assert LIMITER.active == 0
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            response = await client.post('/predict-category/bulk',
+                                         files=[('files', ('notes.txt', b'not an image', 'text/plain'))])
+        assert response.status_code == 200
+        assert response.text.splitlines()[-1].startswith('{"done": true')
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+"""
+PredictionCache tiers and versioning: the disk tier is read separately from
+the memory tier, and entries are tied to the model files and the backend.
+"""
+from app.cache import PredictionCache
+
+
+def cache(tmp_path, backend='keras'):
+    model = tmp_path / 'model.tflite'
+    if not model.exists():
+        model.write_bytes(b'v1')
+    return PredictionCache(db_path=str(tmp_path / 'predictions.sqlite3'), watch_paths=[str(model)],
+                           backend=backend)
+
+
+def test_disk_tier_is_read_only_by_get_disk(tmp_path):
+    writer = cache(tmp_path)
+    writer.put('k', 'Tops')
+    assert writer.flush()
+
+    reader = cache(tmp_path)
+    assert reader.get_memory('k') is None
+    assert reader.get_disk('k') == 'Tops'
+    assert reader.get_memory('k') == 'Tops'
+    assert reader.get_disk('missing') is None
+    stats = reader.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_entries_are_tied_to_the_backend_and_model_file(tmp_path):
+    writer = cache(tmp_path, backend='tflite-fp16')
+    writer.put('k', 'Tops')
+    assert writer.flush()
+
+    assert cache(tmp_path, backend='tflite-fp16').get('k') == 'Tops'
+    assert cache(tmp_path, backend='keras').get('k') is None
+    (tmp_path / 'model.tflite').write_bytes(b'v2, retrained')
+    assert cache(tmp_path, backend='tflite-fp16').get('k') is None
@@ -0,0 +1,105 @@
+"""
+get_catalog() reloads: background recompiles, and the empty fallback for a
+missing or invalid catalog file.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from app import catalog
+
+
+def write_catalog(path, items):
+    with open(path, 'w') as f:
+        f.writelines(json.dumps(item) + '\n' for item in items)
+
+
+def item(i, category='Tops'):
+    return {'_id': f"sku-{i}", 'category': category, 'style': 'Casual', 'color': 'Red'}
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    path = tmp_path / 'catalog.jsonl'
+    monkeypatch.setattr(catalog, 'CATALOG_PATH', str(path))
+    monkeypatch.setattr(catalog, 'CATALOG_CACHE_DIR', str(tmp_path / 'compiled'))
+    monkeypatch.setattr(catalog, 'RELOAD_CHECK_INTERVAL_S', 0.0)
+    for name, value in (('_catalog', None), ('_catalog_version', None), ('_last_check', 0.0), ('_reloader', None)):
+        monkeypatch.setattr(catalog, name, value)
+    return path
+
+
+def wait_for_reload():
+    if catalog._reloader is not None:
+        catalog._reloader.join(timeout=30)
+
+
+def test_missing_file_serves_an_empty_catalog(source, capsys):
+    current = catalog.get_catalog()
+    assert len(current) == 0
+    assert current.select('Tops', ['casual'], limit=3) == []
+    assert 'Serving an empty catalog' in capsys.readouterr().out
+
+    write_catalog(source, [item(1)])
+    catalog.get_catalog()
+    wait_for_reload()
+    assert [i['_id'] for i in catalog.get_catalog().select('Tops')] == ['sku-1']
+
+
+def test_changes_are_compiled_in_the_background(source, monkeypatch):
+    write_catalog(source, [item(1)])
+    first = catalog.get_catalog()
+    assert len(first) == 1
+
+    compile_catalog = catalog.compile_catalog
+    started, release = threading.Event(), threading.Event()
+
+    def slow_compile(path, directory):
+        started.set()
+        release.wait(30)
+        compile_catalog(path, directory)
+
+    monkeypatch.setattr(catalog, 'compile_catalog', slow_compile)
+    time.sleep(0.01)  # a new mtime even on coarse clocks
+    write_catalog(source, [item(1), item(2)])
+    # The compile is running, but callers still get the old snapshot right away
+    assert catalog.get_catalog() is first
+    assert started.wait(30)
+    assert catalog.get_catalog() is first
+    release.set()
+    wait_for_reload()
+    assert len(catalog.get_catalog()) == 2
+
+
+def test_invalid_file_keeps_the_previous_catalog(source, capsys):
+    write_catalog(source, [item(1)])
+    first = catalog.get_catalog()
+    time.sleep(0.01)
+    source.write_text('{"_id": "broken"\n')
+    catalog.get_catalog()
+    wait_for_reload()
+    assert catalog.get_catalog() is first
+    assert 'Keeping previous catalog' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('line', ['[1, 2]', '"x"', '3', 'null'])
+def test_lines_that_are_not_objects_are_rejected(source, capsys, line):
+    source.write_text(line + '\n')
+    assert len(catalog.get_catalog()) == 0
+    assert 'JSON objects' in capsys.readouterr().out
+
+    # And on a hot reload the previous catalog stays, with no crash in the reload thread
+    time.sleep(0.01)
+    write_catalog(source, [item(1)])
+    catalog.get_catalog()
+    wait_for_reload()
+    first = catalog.get_catalog()
+    assert len(first) == 1
+    time.sleep(0.01)
+    source.write_text(json.dumps(item(2)) + '\n' + line + '\n')
+    catalog.get_catalog()
+    wait_for_reload()
+    assert catalog.get_catalog() is first
+    assert 'Keeping previous catalog' in capsys.readouterr().out
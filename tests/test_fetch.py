@@ -0,0 +1,188 @@
+"""
+app/fetch.py and the fetch stage of categorize_wardrobe against a local
+stand-in image server.
+"""
+import asyncio
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import outfits
+from app.cache import PredictionCache
+from app.fetch import fetch_images
+
+MAX_BYTES = 64 * 1024
+
+
+def png_bytes(color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ImageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ImageHandler)
+        self.hits = {}
+        self.sent = {}
+
+    def handle_error(self, request, client_address):
+        pass  # Clients hanging up mid-body is part of what's being tested
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type='image/png', length=True):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if length:
+            self.send_header('Content-Length', str(len(body)))
+        else:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        hits = self.server.hits
+        hits[self.path] = hits.get(self.path, 0) + 1
+        if self.path == '/shirt.png':
+            self._send(png_bytes())
+        elif self.path == '/slow.png':
+            time.sleep(2)
+            self._send(png_bytes())
+        elif self.path == '/huge.png':
+            self._send(b'\0' * (MAX_BYTES * 4))
+        elif self.path == '/huge-unsized.png':
+            # No Content-Length: only the streamed byte count can catch it
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            sent = 0
+            try:
+                for _ in range(1024):
+                    self.wfile.write(b'\0' * 16384)
+                    sent += 16384
+            except OSError:
+                pass
+            self.server.sent[self.path] = sent
+        elif self.path == '/notes.txt':
+            self._send(b'not an image', content_type='text/plain')
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def server():
+    server = ImageServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+async def fetch(urls, **kwargs):
+    async with httpx.AsyncClient(timeout=1.0) as client:
+        return await fetch_images(urls, client=client, max_bytes=MAX_BYTES, **kwargs)
+
+
+def test_fetches_images_and_maps_failures_to_none(server):
+    urls = [server.url('/shirt.png'), server.url('/missing.png'), server.url('/notes.txt')]
+    blobs = asyncio.run(fetch(urls))
+    assert blobs[urls[0]] == png_bytes()
+    assert blobs[urls[1]] is None
+    # The fetcher doesn't judge content; decoding rejects it later
+    assert blobs[urls[2]] == b'not an image'
+
+
+def test_duplicate_urls_are_fetched_once(server):
+    url = server.url('/shirt.png')
+    blobs = asyncio.run(fetch([url, url, url]))
+    assert list(blobs) == [url]
+    assert server.hits['/shirt.png'] == 1
+
+
+def test_per_image_timeout(server):
+    urls = [server.url('/slow.png'), server.url('/shirt.png')]
+    started = time.monotonic()
+    blobs = asyncio.run(fetch(urls, deadline=None))
+    assert blobs[urls[0]] is None
+    assert blobs[urls[1]] is not None
+    assert time.monotonic() - started < 1.9
+
+
+def test_stage_deadline(server):
+    urls = [server.url('/slow.png')]
+    started = time.monotonic()
+    blobs = asyncio.run(fetch(urls, deadline=0.2))
+    assert blobs == {urls[0]: None}
+    assert time.monotonic() - started < 1.0
+
+
+def test_oversized_bodies_are_rejected(server):
+    urls = [server.url('/huge.png'), server.url('/huge-unsized.png')]
+    blobs = asyncio.run(fetch(urls))
+    assert blobs == {urls[0]: None, urls[1]: None}
+
+
+def test_unsized_oversized_body_is_abandoned_early(server):
+    url = server.url('/huge-unsized.png')
+    asyncio.run(fetch([url]))
+    for _ in range(50):
+        if '/huge-unsized.png' in server.sent:
+            break
+        time.sleep(0.02)
+    # The server gives up once the client hangs up, well before all 16 MB
+    assert server.sent['/huge-unsized.png'] < 1024 * 16384
+
+
+class FakeModel:
+    class_names = ['Bottoms', 'Shoes', 'Tops']
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(len(batch))
+        preds = np.zeros((len(batch), len(self.class_names)), dtype=np.float32)
+        preds[:, 2] = 1.0
+        return preds
+
+
+def test_categorize_wardrobe_batches_and_falls_back(server, monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(outfits.registry, 'get_optional', lambda name: model)
+    monkeypatch.setattr(outfits, 'prediction_cache', PredictionCache(db_path=None))
+    wardrobe = [
+        {'_id': '1', 'imageUrl': server.url('/shirt.png')},
+        {'_id': '2', 'imageUrl': server.url('/shirt.png')},
+        {'_id': '3', 'imageUrl': server.url('/notes.txt')},
+        {'_id': '4', 'imageUrl': server.url('/missing.png')},
+        {'_id': '5', 'category': 'Shoes', 'imageUrl': server.url('/shirt.png')},
+    ]
+
+    async def run():
+        async with httpx.AsyncClient(timeout=1.0) as client:
+            return await outfits.categorize_wardrobe(wardrobe, client=client)
+
+    asyncio.run(run())
+    assert [item['category'] for item in wardrobe] == ['Tops', 'Tops', 'Unknown', 'Unknown', 'Shoes']
+    # One download for the shared URL, one batched forward pass
+    assert server.hits['/shirt.png'] == 1
+    assert model.batches == [1]
@@ -0,0 +1,56 @@
+"""
+TFLiteModel with a stand-in interpreter: how many interpreters it allocates
+at warmup and on demand.
+"""
+import numpy as np
+
+from app import inference_backend
+from app.inference_backend import INPUT_SHAPE, TFLiteModel
+
+
+class FakeInterpreter:
+    allocated = []
+
+    def __init__(self, model_path, num_threads):
+        self.shape = (1,) + INPUT_SHAPE
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': self.shape, 'dtype': np.float32}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'dtype': np.float32}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = tuple(shape)
+
+    def allocate_tensors(self):
+        FakeInterpreter.allocated.append(self.shape[0])
+
+    def set_tensor(self, index, batch):
+        self.batch = batch
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return self.batch.reshape(len(self.batch), -1)[:, :2]
+
+
+def model(monkeypatch, **kwargs):
+    monkeypatch.setattr(inference_backend, '_interpreter_class', lambda: FakeInterpreter)
+    FakeInterpreter.allocated = []
+    return TFLiteModel('category', 'model.tflite', ['a', 'b'], 'tflite-fp16', max_batch=32, **kwargs)
+
+
+def test_pool_defaults_to_one_set(monkeypatch):
+    assert model(monkeypatch)._pool.qsize() == 1
+
+
+def test_warmup_allocates_only_the_requested_buckets(monkeypatch):
+    tflite = model(monkeypatch, pool_size=2)
+    tflite.warmup((1, 32))
+    assert sorted(FakeInterpreter.allocated) == [1, 1, 32, 32]
+
+    # Other sizes pad up to their bucket, allocated on first use
+    assert tflite.predict(np.ones((3,) + INPUT_SHAPE)).shape == (3, 2)
+    assert sorted(FakeInterpreter.allocated) == [1, 1, 4, 32, 32]
@@ -0,0 +1,135 @@
+"""
+app/inference_pool.py with a stand-in model process: the JSON control
+channel, authentication, the private socket directory and the timeouts.
+"""
+import os
+import socket
+import stat
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app import inference_pool
+from app.inference_pool import InferencePool, RemoteModel
+
+HANG_BATCH = 3
+
+
+def fake_worker(model_name, conn, threads):
+    """Answers with each image's first pixel value per class; a batch of HANG_BATCH never answers."""
+    conn.send(('ready', ['a', 'b', 'c']))
+    segments = {}
+    while True:
+        try:
+            shm_name, n, dtype, out_offset = conn.recv()
+        except (EOFError, OSError):
+            break
+        if n == HANG_BATCH:
+            time.sleep(60)
+        shm = segments.get(shm_name) or inference_pool._attach(shm_name)
+        segments[shm_name] = shm
+        batch = np.ndarray((n,) + inference_pool.INPUT_SHAPE, dtype=np.dtype(dtype), buffer=shm.buf)
+        preds = np.repeat(batch.reshape(n, -1)[:, :1].astype(np.float32), 3, axis=1)
+        np.ndarray(preds.shape, dtype=np.float32, buffer=shm.buf, offset=out_offset)[:] = preds
+        conn.send(('ok', 3))
+
+
+class FakePool(InferencePool):
+    def _spawn(self, slot):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=fake_worker, args=(self.model_name, child_conn, 1), daemon=True)
+        process.start()
+        child_conn.close()
+        _, self.class_names = parent_conn.recv()
+        self._ready.set()
+        return process, parent_conn
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.delenv('INFERENCE_POOL_AUTHKEY', raising=False)
+    address = str(tmp_path / 'pool' / 'pool.sock')
+    server = FakePool('category', address, workers=2, max_batch=4, timeout=1.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 30
+    while not os.path.exists(address):
+        assert time.monotonic() < deadline, "pool did not start"
+        time.sleep(0.05)
+    yield server
+    server.stop()
+
+
+def images(n):
+    return np.arange(n, dtype=np.uint8).repeat(int(np.prod(inference_pool.INPUT_SHAPE))).reshape(
+        (n,) + inference_pool.INPUT_SHAPE)
+
+
+def test_socket_and_key_are_private(pool):
+    directory = os.path.dirname(pool.address)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(os.path.join(directory, inference_pool.KEY_FILE_NAME)).st_mode) == 0o600
+
+
+def test_predict_splits_and_runs_concurrently(pool):
+    model = RemoteModel('category', pool.address, connections=3, timeout=1.0)
+    try:
+        assert list(model.class_names) == ['a', 'b', 'c']
+        np.testing.assert_array_equal(model.predict(images(6))[:, 0], np.arange(6))
+
+        shapes = []
+        threads = [threading.Thread(target=lambda: shapes.append(model.predict(images(2)).shape)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert shapes == [(2, 3)] * 6
+        assert 1 < model._idle.qsize() <= 3
+    finally:
+        model.close()
+
+
+def test_hung_worker_fails_the_request_and_is_replaced(pool):
+    model = RemoteModel('category', pool.address, timeout=1.0)
+    try:
+        with pytest.raises(RuntimeError, match='timed out'):
+            model.predict(images(HANG_BATCH))
+        np.testing.assert_array_equal(model.predict(images(2))[:, 0], [0, 1])
+        assert pool.stats()['restarts'] == 1
+    finally:
+        model.close()
+
+
+def test_client_gives_up_on_a_pool_that_never_answers(pool):
+    pool.timeout = 30.0
+    model = RemoteModel('category', pool.address, timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            model.predict(images(HANG_BATCH))
+        # The timed-out connection and its segment are discarded, not reused
+        assert model._idle.qsize() == 0
+    finally:
+        model.close()
+
+
+def test_wrong_authkey_is_rejected(pool, monkeypatch):
+    monkeypatch.setenv('INFERENCE_POOL_AUTHKEY', 'not-the-key')
+    with pytest.raises(ConnectionError, match='authkey'):
+        RemoteModel('category', pool.address)
+    assert pool.stats()['auth_failures'] == 1
+
+
+def test_oversized_frame_closes_the_connection(pool):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(pool.address)
+        inference_pool.recv_message(sock)
+        sock.sendall(inference_pool._FRAME_HEADER.pack(inference_pool.MAX_FRAME_BYTES + 1))
+        assert sock.recv(1) == b''
+
+
+def test_tcp_requires_an_authkey(monkeypatch):
+    monkeypatch.delenv('INFERENCE_POOL_AUTHKEY', raising=False)
+    with pytest.raises(RuntimeError, match='INFERENCE_POOL_AUTHKEY'):
+        InferencePool('category', '127.0.0.1:7777')
@@ -0,0 +1,31 @@
+"""
+validate_payload: the /generate-outfit fields rejected with a 400 before
+generate_outfit sees them.
+"""
+import pytest
+
+from app.outfits import validate_payload
+
+
+@pytest.mark.parametrize('payload', [
+    {},
+    {'style': 'Formal', 'height': 170, 'weight': 65.5, 'top_k': 3, 'max_item_repeats': 1},
+    {'height': None, 'top_k': None, 'max_item_repeats': None},
+])
+def test_valid_payloads(payload):
+    validate_payload(payload)
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'style': None}, "'style' must be a string"),
+    ({'height': '170'}, "'height' must be a number"),
+    ({'top_k': '3'}, "'top_k' must be a positive integer"),
+    ({'top_k': 2.0}, "'top_k' must be a positive integer"),
+    ({'top_k': True}, "'top_k' must be a positive integer"),
+    ({'top_k': 0}, "'top_k' must be a positive integer"),
+    ({'max_item_repeats': -1}, "'max_item_repeats' must be a positive integer"),
+    ({'wardrobe': [{'name': 3}]}, "Wardrobe item field 'name' must be a string"),
+])
+def test_invalid_payloads(payload, message):
+    with pytest.raises(ValueError, match=message):
+        validate_payload(payload)
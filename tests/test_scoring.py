@@ -0,0 +1,172 @@
+"""
+Equivalence of app/scoring.py with the scalar style_score + color_score +
+body_type_score loop that generate_outfit used before it was vectorized.
+"""
+import itertools
+import random
+
+import pytest
+
+from app.outfits import body_type_score, color_score, style_score
+from app.scoring import EncodedItems, best_triple, top_k_triples
+
+STYLES = ['Casual', 'casual', 'Neutral', 'Work', 'Formal', 'Party', 'semi-formal', 'Party Neutral', '']
+COLORS = ['Red', 'gold', 'Blue', 'silver', 'Black', 'gray', 'Navy', 'White', 'Beige', 'GREEN', '']
+NAMES = ['Elongating Trousers', 'Loose Tee', 'Fitted Blazer', 'loose fitted shirt', 'Plain Item', '']
+PREFERENCES = ['casual', 'party', 'formal', 'work', 'unknown']
+BODY_COLORS = ['warm', 'cool', 'neutral']
+# (height, weight): none, unset weight, short and heavy, tall and slight
+BODIES = [(None, None), (170, 0), (1.6, 80), (180, 50)]
+
+
+def random_item(rng, category, catalog):
+    item = {'category': category}
+    if catalog:
+        item['_id'] = f"vc_{category}_{rng.randrange(10 ** 6)}"
+    elif rng.random() < 0.9:
+        item['_id'] = str(rng.randrange(10 ** 6))
+    for field, values in (('style', STYLES), ('color', COLORS), ('name', NAMES)):
+        roll = rng.random()
+        if roll < 0.1:
+            item[field] = None
+        elif roll < 0.2:
+            continue  # missing
+        else:
+            item[field] = rng.choice(values)
+    return item
+
+
+def encode(items):
+    # The legacy loop recognized catalog items by their 'vc_' id prefix
+    return EncodedItems(items, from_catalog=['vc_' in item.get('_id', '') for item in items])
+
+
+def random_category(rng, n, catalog_share):
+    return [random_item(rng, 'X', rng.random() < catalog_share) for _ in range(n)]
+
+
+def legacy_view(item):
+    # The scalar functions call .lower() on the field, so null only ever worked as ''
+    return {k: ('' if v is None else v) for k, v in item.items()}
+
+
+def legacy_scores(tops, bottoms, shoes, style, body_color, height, weight):
+    """{(t, b, s): score} in loop order, skipping all-catalog triples like the old loop."""
+    scores = {}
+    tops, bottoms, shoes = ([legacy_view(item) for item in items] for items in (tops, bottoms, shoes))
+    for (t, top), (b, bottom), (s, shoe) in itertools.product(enumerate(tops), enumerate(bottoms), enumerate(shoes)):
+        current = [top, bottom, shoe]
+        if sum(1 for i in current if '_id' in i and 'vc_' in i['_id']) >= len(current):
+            continue
+        scores[(t, b, s)] = (style_score(current, style) + color_score(current, body_color)
+                             + body_type_score(current, height, weight))
+    return scores
+
+
+def cases(count, max_items=7):
+    rng = random.Random(4)
+    for _ in range(count):
+        share = rng.choice([0.0, 0.5, 1.0])
+        yield (tuple(random_category(rng, rng.randint(1, max_items), share) for _ in range(3)),
+               rng.choice(PREFERENCES), rng.choice(BODY_COLORS), rng.choice(BODIES))
+
+
+@pytest.mark.parametrize('wardrobe, style, body_color, body', list(cases(150)))
+def test_best_triple_matches_legacy_loop(wardrobe, style, body_color, body):
+    expected = legacy_scores(*wardrobe, style, body_color, *body)
+    best = best_triple(*(encode(items) for items in wardrobe), style, body_color, *body)
+    if not expected:
+        assert best is None
+        return
+    # max() keeps the first of equal scores in loop order
+    triple, score = max(expected.items(), key=lambda x: x[1])
+    assert best == (triple, score)
+
+
+@pytest.mark.parametrize('k', [1, 3, 10, 1000])
+def test_top_k_matches_brute_force(k):
+    for wardrobe, style, body_color, body in cases(40):
+        expected = legacy_scores(*wardrobe, style, body_color, *body)
+        ranked = top_k_triples(*(encode(items) for items in wardrobe), k, style, body_color, *body)
+        assert len({triple for triple, _ in ranked}) == len(ranked)
+        for triple, score in ranked:
+            assert expected[triple] == score
+        # Equal scores may be returned in either order, so compare the score lists
+        assert [score for _, score in ranked] == sorted(expected.values(), reverse=True)[:k]
+
+
+@pytest.mark.parametrize('max_item_repeats', [1, 2])
+def test_diverse_mode_is_greedy_under_repeat_limit(max_item_repeats):
+    k = 6
+    for wardrobe, style, body_color, body in cases(40):
+        expected = legacy_scores(*wardrobe, style, body_color, *body)
+        ranked = top_k_triples(*(encode(items) for items in wardrobe), k, style, body_color, *body,
+                               max_item_repeats=max_item_repeats)
+        usage = [dict(), dict(), dict()]
+        taken = set()
+
+        def allowed(triple):
+            return triple not in taken and all(usage[i].get(x, 0) < max_item_repeats for i, x in enumerate(triple))
+
+        for triple, score in ranked:
+            assert allowed(triple)
+            assert expected[triple] == score
+            # Each pick is the best triple still available after the previous picks
+            assert score == max(s for t, s in expected.items() if allowed(t))
+            taken.add(triple)
+            for i, x in enumerate(triple):
+                usage[i][x] = usage[i].get(x, 0) + 1
+        if len(ranked) < k:
+            assert not any(allowed(t) for t in expected)
+
+
+def test_all_catalog_triples_are_excluded():
+    # Catalog ids need no particular prefix; the caller marks where items came from
+    catalog = [{'_id': f"sku-{i}", 'style': 'Casual', 'color': 'Red', 'name': 'Loose'} for i in range(3)]
+    encoded = [EncodedItems(catalog, from_catalog=True) for _ in range(3)]
+    assert best_triple(*encoded, 'casual', 'warm', None, None) is None
+    assert top_k_triples(*encoded, 5, 'casual', 'warm', None, None) == []
+    assert top_k_triples(*encoded, 5, 'casual', 'warm', None, None, max_item_repeats=1) == []
+
+    own = [{'_id': 'mine', 'style': 'Neutral', 'color': 'Beige'}]
+    ranked = top_k_triples(EncodedItems(own), *encoded[1:], 20, 'casual', 'warm', None, None)
+    assert len(ranked) == 9
+    assert all(triple[0] == 0 for triple, _ in ranked)
+
+
+def test_style_ids_are_local_to_each_encoding():
+    import app.scoring as scoring
+    # Any client style string still matches exactly, and none is remembered process-wide
+    items = [{'_id': str(i), 'style': f"Style-{i}", 'color': 'Teal'} for i in range(3)]
+    encoded = EncodedItems(items)
+    assert list(encoded.style_scores('STYLE-1')) == [0.0, 10.0, 0.0]
+    assert list(encoded.style_scores('style-9')) == [0.0, 0.0, 0.0]
+    assert not hasattr(scoring, '_style_ids')
+
+
+def test_large_wardrobe_is_chunked_consistently(monkeypatch):
+    import app.scoring as scoring
+    rng = random.Random(7)
+    wardrobe = [random_category(rng, 30, 0.2) for _ in range(3)]
+    encoded = [encode(items) for items in wardrobe]
+    expected = legacy_scores(*wardrobe, 'party', 'cool', 1.6, 80)
+    # Force several blocks of tops per call
+    monkeypatch.setattr(scoring, 'CHUNK_ELEMENTS', 2000)
+    triple, score = max(expected.items(), key=lambda x: x[1])
+    assert best_triple(*encoded, 'party', 'cool', 1.6, 80) == (triple, score)
+    assert top_k_triples(*encoded, 1, 'party', 'cool', 1.6, 80)[0][1] == score
+
+
+def test_empty_wardrobe_falls_back_to_score_zero(monkeypatch):
+    from app import outfits
+
+    class Catalog:
+        def select(self, category, styles=None, colors=None, limit=None):
+            return [{'_id': f"sku-{category}-{i}", 'category': category, 'style': 'Casual', 'color': 'Red'}
+                    for i in range(limit or 1)]
+
+    monkeypatch.setattr(outfits, 'get_catalog', Catalog)
+    result = outfits.build_outfit({'wardrobe': [], 'style': 'Casual'})
+    assert result['score'] == 0
+    assert result['userItems'] == []
+    assert [item['category'] for item in result['suggestedItems']] == ['Tops', 'Bottoms', 'Shoes']
@@ -0,0 +1,53 @@
+"""
+WardrobeStore recovery: a torn log write must not break the wardrobe, and a
+failed write must not leave the in-memory index ahead of the files.
+"""
+import pytest
+
+from app.wardrobe_index import WardrobeStore
+
+
+def item(item_id, category='Tops'):
+    return {'_id': item_id, 'category': category, 'style': 'Casual', 'color': 'Blue'}
+
+
+def ids(index):
+    return [i['_id'] for i in index.items()]
+
+
+def test_torn_write_is_dropped_before_the_next_append(tmp_path):
+    store = WardrobeStore(str(tmp_path))
+    store.upsert_items('w', [item('a')])
+    # A crash mid-write leaves half a record at the end of the log
+    with open(store._path('w', '.log'), 'ab') as f:
+        f.write(b'{"op": "upsert", "version": 2, "ite')
+
+    other = WardrobeStore(str(tmp_path))
+    assert ids(other.get('w')) == ['a']
+    other.upsert_items('w', [item('b')])
+    other.delete_items('w', ['a'])
+
+    assert ids(WardrobeStore(str(tmp_path)).get('w')) == ['b']
+    assert ids(store.get('w')) == ['b']
+
+
+def test_failed_write_does_not_leave_memory_ahead_of_disk(tmp_path, monkeypatch):
+    store = WardrobeStore(str(tmp_path))
+    held = store.upsert_items('w', [item('a')])[0]
+
+    def full_disk(index, record):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(store, '_append', full_disk)
+    with pytest.raises(OSError):
+        store.upsert_items('w', [item('b')])
+    with pytest.raises(OSError):
+        store.delete_items('w', ['a'])
+    monkeypatch.undo()
+
+    assert ids(store.get('w')) == ['a']
+    # Whoever still holds the old object catches up from disk on its next write
+    store._indexes['w'] = held
+    store.upsert_items('w', [item('c')])
+    assert ids(held) == ['a', 'c']
+    assert ids(WardrobeStore(str(tmp_path)).get('w')) == ['a', 'c']
@@ -1,9 +1,15 @@
 # training/image_tagging_train.py
+import argparse
+import json
+import os
+import sys
 import tensorflow as tf
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.layers import GlobalAveragePooling2D, Dense
 from tensorflow.keras.models import Model
 
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
 def build_img_model(num_classes):
     base = MobileNetV2(include_top=False, input_shape=(224,224,3), weights='imagenet')
     base.trainable = False
@@ -12,8 +18,114 @@ def build_img_model(num_classes):
     model = Model(inputs=base.input, outputs=outputs)
     return model
 
-model = build_img_model(num_classes=10)  # Update for your number of categories
-model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-# Replace the next line with real data!
-# model.fit(train_imgs, train_labels, epochs=5, validation_split=0.2)
-model.save('../models/clothing_classifier.h5')
+def train_from_cached_features(annotations, images, val_annotations=None, val_images=None, sweep=False):
+    """
+    Trains only the Dense head on pooled backbone features from the shared
+    feature cache (app/feature_cache.py); the backbone runs once per image,
+    not once per epoch.
+    """
+    sys.path.insert(0, REPO_DIR)  # the feature cache lives in the app package
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+    from app.data_loader import read_annotation_columns
+    from app.feature_cache import FeatureStore, train_head, sweep_heads, export_full_model
+
+    paths, labels = read_annotation_columns(annotations, images)
+    if val_annotations:
+        val_paths, val_labels = read_annotation_columns(val_annotations, val_images or images)
+    else:
+        paths, val_paths, labels, val_labels = train_test_split(paths, labels, test_size=0.2, random_state=0)
+
+    store = FeatureStore()
+    store.extract(list(paths) + list(val_paths))
+    x_train, kept_train = store.features(paths)
+    x_val, kept_val = store.features(val_paths)
+
+    le = LabelEncoder()
+    y_train = le.fit_transform(labels[kept_train].astype(str))
+    val_labels = val_labels[kept_val].astype(str)
+    known = np.isin(val_labels, le.classes_)
+    x_val, y_val = x_val[known], le.transform(val_labels[known])
+    num_classes = len(le.classes_)
+
+    if sweep:
+        head, acc, params = sweep_heads(x_train, y_train, x_val, y_val, num_classes)
+        print(f"Best head: {params} (val_accuracy={acc:.4f})")
+    else:
+        head, acc = train_head(x_train, y_train, x_val, y_val, num_classes, verbose=1)
+        print(f"Head val_accuracy={acc:.4f}")
+    return export_full_model(head, num_classes), le.classes_
+
+def train_multi_head(annotations, images, style_annotations, style_images=None):
+    """
+    Category and style heads trained on the same cached backbone features,
+    exported as one model with a shared backbone. `style_annotations` has
+    "image_name style" lines; images without a style label only train the
+    category head.
+    """
+    sys.path.insert(0, REPO_DIR)
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+    from app.data_loader import read_annotation_columns
+    from app.feature_cache import FeatureStore, train_head, export_multi_head_model
+
+    paths, categories = read_annotation_columns(annotations, images)
+    style_paths, styles = read_annotation_columns(style_annotations, style_images or images)
+    store = FeatureStore()
+    store.extract(list(paths) + list(style_paths))
+
+    heads, labels = {}, {}
+    for name, head_paths, head_labels in (('category', paths, categories), ('style', style_paths, styles)):
+        x, kept = store.features(head_paths)
+        le = LabelEncoder()
+        y = le.fit_transform(head_labels[kept].astype(str))
+        x_train, x_val, y_train, y_val = train_test_split(x, y, test_size=0.2, random_state=0)
+        head, acc = train_head(x_train, y_train, x_val, y_val, len(le.classes_), verbose=1)
+        print(f"{name} head val_accuracy={acc:.4f}")
+        heads[name] = (head, len(le.classes_))
+        labels[name] = [str(c) for c in le.classes_]
+    return export_multi_head_model(heads), labels
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (and optionally train) the image tagging model")
+    parser.add_argument('--num-classes', type=int, default=10)  # Update for your number of categories
+    parser.add_argument('--annotations', help="Annotation file (image_name ... label per line) to train on")
+    parser.add_argument('--images', help="Directory the annotation image names are relative to")
+    parser.add_argument('--val-annotations')
+    parser.add_argument('--val-images')
+    parser.add_argument('--cached-features', action='store_true',
+                        help="Train the head on cached backbone features instead of full forward passes")
+    parser.add_argument('--sweep', action='store_true')
+    parser.add_argument('--multi-head', action='store_true',
+                        help="Build the category + style tagger (one backbone, one head per attribute)")
+    parser.add_argument('--style-annotations', help="With --multi-head: 'image_name style' lines to train on")
+    parser.add_argument('--style-images', help="Directory for --style-annotations (defaults to --images)")
+    parser.add_argument('--output', default=None,
+                        help="Defaults to models/clothing_classifier.h5, or models/clothing_tagger.h5 with --multi-head")
+    args = parser.parse_args()
+    if args.multi_head and not (args.annotations and args.style_annotations):
+        # An untrained tagger would serve made-up labels, so there is no build-only mode
+        parser.error("--multi-head needs --annotations and --style-annotations")
+    if args.output is None:
+        args.output = os.path.join(REPO_DIR, 'models', 'clothing_tagger.h5' if args.multi_head else 'clothing_classifier.h5')
+
+    if args.multi_head:
+        model, labels = train_multi_head(args.annotations, args.images, args.style_annotations,
+                                         args.style_images)
+        with open(os.path.splitext(args.output)[0] + '_labels.json', 'w') as f:
+            json.dump(labels, f, indent=2)
+    elif args.annotations and args.cached_features:
+        model, classes = train_from_cached_features(args.annotations, args.images, args.val_annotations,
+                                                    args.val_images, sweep=args.sweep)
+        print(f"Classes: {list(classes)}")
+    else:
+        model = build_img_model(num_classes=args.num_classes)
+        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        # Replace the next line with real data!
+        # model.fit(train_imgs, train_labels, epochs=5, validation_split=0.2)
+    model.save(args.output)
+
+if __name__ == "__main__":
+    main()